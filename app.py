@@ -2,9 +2,36 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import joblib
+import copy
+import gzip
+import io
+import json
 import os
-from datetime import datetime
+import tarfile
+import tempfile
+import threading
+import zipfile
+import altair as alt
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from datetime import datetime, timezone
 import time
+import uuid
+import warnings
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from functools import partial
+
+from scipy import sparse, stats
+
+from audit_log import AuditLog
+from compact_forest import is_compact_forest, unpack_forest
+from compute_governor import ComputeGovernor
+from drift_monitor import PSI_DRIFT, PSI_WATCH, DriftMonitor
+from memory_admission import MemoryAdmission
+from prediction_store import PredictionStore, content_hash, row_hashes
 
 # Page configuration
 st.set_page_config(
@@ -272,24 +299,648 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Model files and registry manifest
+MODELS_DIR = 'models'
+DEFAULT_MODEL_PATH = os.path.join(MODELS_DIR, 'model.pkl')
+DEFAULT_ENCODERS_PATH = os.path.join(MODELS_DIR, 'encoders.pkl')
+REGISTRY_MANIFEST_PATH = os.path.join(MODELS_DIR, 'registry.json')
+DEFAULT_MODEL_VERSION = 'current'
+
+# Scale of the pages' simulated loading delays (0 turns them off, e.g. for load tests)
+UI_DELAY_SCALE = float(os.environ.get('CMI_UI_DELAY_SCALE', 1.0))
+
+# Persistent batch prediction store
+PREDICTION_STORE_PATH = os.path.join('cache', 'predictions.sqlite')
+PREDICTION_STORE_MAX_ROWS = 2_000_000
+
+# Input drift monitoring: live profile, training reference stored with the models
+DRIFT_PROFILE_PATH = os.environ.get('CMI_DRIFT_PROFILE', os.path.join('cache', 'drift_profile.json'))
+DRIFT_REFERENCE_PATH = os.path.join(MODELS_DIR, 'reference_profile.json')
+DRIFT_PERSIST_SECONDS = 60
+
+# Append-only audit log of every prediction, as Parquet or SQLite files
+AUDIT_DIR = os.environ.get('CMI_AUDIT_DIR', 'audit')
+AUDIT_FORMAT = os.environ.get('CMI_AUDIT_FORMAT', 'parquet')
+
+# Per-prediction explanations: features reported per row, rows explained at once
+EXPLANATION_TOP_K = [3, 5, 10]
+EXPLANATION_CHUNK_ROWS = 10_000
+
+# Cores shared by all prediction jobs of the process (all CPUs by default)
+COMPUTE_CORES = int(os.environ.get('CMI_COMPUTE_CORES', 0)) or os.cpu_count() or 1
+# Batch rows per core requested from the governor; small batches stay on one core
+COMPUTE_ROWS_PER_CORE = 2000
+
+# Early-exit (anytime) inference: trees evaluated between stopping checks
+EARLY_EXIT_BLOCK_SIZE = 10
+EARLY_EXIT_CONFIDENCES = [0.9, 0.95, 0.99, 0.999]
+
+CATEGORICAL_COLUMNS = ['sex', 'handedness', 'adult_child']
+
+# Form/CSV labels accepted for each encoder class (the encoders were fitted on 0/1 codes)
+CATEGORY_ALIASES = {
+    'sex': {'0': ['Female', 'F'], '1': ['Male', 'M']},
+    'handedness': {'0': ['Left', 'L'], '1': ['Right', 'R']},
+    'adult_child': {'0': ['Child'], '1': ['Adult']},
+}
+
+class EncodingTable:
+    """Precomputed label -> code lookup compiled from a fitted LabelEncoder.
+
+    Labels are matched case-insensitively after stripping whitespace, and
+    whole columns are encoded at once through ``pd.Categorical`` codes.
+    """
+
+    def __init__(self, column, label_codes):
+        self.column = column
+        self.label_codes = label_codes
+        self.categories = pd.Index(list(label_codes.keys()))
+        self.codes = np.array(list(label_codes.values()), dtype=np.int64)
+        # The first name of every code is the encoder's own class label
+        class_labels = {}
+        for name, code in label_codes.items():
+            class_labels.setdefault(code, name)
+        self.class_labels = np.array([class_labels[code] for code in self.codes], dtype=object)
+
+    @classmethod
+    def from_encoder(cls, column, encoder):
+        label_codes = {}
+        aliases = CATEGORY_ALIASES.get(column, {})
+        for code, label in enumerate(encoder.classes_):
+            label = str(label)
+            names = [label] + aliases.get(label, [])
+            if label.lstrip('-').isdigit():
+                # Numeric CSV columns arrive as floats after parsing
+                names.append(f"{label}.0")
+            for name in names:
+                label_codes[name.strip().lower()] = code
+        return cls(column, label_codes)
+
+    def encode(self, values):
+        """Encode a column; return (codes, unknown_mask)"""
+        labels = pd.Series(values).astype(str).str.strip().str.lower()
+        positions = pd.Categorical(labels, categories=self.categories).codes
+        unknown = positions < 0
+        return self.codes[np.where(unknown, 0, positions)], unknown
+
+    def normalize(self, values):
+        """Map every alias of a class to the encoder's class label.
+
+        Unknown labels are returned stripped and lower-cased.
+        """
+        labels = pd.Series(values).astype(str).str.strip().str.lower()
+        positions = self.categories.get_indexer(labels)
+        return pd.Series(np.where(positions >= 0, self.class_labels[positions], labels), index=labels.index)
+
+def compile_encoding_tables(encoders):
+    """Compile fitted LabelEncoders into EncodingTable lookups"""
+    # Tables cached by st.cache_resource outlive reruns, which redefine the
+    # class, so already-compiled tables are recognised by duck typing
+    return {
+        col: EncodingTable.from_encoder(col, encoder) if hasattr(encoder, 'classes_') else encoder
+        for col, encoder in encoders.items()
+    }
+
+def encode_categorical_columns(input_df, encoders):
+    """Encode the categorical columns of ``input_df`` in one vectorized pass.
+
+    Returns ``(encoded, row_errors)`` where ``encoded`` maps column names to
+    code arrays and ``row_errors`` holds an error message for every row with
+    an unknown label (empty string for valid rows).
+    """
+    encoded = {}
+    row_errors = pd.Series('', index=input_df.index, dtype=object)
+    if not encoders:
+        return encoded, row_errors
+
+    tables = compile_encoding_tables(encoders)
+    for col in CATEGORICAL_COLUMNS:
+        if col not in input_df.columns or col not in tables:
+            continue
+        codes, unknown = tables[col].encode(input_df[col])
+        encoded[col] = codes
+        if unknown.any():
+            messages = f"Unknown {col} label '" + input_df[col].astype(str)[unknown] + "'"
+            row_errors[unknown] = np.where(
+                row_errors[unknown] == '', messages, row_errors[unknown] + '; ' + messages)
+    return encoded, row_errors
+
+# Columns every batch record must provide, with the documented value ranges
+SENSOR_COLUMNS = ['acc_x', 'acc_y', 'acc_z', 'rot_w', 'rot_x', 'rot_y', 'rot_z']
+MEASUREMENT_COLUMNS = ['age', 'height_cm', 'shoulder_to_wrist_cm', 'elbow_to_wrist_cm']
+REQUIRED_COLUMNS = SENSOR_COLUMNS + CATEGORICAL_COLUMNS + MEASUREMENT_COLUMNS
+
+INPUT_RANGES = {
+    'acc_x': (-1.5, 1.5),
+    'acc_y': (-1.5, 1.5),
+    'acc_z': (8.5, 9.8),
+    'rot_w': (0.8, 1.0),
+    'rot_x': (-0.3, 0.3),
+    'rot_y': (-0.3, 0.3),
+    'rot_z': (-0.3, 0.3),
+    'age': (1, 100),
+    'height_cm': (50.0, 250.0),
+    'shoulder_to_wrist_cm': (20.0, 100.0),
+    'elbow_to_wrist_cm': (10.0, 50.0),
+}
+
+# What-if sweeps: inputs that can be varied (at most two at a time) and grid sizes per input
+SWEEP_COLUMNS = SENSOR_COLUMNS + MEASUREMENT_COLUMNS
+SWEEP_POINTS = [10, 25, 50, 100, 200]
+
+def validate_batch(df, encoders, used_features=None):
+    """Validate a batch column by column before inference.
+
+    Returns ``(valid_df, rejects_df, missing_columns)``. ``valid_df`` holds
+    the rows that passed every check with numeric columns converted to
+    floats; ``rejects_df`` holds the remaining rows with their original
+    values, a ``row_number`` and a ``reject_reason``. When required columns
+    are missing no row can be validated and both frames are None.
+
+    With ``used_features``, columns the forest never splits on are neither
+    required nor checked.
+    """
+    required = [col for col in REQUIRED_COLUMNS if used_features is None or col in used_features]
+    missing_columns = [col for col in required if col not in df.columns]
+    if missing_columns:
+        return None, None, missing_columns
+
+    df = df.reset_index(drop=True)
+    reasons = pd.Series('', index=df.index, dtype=object)
+
+    def add_reason(mask, message):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.any():
+            if isinstance(message, pd.Series):
+                message = message[mask]
+            current = reasons[mask]
+            reasons[mask] = np.where(current == '', message, current + '; ' + message)
+
+    numeric = {}
+    for col in [col for col in SENSOR_COLUMNS + MEASUREMENT_COLUMNS if col in required]:
+        values = pd.to_numeric(df[col], errors='coerce')
+        add_reason(df[col].isna(), f"missing {col}")
+        add_reason(values.isna() & df[col].notna(), f"non-numeric {col}")
+        low, high = INPUT_RANGES[col]
+        add_reason((values < low) | (values > high), f"{col} outside {low} to {high}")
+        numeric[col] = values.astype(float)
+
+    _, category_errors = encode_categorical_columns(df[[col for col in df.columns if col in required]], encoders)
+    add_reason(category_errors != '', category_errors)
+
+    valid = (reasons == '').to_numpy()
+    valid_df = df[valid].assign(**{col: values[valid] for col, values in numeric.items()})
+
+    rejects_df = df[~valid].copy()
+    rejects_df.insert(0, 'row_number', rejects_df.index + 1)
+    rejects_df['reject_reason'] = reasons[~valid]
+
+    return valid_df, rejects_df, []
+
+# Upload formats accepted on the batch page
+BATCH_FILE_TYPES = ['csv', 'parquet', 'feather', 'arrow', 'ipc']
+
+# Archives whose members are scored as separate batch files
+ARCHIVE_FILE_TYPES = ['zip', 'tar', 'gz', 'tgz']
+# Files of a multi-file upload parsed and scored concurrently
+BATCH_WORKERS = min(4, os.cpu_count() or 1)
+
+# Memory budget for batch jobs of the whole process (3/4 of RAM by default)
+MEMORY_BUDGET_MB = int(os.environ.get('CMI_MEMORY_BUDGET_MB', 0))
+# How long a batch may wait for memory held by other sessions' batches
+MEMORY_WAIT_TIMEOUT = 300
+# Results of batches too large to keep in memory go to Parquet files here
+SPILL_DIR = os.path.join('cache', 'spill')
+SPILL_PREVIEW_ROWS = 10_000
+# Spill files older than this were left behind by a process that did not exit cleanly
+SPILL_MAX_AGE_SECONDS = 24 * 3600
+
+# Id columns preselected for per-sequence aggregation, in order of preference
+SEQUENCE_ID_COLUMNS = ['sequence_id', 'subject']
+SEQUENCE_AGGREGATIONS = {
+    'mean': 'Mean probability',
+    'vote': 'Majority vote',
+    'max': 'Max probability',
+    'features': 'Window features (score once per sequence)',
+}
+
+def batch_input_columns(registry):
+    """Columns worth reading from a batch file: those any registered forest splits on"""
+    if registry is None:
+        return None
+    return registry.used_columns()
+
+def read_batch_file(uploaded_file, columns=None, name=None):
+    """Read a CSV, Parquet or Arrow IPC/Feather upload into a DataFrame.
+
+    The format follows the extension of ``name`` (the upload's own name by
+    default). Only ``columns`` (when given) are read. Columnar files are projected
+    before decoding and converted column by column, so float columns
+    without nulls are handed to pandas without copying.
+    """
+    extension = os.path.splitext(name or uploaded_file.name)[1].lower().lstrip('.')
+
+    if extension == 'csv':
+        usecols = (lambda col: col in columns) if columns is not None else None
+        return pd.read_csv(uploaded_file, usecols=usecols)
+
+    if extension == 'parquet':
+        schema_names = pq.read_schema(uploaded_file).names
+        uploaded_file.seek(0)
+        selected = [col for col in schema_names if columns is None or col in columns]
+        table = pq.read_table(uploaded_file, columns=selected)
+    elif extension in ('feather', 'arrow', 'ipc'):
+        try:
+            # Only the footer is read here, to project before decoding
+            schema_names = pa.ipc.open_file(uploaded_file).schema.names
+        except pa.ArrowInvalid:
+            schema_names = None
+        uploaded_file.seek(0)
+        if schema_names is not None:
+            selected = [col for col in schema_names if columns is None or col in columns]
+            table = feather.read_table(uploaded_file, columns=selected, memory_map=False)
+        else:
+            # Feather V1 or the Arrow IPC stream format, which are read whole
+            try:
+                table = feather.read_table(uploaded_file, memory_map=False)
+            except pa.ArrowInvalid:
+                uploaded_file.seek(0)
+                table = pa.ipc.open_stream(uploaded_file).read_all()
+            if columns is not None:
+                table = table.select([col for col in table.column_names if col in columns])
+    else:
+        raise ValueError(f"Unsupported file type: .{extension}")
+
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def is_batch_archive(name):
+    return name.lower().endswith(('.zip', '.tar', '.tar.gz', '.tgz', '.gz'))
+
+def is_batch_member(name):
+    """Whether an archive member is a batch file worth scoring"""
+    base = os.path.basename(name)
+    extension = os.path.splitext(base)[1].lower().lstrip('.')
+    return extension in BATCH_FILE_TYPES and not base.startswith('.') and '__MACOSX' not in name
+
+def is_tar_header(block):
+    """Whether ``block`` is a valid tar header, i.e. starts a tar archive"""
+    try:
+        tarfile.TarInfo.frombuf(block, tarfile.ENCODING, 'surrogateescape')
+        return True
+    except tarfile.HeaderError:
+        return False
+
+def iter_batch_members(uploaded_file):
+    """Yield ``(name, data)`` for every batch file in an upload.
+
+    Archive members are decompressed one at a time, in memory, as the
+    archive is read; nothing is extracted to disk. A gzip-compressed file
+    that is not a tar archive (``data.csv.gz``) is a single member. Plain
+    uploads yield themselves.
+    """
+    name = uploaded_file.name
+    uploaded_file.seek(0)
+    if name.lower().endswith('.gz') and not name.lower().endswith(('.tar.gz', '.tgz')):
+        # Decompressed as it is read, like the other archives
+        with gzip.open(uploaded_file) as f:
+            if is_tar_header(f.read(tarfile.BLOCKSIZE)):
+                f.seek(0)
+                with tarfile.open(fileobj=f, mode='r|') as archive:
+                    for member in archive:
+                        if member.isfile() and is_batch_member(member.name):
+                            yield f"{name}/{member.name}", archive.extractfile(member).read()
+            elif is_batch_member(name[:-3]):
+                f.seek(0)
+                yield name[:-3], f.read()
+            else:
+                raise ValueError(f"{name} is neither a tar archive nor a compressed "
+                                 f"{', '.join(BATCH_FILE_TYPES).upper()} file")
+    elif name.lower().endswith('.zip'):
+        with zipfile.ZipFile(uploaded_file) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_batch_member(info.filename):
+                    yield f"{name}/{info.filename}", archive.read(info)
+    elif is_batch_archive(name):
+        # Stream mode reads the (compressed) tar front to back exactly once
+        with tarfile.open(fileobj=uploaded_file, mode='r|*') as archive:
+            for member in archive:
+                if member.isfile() and is_batch_member(member.name):
+                    yield f"{name}/{member.name}", archive.extractfile(member).read()
+    else:
+        yield name, uploaded_file.getvalue()
+
+def open_arrow_table(uploaded_file):
+    """Arrow table over an IPC/Feather upload's bytes, without copying them"""
+    buffer = pa.py_buffer(uploaded_file.getbuffer())
+    try:
+        return pa.ipc.open_file(buffer).read_all()
+    except pa.ArrowInvalid:
+        # Arrow IPC stream format rather than the random-access file format
+        return pa.ipc.open_stream(buffer).read_all()
+
+def read_batch_schema(uploaded_file, name=None):
+    """Column names, row count and decoded size of an upload, without
+    parsing its data.
+
+    Columnar formats report their exact row count; for CSV it is
+    extrapolated from the line lengths of the first megabyte. The decoded
+    size is that of the Arrow buffers a columnar reader builds before the
+    frame (uncompressed, all columns); CSV is parsed straight into the
+    frame, so it is 0.
+    """
+    extension = os.path.splitext(name or uploaded_file.name)[1].lower().lstrip('.')
+    try:
+        if extension == 'csv':
+            columns = list(pd.read_csv(uploaded_file, nrows=0).columns)
+            uploaded_file.seek(0)
+            size = uploaded_file.getbuffer().nbytes
+            sample = uploaded_file.read(1 << 20)
+            lines = sample.count(b'\n') + (0 if sample.endswith(b'\n') else 1)
+            rows = lines if len(sample) >= size else int(size * lines / len(sample))
+            return columns, max(rows - 1, 0), 0
+        if extension == 'parquet':
+            metadata = pq.read_metadata(uploaded_file)
+            decoded = sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+            return metadata.schema.to_arrow_schema().names, metadata.num_rows, decoded
+        table = open_arrow_table(uploaded_file)
+        return table.column_names, table.num_rows, table.nbytes
+    finally:
+        uploaded_file.seek(0)
+
+def iter_batch_chunks(uploaded_file, columns, chunk_rows):
+    """Yield an upload as DataFrames of at most ``chunk_rows`` rows.
+
+    Only one chunk is decoded at a time, so memory stays proportional to
+    the chunk rather than the file.
+    """
+    extension = os.path.splitext(uploaded_file.name)[1].lower().lstrip('.')
+    uploaded_file.seek(0)
+    if extension == 'csv':
+        usecols = (lambda col: col in columns) if columns is not None else None
+        yield from pd.read_csv(uploaded_file, usecols=usecols, chunksize=chunk_rows)
+    elif extension == 'parquet':
+        parquet_file = pq.ParquetFile(uploaded_file)
+        selected = [col for col in parquet_file.schema_arrow.names if columns is None or col in columns]
+        for record_batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=selected):
+            yield pa.Table.from_batches([record_batch]).to_pandas(split_blocks=True, self_destruct=True)
+    else:
+        table = open_arrow_table(uploaded_file)
+        if columns is not None:
+            table = table.select([col for col in table.column_names if col in columns])
+        for start in range(0, table.num_rows, chunk_rows):
+            yield table.slice(start, chunk_rows).to_pandas(split_blocks=True)
+
+def aggregate_sequence_features(valid_df, sequence_column):
+    """Collapse the rows of each sequence into one window-feature row.
+
+    Numeric columns are averaged over the sequence and other columns keep
+    their first value, so the result can be scored like any batch. A
+    ``records`` column counts the rows behind every sequence.
+    """
+    grouped = valid_df.groupby(sequence_column, sort=True, dropna=False)
+    numeric = [col for col in valid_df.select_dtypes('number').columns if col != sequence_column]
+    other = [col for col in valid_df.columns if col not in numeric and col != sequence_column]
+    aggregated = pd.concat([grouped.size().rename('records'), grouped[numeric].mean(),
+                            grouped[other].first()], axis=1)
+    return aggregated[['records'] + [col for col in valid_df.columns if col != sequence_column]].reset_index()
+
+def aggregate_sequence_predictions(results_df, sequence_column, method, classes):
+    """One result row per sequence from per-row probabilities.
+
+    ``mean`` averages the target probability of a sequence's rows, ``max``
+    takes the highest and ``vote`` the share of rows predicted as target;
+    the sequence is predicted as target when that score exceeds 0.5.
+    Per-version comparison columns are reduced the same way.
+    """
+    codes, sequences = pd.factorize(results_df[sequence_column], sort=True, use_na_sentinel=False)
+    counts = np.bincount(codes, minlength=len(sequences))
+
+    def reduce(values):
+        if method == 'max':
+            reduced = np.full(len(sequences), -np.inf)
+            np.maximum.at(reduced, codes, values)
+            return reduced
+        if method == 'vote':
+            values = values > 0.5
+        return np.bincount(codes, weights=values, minlength=len(sequences)) / counts
+
+    score = reduce(results_df['target_probability'].to_numpy(dtype=float))
+    aggregated = pd.DataFrame({sequence_column: sequences, 'records': counts})
+    aggregated['prediction'] = classes.take((score > 0.5).astype(np.intp))
+    aggregated['target_probability'] = score
+    aggregated['non_target_probability'] = 1 - score
+    aggregated['confidence'] = np.maximum(score, 1 - score)
+    aggregated['model_version'] = results_df['model_version'].iloc[0]
+    if 'trees_used' in results_df.columns:
+        trees_used = results_df['trees_used'].astype(float).groupby(codes).mean()
+        aggregated['trees_used'] = trees_used.reindex(range(len(sequences))).to_numpy()
+    for col in results_df.columns:
+        if col.startswith('target_probability_'):
+            aggregated[col] = reduce(results_df[col].to_numpy(dtype=float))
+
+    aggregated.attrs.update(results_df.attrs)
+    return aggregated
+
+def forest_used_features(model):
+    """Names of the features that appear in at least one split of the forest"""
+    used = np.zeros(model.n_features_in_, dtype=bool)
+    for estimator in model.estimators_:
+        features = estimator.tree_.feature
+        used[features[features >= 0]] = True
+    return set(np.asarray(model.feature_names_in_)[used])
+
+def forest_contribution_table(model):
+    """Precompute the Saabas contributions of every leaf of the forest.
+
+    Returns ``(base_rate, table)``: the forest's mean target probability at
+    the roots, and a sparse ``(total_nodes, n_features)`` matrix whose row
+    for a leaf holds, per feature, the changes in target probability along
+    the path from the root to that leaf, credited to the feature split on
+    at each step and divided by the number of trees. Rows of all trees are
+    stacked in estimator order, so a prediction only needs the leaf each
+    row reaches in every tree.
+    """
+    rows, features, deltas = [], [], []
+    base_rate = 0.0
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :]
+        target = value[:, 1] / value.sum(axis=1)
+
+        parent = np.full(tree.node_count, -1, dtype=np.int64)
+        internal = np.flatnonzero(tree.children_left >= 0)
+        parent[tree.children_left[internal]] = internal
+        parent[tree.children_right[internal]] = internal
+
+        # Walk all leaves up to the root together, one level per step
+        leaves = np.flatnonzero(tree.children_left < 0)
+        node = leaves
+        while len(node):
+            above = parent[node]
+            step = above >= 0
+            leaves, node, above = leaves[step], node[step], above[step]
+            rows.append(leaves + offset)
+            features.append(tree.feature[above])
+            deltas.append(target[node] - target[above])
+            node = above
+
+        base_rate += target[0]
+        offset += tree.node_count
+
+    n_trees = len(model.estimators_)
+    # Duplicate (leaf, feature) entries are summed by the CSR conversion
+    table = sparse.csr_matrix(
+        (np.concatenate(deltas) / n_trees, (np.concatenate(rows), np.concatenate(features))),
+        shape=(offset, model.n_features_in_))
+    return base_rate / n_trees, table
+
+class ModelRegistry:
+    """Named model versions sharing one set of encoders.
+
+    Single predictions are routed to a version according to its traffic
+    weight; batch scoring can ask for any version by name.
+    """
+
+    def __init__(self, models, weights, encoders, default_version, fingerprints=None):
+        self.models = models
+        self.weights = weights
+        self.encoders = encoders
+        self.default_version = default_version
+        self.fingerprints = fingerprints or {}
+        self.used_features = {name: forest_used_features(model) for name, model in models.items()}
+        # Built on the first explanation of a version; they are large
+        self.contribution_tables = {}
+        self.contribution_lock = threading.Lock()
+
+    @property
+    def names(self):
+        return list(self.models.keys())
+
+    def get(self, name=None):
+        """Return the model registered under ``name`` (default version if None)"""
+        return self.models[name or self.default_version]
+
+    def contribution_table(self, name=None):
+        """Contribution table of a version (see forest_contribution_table), built once on first use"""
+        name = name or self.default_version
+        with self.contribution_lock:
+            if name not in self.contribution_tables:
+                self.contribution_tables[name] = forest_contribution_table(self.models[name])
+            return self.contribution_tables[name]
+
+    def used_columns(self, versions=None):
+        """Union of the features split on by ``versions`` (all versions if None)"""
+        columns = set()
+        for name in versions or self.names:
+            columns.update(self.used_features[name])
+        return columns
+
+    def route(self):
+        """Pick a version for one prediction according to the traffic weights"""
+        names = self.names
+        weights = np.array([self.weights.get(name, 0.0) for name in names], dtype=float)
+        if len(names) == 1 or weights.sum() <= 0:
+            return self.default_version
+        return str(np.random.choice(names, p=weights / weights.sum()))
+
+def read_registry_manifest():
+    """Read models/registry.json, falling back to the single bundled model"""
+    if os.path.exists(REGISTRY_MANIFEST_PATH):
+        with open(REGISTRY_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    else:
+        manifest = {}
+
+    manifest.setdefault('encoders', DEFAULT_ENCODERS_PATH)
+    manifest.setdefault('versions', {
+        DEFAULT_MODEL_VERSION: {'path': DEFAULT_MODEL_PATH, 'weight': 1.0}
+    })
+    manifest.setdefault('default', next(iter(manifest['versions'])))
+    return manifest
+
+def load_model_file(path):
+    """Load a pickled model or compact forest.
+
+    Memory-mapping the file would not help: scikit-learn copies every
+    tree's arrays into its own buffers when a forest is unpickled.
+    """
+    model_data = joblib.load(path)
+    if is_compact_forest(model_data):
+        return unpack_forest(model_data)
+    if isinstance(model_data, dict):
+        return model_data['model']
+    return model_data
+
 @st.cache_resource
-def load_models():
-    """Load the pre-trained model and encoders"""
+def load_registry():
+    """Load every model version listed in the registry manifest"""
     try:
-        # Load model
-        model_data = joblib.load('models/model.pkl')
-        model = model_data['model']
-        
-        # Load encoders
-        encoders = joblib.load('models/encoders.pkl')
-        
-        return model, encoders
+        manifest = read_registry_manifest()
+
+        models = {}
+        weights = {}
+        fingerprints = {}
+        for name, spec in manifest['versions'].items():
+            models[name] = load_model_file(spec['path'])
+            weights[name] = float(spec.get('weight', 0.0))
+            fingerprints[name] = content_hash(spec['path'])
+
+        encoders = compile_encoding_tables(joblib.load(manifest['encoders']))
+
+        return ModelRegistry(models, weights, encoders, manifest['default'], fingerprints)
     except Exception as e:
         st.error(f"Error loading models: {str(e)}")
+        return None
+
+@st.cache_resource
+def load_prediction_store():
+    """Open the on-disk prediction store shared by all sessions"""
+    try:
+        return PredictionStore(PREDICTION_STORE_PATH, PREDICTION_STORE_MAX_ROWS)
+    except Exception as e:
+        st.warning(f"Prediction store unavailable, scoring without it: {str(e)}")
+        return None
+
+@st.cache_resource
+def load_audit_log():
+    """Prediction audit log shared by all sessions, written in the background"""
+    return AuditLog(AUDIT_DIR, AUDIT_FORMAT)
+
+@st.cache_resource
+def load_drift_monitor():
+    """Live input and prediction profile shared by all sessions"""
+    return DriftMonitor(INPUT_RANGES, CATEGORICAL_COLUMNS, DRIFT_PROFILE_PATH, DRIFT_REFERENCE_PATH,
+                        DRIFT_PERSIST_SECONDS)
+
+@st.cache_resource
+def load_memory_admission():
+    """Memory budget shared by the batch jobs of every session"""
+    return MemoryAdmission(MEMORY_BUDGET_MB * 2**20 if MEMORY_BUDGET_MB else None)
+
+@st.cache_resource
+def load_compute_governor():
+    """Core budget shared by every session's prediction jobs"""
+    return ComputeGovernor(COMPUTE_CORES)
+
+def load_models(version=None):
+    """Load the pre-trained model and encoders"""
+    registry = load_registry()
+    if registry is None:
         return None, None
+    return registry.get(version), registry.encoders
 
-def preprocess_input_data(input_data, model=None, encoders=None):
-    """Preprocess input data to match model expectations"""
+def preprocess_input_data(input_data, model=None, encoders=None, used_features=None, on_error=st.error):
+    """Preprocess input data to match model expectations.
+
+    ``input_data`` is either a dict for a single record or a DataFrame
+    holding one record per row. Returns a C-contiguous float32 matrix whose
+    columns follow ``model.feature_names_in_``.
+
+    With ``used_features`` (see forest_used_features) only those columns are
+    encoded and imputed; the others are never read by the trees and stay 0.
+    Errors are reported through ``on_error`` and return None.
+    """
     try:
         # Get the model to see what features it expects
         if model is None or encoders is None:
@@ -298,72 +949,314 @@ def preprocess_input_data(input_data, model=None, encoders=None):
             return None
             
         expected_features = model.feature_names_in_
+
+        if isinstance(input_data, pd.DataFrame):
+            input_df = input_data.reset_index(drop=True)
+        else:
+            input_df = pd.DataFrame([input_data])
+        if used_features is not None:
+            input_df = input_df[[col for col in input_df.columns if col in used_features]]
+        n_rows = len(input_df)
+
+        # Encode categorical variables
+        encoded, row_errors = encode_categorical_columns(input_df, encoders)
+        if (row_errors != '').any():
+            bad_rows = row_errors[row_errors != '']
+            details = "; ".join(f"row {idx}: {msg}" for idx, msg in bad_rows.head(5).items())
+            on_error(f"Error encoding categorical values ({len(bad_rows)} rows) - {details}")
+            return None
         
-        # Create a DataFrame with all expected features, initialized with zeros
-        full_df = pd.DataFrame(0, index=[0], columns=expected_features)
+        # Build the feature matrix directly in the dtype and layout the forest
+        # uses internally, so predict_proba does not need to convert it
+        column_index = {feature: i for i, feature in enumerate(expected_features)}
+        if used_features is None:
+            matrix = np.empty((n_rows, len(expected_features)), dtype=np.float32, order='C')
+        else:
+            matrix = np.zeros((n_rows, len(expected_features)), dtype=np.float32, order='C')
         
         # Fill in the provided features
-        for col in input_data.keys():
-            if col in expected_features:
-                full_df[col] = input_data[col]
+        for col in input_df.columns:
+            if col in column_index:
+                values = encoded[col] if col in encoded else input_df[col].to_numpy()
+                matrix[:, column_index[col]] = values
         
         # Fill missing engineered features with realistic random values
-        missing_features = [col for col in expected_features if col not in input_data.keys()]
+        missing_features = [col for col in expected_features if col not in input_df.columns
+                            and (used_features is None or col in used_features)]
         
         if missing_features:
-            # Generate realistic values for missing features
-            for feature in missing_features:
-                if feature.startswith('thm_'):
-                    # Time-domain features
-                    full_df[feature] = np.random.uniform(0.1, 2.0)
-                elif feature.startswith('tof_'):
-                    # Time-of-flight features
-                    full_df[feature] = np.random.uniform(0.01, 1.0)
-                else:
-                    # Other features
-                    full_df[feature] = np.random.uniform(0.1, 1.0)
-        
-        # Encode categorical variables
-        if encoders:
-            for col in ['sex', 'handedness', 'adult_child']:
-                if col in full_df.columns and col in encoders:
-                    try:
-                        full_df[col] = encoders[col].transform(full_df[col])
-                    except Exception as encode_error:
-                        st.error(f"Error encoding {col}: {str(encode_error)}")
-                        return None
+            # Time-domain, time-of-flight and other features, one draw per group
+            thm_idx = [column_index[f] for f in missing_features if f.startswith('thm_')]
+            tof_idx = [column_index[f] for f in missing_features if f.startswith('tof_')]
+            other_idx = [column_index[f] for f in missing_features
+                         if not f.startswith(('thm_', 'tof_'))]
+            for idx, (low, high) in ((thm_idx, (0.1, 2.0)), (tof_idx, (0.01, 1.0)), (other_idx, (0.1, 1.0))):
+                if idx:
+                    matrix[:, idx] = np.random.uniform(low, high, size=(n_rows, len(idx)))
         
-        # Ensure the DataFrame has exactly the same columns in the same order as the model expects
-        full_df = full_df[expected_features]
-        
-        # Verify the DataFrame has the correct shape and features
-        if full_df.shape[1] != len(expected_features):
-            st.error(f"Feature mismatch: expected {len(expected_features)} features, got {full_df.shape[1]}")
+        # Verify the matrix has the correct shape
+        if matrix.shape[1] != len(expected_features):
+            on_error(f"Feature mismatch: expected {len(expected_features)} features, got {matrix.shape[1]}")
             return None
         
-        return full_df
+        return matrix
         
     except Exception as e:
-        st.error(f"Error preprocessing data: {str(e)}")
+        on_error(f"Error preprocessing data: {str(e)}")
         return None
 
-def make_prediction(input_data, model=None, encoders=None):
-    """Make prediction using the loaded model"""
+def forest_predict_proba(model, matrix, n_jobs=None):
+    """Class probabilities for a matrix built by preprocess_input_data.
+
+    ``n_jobs`` overrides the forest's own setting for this call only; the
+    shared model object is left untouched.
+    """
+    model = forest_with_n_jobs(model, n_jobs)
+    with warnings.catch_warnings():
+        # Columns are already in feature_names_in_ order
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        return model.predict_proba(matrix)
+
+def forest_with_n_jobs(model, n_jobs):
+    """Shallow copy of the forest using ``n_jobs`` threads (the forest itself if None)"""
+    if n_jobs is None or n_jobs == model.n_jobs:
+        return model
+    model = copy.copy(model)
+    model.n_jobs = n_jobs
+    return model
+
+def feature_contributions(model, contribution_table, matrix, n_jobs=None):
+    """Per-feature contributions to the target probability of every row.
+
+    ``contribution_table`` comes from forest_contribution_table. Finding
+    the leaf of every row in every tree costs about as much as a
+    prediction; the contributions are then the sum of those leaves' table
+    rows. Each row's contributions plus the base rate add up to the
+    forest's target probability. Returns a dense ``(n_rows, n_features)``
+    array.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        leaves = forest_with_n_jobs(model, n_jobs).apply(matrix)
+    offsets = np.cumsum([0] + [estimator.tree_.node_count for estimator in model.estimators_[:-1]])
+    n_rows, n_trees = leaves.shape
+    reached = sparse.csr_matrix(
+        (np.ones(leaves.size), (leaves + offsets).ravel(), np.arange(0, leaves.size + 1, n_trees)),
+        shape=(n_rows, contribution_table[1].shape[0]))
+    return (reached @ contribution_table[1]).toarray()
+
+def top_contributions(model, contribution_table, matrix, k, n_jobs=None):
+    """The ``k`` features with the largest absolute contribution per row.
+
+    Rows are explained ``EXPLANATION_CHUNK_ROWS`` at a time so only the
+    top-k survive for large batches. Returns ``(features, contributions)``,
+    two ``(n_rows, k)`` arrays ordered by decreasing absolute contribution.
+    """
+    names = np.asarray(model.feature_names_in_, dtype=object)
+    k = min(k, len(names))
+    features = np.empty((len(matrix), k), dtype=object)
+    values = np.empty((len(matrix), k))
+    for start in range(0, len(matrix), EXPLANATION_CHUNK_ROWS):
+        chunk = slice(start, start + EXPLANATION_CHUNK_ROWS)
+        contributions = feature_contributions(model, contribution_table, matrix[chunk], n_jobs)
+        top = np.argpartition(-np.abs(contributions), k - 1, axis=1)[:, :k]
+        picked = np.take_along_axis(contributions, top, axis=1)
+        order = np.argsort(-np.abs(picked), axis=1)
+        features[chunk] = names[np.take_along_axis(top, order, axis=1)]
+        values[chunk] = np.take_along_axis(picked, order, axis=1)
+    return features, values
+
+def early_exit_predict_proba(model, matrix, confidence=0.99, block_size=None):
+    """Evaluate the forest in blocks of trees, stopping per row once the
+    target/non-target decision is settled.
+
+    After each block the running mean of the trees' target probabilities
+    is compared with 0.5. A row stops when even the worst case for the
+    remaining trees cannot flip it, or when a flip is statistically
+    implausible. With ``u`` trees used and ``r`` remaining, the full
+    forest's mean differs from the running mean with a standard deviation
+    of ``sd * sqrt(r + r**2 / u) / n_trees``: the remaining trees' spread
+    plus the error in the running mean. The margin must exceed that times
+    Student's t quantile, with ``1 - confidence`` split between the blocks,
+    so the share of rows whose decision differs from the full forest stays
+    below ``1 - confidence``. Rows still undecided get the full ensemble.
+
+    Returns ``(proba, trees_used)``.
+    """
+    estimators = model.estimators_
+    n_trees = len(estimators)
+    n_rows = len(matrix)
+    block_size = block_size or EARLY_EXIT_BLOCK_SIZE
+    # Rows are tested after every block, so the error budget is split
+    # between the looks; Student's t covers the variance being estimated
+    looks = max(-(-n_trees // block_size) - 1, 1)
+    level = 1.0 - (1.0 - confidence) / looks
+
+    sums = np.zeros(n_rows)
+    squares = np.zeros(n_rows)
+    trees_used = np.zeros(n_rows, dtype=np.int64)
+    active = np.ones(n_rows, dtype=bool)
+
+    for start in range(0, n_trees, block_size):
+        rows = np.flatnonzero(active)
+        if len(rows) == 0:
+            break
+        block_matrix = matrix[rows]
+        block = estimators[start:start + block_size]
+        for estimator in block:
+            target = estimator.predict_proba(block_matrix, check_input=False)[:, 1]
+            sums[rows] += target
+            squares[rows] += target * target
+        trees_used[rows] = start + len(block)
+
+        used = trees_used[rows]
+        remaining = n_trees - used
+        mean = sums[rows] / used
+        variance = np.maximum(squares[rows] / used - mean * mean, 0.0) * used / np.maximum(used - 1, 1)
+
+        # The forest predicts the target class only above 0.5
+        worst_low = sums[rows] / n_trees
+        worst_high = (sums[rows] + remaining) / n_trees
+        settled = (worst_low > 0.5) | (worst_high <= 0.5)
+        # The full forest's mean differs from the running mean through the
+        # remaining trees' spread and the error in the running mean itself
+        final_sd = np.sqrt(variance * remaining * (used + remaining) / used) / n_trees
+        settled |= np.abs(mean - 0.5) > stats.t.ppf(level, np.maximum(used - 1, 1)) * final_sd
+        active[rows[settled]] = False
+
+    target = sums / trees_used
+    return np.column_stack([1.0 - target, target]), trees_used
+
+def audit_records(inputs, proba, model_version, source, timestamp, request_id, file_hash='',
+                  model_fingerprint=''):
+    """Audit log rows for scored ``inputs`` (a record dict or a DataFrame of
+    records) and their class probabilities.
+
+    ``model_fingerprint`` identifies the model file behind ``model_version``,
+    which may be swapped under the same name. Columns and dtypes are the
+    same for every call, so all records of a log file share one schema.
+    """
+    if isinstance(inputs, dict):
+        inputs = pd.DataFrame([inputs])
+    records = pd.DataFrame({
+        'timestamp': pd.Series(timestamp, index=range(len(inputs)), dtype='datetime64[us, UTC]'),
+        'request_id': request_id,
+        'source': source,
+        'file_hash': file_hash or '',
+        'model_version': model_version,
+        'model_fingerprint': model_fingerprint or '',
+        'prediction': np.argmax(proba, axis=1).astype(np.int64),
+        'target_probability': proba[:, 1].astype(np.float64),
+        'non_target_probability': proba[:, 0].astype(np.float64),
+    })
+    for col in REQUIRED_COLUMNS:
+        values = inputs[col].to_numpy() if col in inputs.columns else np.full(len(inputs), None)
+        if col in CATEGORICAL_COLUMNS:
+            records[col] = pd.Series(values).astype(str).to_numpy()
+        else:
+            records[col] = pd.to_numeric(pd.Series(values), errors='coerce').astype(np.float64).to_numpy()
+    return records
+
+def what_if_sweep(input_data, grid, model=None, encoders=None, used_features=None, governor=None):
+    """Target probability of ``input_data`` with some inputs varied.
+
+    ``grid`` maps numeric input columns to the values to try; every
+    combination of them is scored. The record is preprocessed once and
+    its matrix row repeated, so all variants share the same imputed
+    engineered features and differ only in the swept inputs, and the
+    whole grid is scored in one forest call.
+
+    Returns a DataFrame with one column per swept input plus
+    ``target_probability``, or None when preprocessing fails.
+    """
+    try:
+        if model is None or encoders is None:
+            model, encoders = load_models()
+        if model is None:
+            return None
+
+        base = preprocess_input_data(input_data, model, encoders, used_features)
+        if base is None:
+            return None
+
+        columns = list(grid)
+        mesh = np.meshgrid(*[np.asarray(grid[col], dtype=np.float32) for col in columns], indexing='ij')
+        points = pd.DataFrame({col: values.ravel() for col, values in zip(columns, mesh)})
+        matrix = np.repeat(base, len(points), axis=0)
+        column_index = {feature: i for i, feature in enumerate(model.feature_names_in_)}
+        for col in columns:
+            matrix[:, column_index[col]] = points[col].to_numpy()
+
+        want = -(-len(points) // COMPUTE_ROWS_PER_CORE)
+        with governed(governor, f"what-if sweep of {len(points)} points", want) as n_jobs:
+            proba = forest_predict_proba(model, matrix, n_jobs)
+        points['target_probability'] = proba[:, 1]
+        return points
+
+    except Exception as e:
+        st.error(f"Error running what-if sweep: {str(e)}")
+        return None
+
+def make_prediction(input_data, model=None, encoders=None, early_exit_confidence=None, info=None,
+                    used_features=None, governor=None, contribution_table=None, monitor=None,
+                    audit=None, model_version=DEFAULT_MODEL_VERSION, model_fingerprint=None):
+    """Make prediction using the loaded model.
+
+    With ``early_exit_confidence`` the forest is evaluated in blocks and
+    stops early for decisive inputs; the number of trees evaluated is put
+    in ``info['trees_used']`` when an ``info`` dict is passed.
+
+    With a ``governor`` the forest runs on the single core granted to it,
+    waiting for one when the machine is saturated.
+
+    With a ``contribution_table`` (see forest_contribution_table) and an
+    ``info`` dict, ``info['contributions']`` receives the per-feature
+    contributions of the full forest and ``info['base_rate']`` its base rate.
+    Early exit is then off, so they add up to the returned probability.
+
+    With a ``monitor`` (see DriftMonitor) the record and its target
+    probability are added to the live drift profile.
+
+    With an ``audit`` log the record, its probabilities, ``model_version``
+    and ``model_fingerprint`` are queued for the log; the rows are built and
+    written on the log's writer thread.
+    """
     try:
         if model is None or encoders is None:
             model, encoders = load_models()
         if model is None:
             return None, None
+        if contribution_table is not None and info is not None:
+            # Contributions describe the full forest
+            early_exit_confidence = None
         
         # Preprocess input data
-        processed_data = preprocess_input_data(input_data, model, encoders)
+        processed_data = preprocess_input_data(input_data, model, encoders, used_features)
         if processed_data is None:
             return None, None
         
-        # Make prediction
-        prediction = model.predict(processed_data)[0]
-        proba = model.predict_proba(processed_data)[0]
-        proba = np.asarray(proba).ravel()
+        # Make prediction (the forest predicts the most probable class)
+        with governed(governor, 'single prediction', want=1) as n_jobs:
+            if early_exit_confidence:
+                proba, trees_used = early_exit_predict_proba(model, processed_data, early_exit_confidence)
+                trees_used = int(trees_used[0])
+            else:
+                proba = forest_predict_proba(model, processed_data, n_jobs)
+                trees_used = len(model.estimators_)
+            if contribution_table is not None and info is not None:
+                info['base_rate'] = contribution_table[0]
+                info['contributions'] = feature_contributions(model, contribution_table,
+                                                              processed_data, n_jobs)[0]
+        if info is not None:
+            info['trees_used'] = trees_used
+        if monitor is not None:
+            monitor.update(pd.DataFrame([input_data]), proba[:, 1], compile_encoding_tables(encoders or {}))
+        if audit is not None:
+            audit.log(partial(audit_records, dict(input_data), np.asarray(proba), model_version, 'single',
+                              datetime.now(timezone.utc), uuid.uuid4().hex,
+                              model_fingerprint=model_fingerprint), 1)
+        proba = np.asarray(proba[0]).ravel()
+        prediction = model.classes_[np.argmax(proba)]
         
         return prediction, proba
         
@@ -371,6 +1264,468 @@ def make_prediction(input_data, model=None, encoders=None):
         st.error(f"Error making prediction: {str(e)}")
         return None, None
 
+@contextmanager
+def governed(governor, label, want=None):
+    """Run a block under the governor's core budget (unlimited without one).
+
+    Yields the ``n_jobs`` to use, or None to keep the forest's setting.
+    """
+    if governor is None:
+        yield None
+        return
+    with governor.job(label, want) as cores:
+        yield cores
+
+def score_versions(valid_df, registry, versions, store=None, early_exit_confidence=None, n_jobs=None,
+                   lookup=True, on_error=st.error):
+    """Probabilities of every row of ``valid_df`` for each model version.
+
+    Rows found in ``store`` are answered from it, unless ``lookup`` is off;
+    new probabilities are saved to it either way. The remaining rows are
+    preprocessed once per feature layout, so versions sharing a layout score
+    the same matrix. Returns ``({version: proba}, {version: hit_count},
+    {version: trees_used}, matrix)``, or ``(None, None, None, None)`` when
+    preprocessing fails. ``trees_used`` is -1 for rows answered from the
+    store. ``matrix`` is the feature matrix the first version scored, when
+    it scored every row (otherwise None): imputed features are drawn at
+    random, so it is the only matrix that matches the probabilities.
+    ``n_jobs`` caps the threads of every forest call.
+    """
+    hashes = row_hashes(valid_df) if store is not None else None
+
+    def store_key(version):
+        # Early-exit probabilities are approximations; keep them apart
+        fingerprint = registry.fingerprints[version]
+        return f"{fingerprint}:early{early_exit_confidence}" if early_exit_confidence else fingerprint
+
+    probas, misses, trees_used = {}, {}, {}
+    for version in versions:
+        trees_used[version] = np.full(len(valid_df), -1, dtype=np.int64)
+        if store is not None and lookup:
+            found, proba = store.lookup(store_key(version), hashes)
+        else:
+            found, proba = np.zeros(len(valid_df), dtype=bool), np.full((len(valid_df), 2), np.nan)
+        probas[version] = proba
+        misses[version] = ~found
+
+    matrices = {}
+    for version in versions:
+        miss = misses[version]
+        if not miss.any():
+            continue
+        model = registry.get(version)
+        layout = tuple(model.feature_names_in_)
+        if layout not in matrices:
+            sharing = [other for other in versions
+                       if tuple(registry.get(other).feature_names_in_) == layout]
+            needed = np.logical_or.reduce([misses[other] for other in sharing])
+            matrix = preprocess_input_data(valid_df[needed], model, registry.encoders,
+                                           registry.used_columns(sharing), on_error)
+            if matrix is None:
+                return None, None, None, None
+            matrices[layout] = (needed, matrix)
+
+        needed, matrix = matrices[layout]
+        if early_exit_confidence:
+            probas[version][miss], trees_used[version][miss] = early_exit_predict_proba(
+                model, matrix[miss[needed]], early_exit_confidence)
+        else:
+            probas[version][miss] = forest_predict_proba(model, matrix[miss[needed]], n_jobs)
+            trees_used[version][miss] = len(model.estimators_)
+        if store is not None:
+            store.save(store_key(version), hashes[miss], probas[version][miss])
+
+    hits = {version: int((~misses[version]).sum()) for version in versions}
+    matrix = None
+    if misses[versions[0]].all():
+        matrix = matrices[tuple(registry.get(versions[0]).feature_names_in_)][1]
+    return probas, hits, trees_used, matrix
+
+def predict_batch(df, registry, version=None, compare_version=None, store=None, file_hash=None,
+                  early_exit_confidence=None, sequence_column=None, sequence_method='mean',
+                  on_error=st.error, governor=None, explain_top_k=None, monitor=None, audit=None):
+    """Validate ``df`` and score every valid row in one forest call.
+
+    When ``compare_version`` is given, the same preprocessed matrix is also
+    scored by that model and both target probabilities are returned as
+    ``target_probability_<version>`` columns for offline comparison.
+
+    With a ``store``, rows scored before by the same model are answered from
+    it and only new rows reach the forest; ``results_df.attrs`` then reports
+    ``store_hits`` and whether the upload (``file_hash``) was seen before.
+
+    With ``early_exit_confidence`` each row stops evaluating trees once its
+    decision is settled; the ``trees_used`` column records how many it used.
+
+    With ``sequence_column`` the valid rows are grouped by that id and one
+    row per sequence is returned (see SEQUENCE_AGGREGATIONS). ``features``
+    averages each sequence's inputs and scores only those rows; the other
+    methods score every row and aggregate the probabilities.
+
+    Returns ``(results_df, rejects_df)``; rows that fail validation are
+    listed in ``rejects_df`` with their reasons instead of being scored.
+    Errors are reported through ``on_error`` and return ``(None, None)``.
+
+    With a ``governor`` scoring holds a share of the process core budget
+    sized to the batch (one core per ``COMPUTE_ROWS_PER_CORE`` rows, one
+    for early exit, which evaluates trees one at a time) and queues while
+    the machine is saturated.
+
+    With ``explain_top_k`` every row gets ``top_feature_<i>`` and
+    ``top_contribution_<i>`` columns for the features that moved its target
+    probability the most (primary version, full forest). They explain the
+    matrix that produced ``target_probability``, so rows are not answered
+    from the store and early exit is off.
+
+    With a ``monitor`` every uploaded row, rejected or not, is added to the
+    live drift profile, and so are the primary version's probabilities.
+
+    With an ``audit`` log every scored row is queued for the log with the
+    primary version's probabilities, under one request id per call.
+    """
+    try:
+        version = version or registry.default_version
+        model = registry.get(version)
+        if explain_top_k:
+            # Contributions describe the full forest, so it must produce the probabilities too
+            early_exit_confidence = None
+
+        versions = [version] + ([compare_version] if compare_version else [])
+        valid_df, rejects_df, missing_columns = validate_batch(df, registry.encoders,
+                                                               registry.used_columns(versions))
+        if missing_columns:
+            on_error(f"Missing required columns: {', '.join(missing_columns)}")
+            return None, None
+        if monitor is not None:
+            monitor.update(df, encoders=registry.encoders)
+
+        if sequence_column and sequence_method == 'features':
+            valid_df = aggregate_sequence_features(valid_df, sequence_column)
+
+        results_df = valid_df.copy()
+        if len(valid_df) == 0:
+            return results_df, rejects_df
+
+        if store is not None and file_hash:
+            results_df.attrs['seen_file'] = store.seen_file(file_hash, registry.fingerprints[version]) is not None
+
+        want = 1 if early_exit_confidence else -(-len(valid_df) // COMPUTE_ROWS_PER_CORE)
+        with governed(governor, f"batch of {len(valid_df)} rows", want) as n_jobs:
+            # Explained rows are scored afresh: a stored probability came from
+            # an imputation draw that cannot be reproduced
+            probas, hits, trees_used, matrix = score_versions(valid_df, registry, versions, store,
+                                                              early_exit_confidence, n_jobs,
+                                                              lookup=not explain_top_k, on_error=on_error)
+        if probas is None:
+            return None, None
+
+        proba = probas[version]
+        if monitor is not None:
+            monitor.update(target_probability=proba[:, 1])
+        if audit is not None:
+            audit.log(partial(audit_records, valid_df, proba, version, 'batch', datetime.now(timezone.utc),
+                              uuid.uuid4().hex, file_hash, registry.fingerprints.get(version)), len(valid_df))
+        results_df['prediction'] = model.classes_.take(np.argmax(proba, axis=1))
+        results_df['target_probability'] = proba[:, 1]
+        results_df['non_target_probability'] = proba[:, 0]
+        results_df['confidence'] = proba.max(axis=1)
+        results_df['model_version'] = version
+        if early_exit_confidence:
+            results_df['trees_used'] = pd.array(trees_used[version], dtype='Int64')
+            results_df.loc[results_df['trees_used'] < 0, 'trees_used'] = pd.NA
+        results_df.attrs['store_hits'] = hits[version]
+
+        if explain_top_k:
+            with governed(governor, f"explanation of {len(valid_df)} rows",
+                          -(-len(valid_df) // COMPUTE_ROWS_PER_CORE)) as n_jobs:
+                features, contributions = top_contributions(
+                    model, registry.contribution_table(version), matrix, explain_top_k, n_jobs)
+                for i in range(features.shape[1]):
+                    results_df[f'top_feature_{i + 1}'] = features[:, i]
+                    results_df[f'top_contribution_{i + 1}'] = contributions[:, i]
+                results_df.attrs['base_rate'] = registry.contribution_table(version)[0]
+
+        if compare_version:
+            results_df[f'target_probability_{version}'] = proba[:, 1]
+            results_df[f'target_probability_{compare_version}'] = probas[compare_version][:, 1]
+
+        if store is not None and file_hash:
+            store.record_file(file_hash, registry.fingerprints[version], len(df))
+
+        if sequence_column and sequence_method != 'features':
+            results_df = aggregate_sequence_predictions(results_df, sequence_column, sequence_method,
+                                                        model.classes_)
+
+        return results_df, rejects_df
+
+    except Exception as e:
+        on_error(f"Error making batch prediction: {str(e)}")
+        return None, None
+
+def batch_memory_plan(admission, registry, file_columns, rows, columns=None, version=None, held_key=None,
+                      upload_bytes=0, decoded_bytes=0):
+    """Admission plan for ``rows`` of an upload, from the columns that will be read.
+
+    ``upload_bytes`` (the upload itself, resident while it is scored) and
+    the read columns' share of ``decoded_bytes`` (see read_batch_schema)
+    are added to the estimate. ``held_key`` is the upload's content hash
+    when its parsed frame may already be cached, so it is not counted twice.
+    """
+    read = [col for col in file_columns if columns is None or col in columns]
+    n_features = registry.get(version or registry.default_version).n_features_in_
+    input_bytes = upload_bytes + decoded_bytes * len(read) / max(len(file_columns), 1)
+    return admission.plan(rows, len(read), n_features, held_key, input_bytes)
+
+def score_batch_member(name, data, registry, columns=None, admission=None, **options):
+    """Parse and score one file of a multi-file upload.
+
+    Runs on a worker thread, so nothing is drawn here; problems are
+    returned in the ``error`` field. ``options`` go to predict_batch.
+
+    With ``admission`` the file is only parsed once its estimated working
+    set fits the memory budget; files that would need chunking are
+    refused, since they are better uploaded on their own.
+    """
+    errors = []
+    results_df, rejects_df, total_records = None, None, 0
+    try:
+        plan = None
+        if admission is not None:
+            file_columns, rows, decoded_bytes = read_batch_schema(io.BytesIO(data), name=name)
+            plan = batch_memory_plan(admission, registry, file_columns, rows, columns, options.get('version'),
+                                     upload_bytes=len(data), decoded_bytes=decoded_bytes)
+        if plan is not None and plan['mode'] not in ('full', 'queue'):
+            errors.append(f"Needs about {plan['estimate'] / 2**20:.0f} MB, more than the memory budget "
+                          f"allows next to other files; upload it on its own")
+        else:
+            reservation = (admission.reserve(plan['estimate'], name, plan['units'], MEMORY_WAIT_TIMEOUT)
+                           if plan is not None else nullcontext())
+            with reservation:
+                df = read_batch_file(io.BytesIO(data), columns, name=name)
+                total_records = len(df)
+                results_df, rejects_df = predict_batch(df, registry, file_hash=content_hash(data),
+                                                       on_error=errors.append, **options)
+            if results_df is None and not errors:
+                errors.append("Could not preprocess the data")
+    except TimeoutError as e:
+        errors.append(str(e))
+    except Exception as e:
+        errors.append(f"Error reading file: {str(e)}")
+    return {
+        'name': name,
+        'results': results_df,
+        'rejects': rejects_df,
+        'total_records': total_records,
+        'error': '; '.join(errors) or None,
+    }
+
+def combine_batch_files(file_results):
+    """Stack per-file results into one batch tagged with ``source_file``.
+
+    Returns ``(results_df, rejects_df, files_df)`` where ``files_df`` has
+    one summary row per file.
+    """
+    results, rejects, files = [], [], []
+    for item in file_results:
+        scored = item['results'] if item['results'] is not None else pd.DataFrame()
+        rejected = item['rejects'] if item['rejects'] is not None else pd.DataFrame()
+        if len(scored) > 0:
+            results.append(scored.assign(source_file=item['name']))
+        if len(rejected) > 0:
+            rejects.append(rejected.assign(source_file=item['name']))
+        files.append({
+            'file': item['name'],
+            'records': item['total_records'],
+            'scored': len(scored),
+            'target': int((scored['prediction'] == 1).sum()) if len(scored) > 0 else 0,
+            'non_target': int((scored['prediction'] == 0).sum()) if len(scored) > 0 else 0,
+            'rejected': len(rejected),
+            'error': item['error'] or '',
+        })
+
+    def stack(frames):
+        if not frames:
+            return pd.DataFrame()
+        stacked = pd.concat(frames)
+        return stacked[['source_file'] + [col for col in stacked.columns if col != 'source_file']]
+
+    results_df = stack(results)
+    results_df.attrs['store_hits'] = sum(item['results'].attrs.get('store_hits', 0)
+                                         for item in file_results if item['results'] is not None)
+    files_df = pd.DataFrame(files, columns=['file', 'records', 'scored', 'target', 'non_target',
+                                            'rejected', 'error'])
+    return results_df, stack(rejects), files_df
+
+def process_batch_files(uploaded_files, registry, columns=None, workers=BATCH_WORKERS, **options):
+    """Score every file of a multi-file upload on a thread pool.
+
+    Archive members are decompressed one after another on this thread and
+    handed to the pool while earlier files are still being scored; at most
+    two files per worker wait in memory. Progress is drawn per file.
+    Files are tracked by position, and a name seen before in the batch is
+    reported with a ``(2)``, ``(3)``... suffix so results stay apart.
+    """
+    progress = st.progress(0.0, text="Reading files...")
+    status_view = st.empty()
+    names, statuses = [], []
+    file_results = {}
+
+    def add(name, status):
+        label, copy_number = name, 1
+        while label in names:
+            copy_number += 1
+            label = f"{name} ({copy_number})"
+        names.append(label)
+        statuses.append(status)
+        return len(names) - 1
+
+    def collect(futures):
+        for future in futures:
+            position = submitted.pop(future)
+            item = dict(future.result(), name=names[position])
+            file_results[position] = item
+            statuses[position] = (f"❌ {item['error']}" if item['error'] else
+                                  f"✅ {len(item['results'])} scored, {len(item['rejects'])} rejected")
+
+    def draw():
+        progress.progress(len(file_results) / max(len(statuses), 1),
+                          text=f"{len(file_results)} of {len(statuses)} files scored")
+        status_view.dataframe(pd.DataFrame({'File': names, 'Status': statuses}),
+                              hide_index=True, use_container_width=True)
+
+    pending, submitted = set(), {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for uploaded_file in uploaded_files:
+            try:
+                for name, data in iter_batch_members(uploaded_file):
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    position = add(name, "⏳ Queued")
+                    future = pool.submit(score_batch_member, name, data, registry, columns, **options)
+                    submitted[future] = position
+                    pending.add(future)
+                    draw()
+            except Exception as e:
+                error = f"Error reading archive: {str(e)}"
+                position = add(uploaded_file.name, f"❌ {error}")
+                file_results[position] = {'name': names[position], 'results': None, 'rejects': None,
+                                          'total_records': 0, 'error': error}
+                draw()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+            draw()
+
+    progress.empty()
+    status_view.empty()
+    # Report files in upload order rather than completion order
+    return [file_results[position] for position in sorted(file_results)]
+
+def compact_results(results_df):
+    """Prediction columns of a scored chunk, without the inputs"""
+    return results_df[[col for col in results_df.columns if col in PREDICTION_COLUMNS
+                       or col.startswith(('target_probability_', 'top_feature_', 'top_contribution_'))]]
+
+def process_batch_chunks(uploaded_file, registry, columns, chunk_rows, spill_path=None, estimated_rows=None,
+                         **options):
+    """Score an upload too large to parse at once, ``chunk_rows`` at a time.
+
+    Only the prediction columns of each chunk are kept, and rejected rows
+    keep their row number and reason. With ``spill_path`` results are
+    streamed to that Parquet file instead; the first SPILL_PREVIEW_ROWS
+    stay in memory and ``results_df.attrs['summary']`` holds the totals.
+    ``options`` go to predict_batch.
+
+    Returns ``(results_df, rejects_df, total_records)``, or ``(None, None,
+    total_records)`` when a chunk fails.
+    """
+    progress = st.progress(0.0, text="Scoring in chunks...")
+    results, rejects = [], []
+    summary = {'rows': 0, 'target': 0, 'non_target': 0, 'confidence_sum': 0.0}
+    writer, kept, store_hits, offset = None, 0, 0, 0
+    try:
+        for chunk in iter_batch_chunks(uploaded_file, columns, chunk_rows):
+            results_df, rejects_df = predict_batch(chunk, registry, **options)
+            if results_df is None:
+                return None, None, offset
+            if len(rejects_df) > 0:
+                rejects.append(rejects_df[['row_number', 'reject_reason']].assign(
+                    row_number=rejects_df['row_number'] + offset))
+            results_df = compact_results(results_df)
+            store_hits += results_df.attrs.get('store_hits', 0)
+            offset += len(chunk)
+            summary['rows'] += len(results_df)
+            if len(results_df) > 0:
+                summary['target'] += int((results_df['prediction'] == 1).sum())
+                summary['non_target'] += int((results_df['prediction'] == 0).sum())
+                summary['confidence_sum'] += float(results_df['confidence'].sum())
+
+            if spill_path is None:
+                results.append(results_df)
+            elif len(results_df) > 0:
+                table = pa.Table.from_pandas(results_df, preserve_index=False)
+                if writer is None:
+                    os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+                    writer = pq.ParquetWriter(spill_path, table.schema)
+                writer.write_table(table)
+                if kept < SPILL_PREVIEW_ROWS:
+                    results.append(results_df.head(SPILL_PREVIEW_ROWS - kept))
+                    kept += len(results[-1])
+
+            done = min(offset / estimated_rows, 1.0) if estimated_rows else 0.0
+            progress.progress(done, text=f"{offset} records scored in chunks of {chunk_rows}")
+    finally:
+        if writer is not None:
+            writer.close()
+        progress.empty()
+
+    results_df = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=PREDICTION_COLUMNS)
+    results_df.attrs['store_hits'] = store_hits
+    if spill_path is not None:
+        results_df.attrs['summary'] = summary
+    rejects_df = (pd.concat(rejects, ignore_index=True) if rejects
+                  else pd.DataFrame(columns=['row_number', 'reject_reason']))
+    return results_df, rejects_df, offset
+
+class SpillFile:
+    """Uniquely named Parquet file holding one batch's spilled results.
+
+    Deleted by ``remove``, or when the object is garbage collected, i.e.
+    once its batch leaves the session state or the session ends.
+    """
+
+    def __init__(self, directory=SPILL_DIR):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix='.parquet', dir=directory)
+        os.close(fd)
+        self.remove = weakref.finalize(self, remove_file, self.path)
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+@st.cache_resource
+def sweep_spill_dir():
+    """Delete stale spill files once per process"""
+    if not os.path.isdir(SPILL_DIR):
+        return
+    cutoff = time.time() - SPILL_MAX_AGE_SECONDS
+    for entry in os.scandir(SPILL_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+def discard_batch_results():
+    """Drop the session's batch results and the file they spilled to, if any"""
+    batch = st.session_state.pop('batch_results', None)
+    if batch is not None and batch.get('spill') is not None:
+        batch['spill'].remove()
+
 def show_loading_animation():
     """Create a removable loader and return its placeholder."""
     holder = st.empty()
@@ -384,6 +1739,417 @@ def show_loading_animation():
     """, unsafe_allow_html=True)
     return holder
 
+def upload_content_hash(uploaded_file):
+    """Content hash of an upload, computed once per uploaded file"""
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    if uploaded_file.file_id not in hashes:
+        # Enough room for a multi-file upload; the oldest entries go first
+        while len(hashes) >= 256:
+            hashes.pop(next(iter(hashes)))
+        hashes[uploaded_file.file_id] = content_hash(uploaded_file.getvalue())
+    return hashes[uploaded_file.file_id]
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_batch_schema(file_hash, file_name, _uploaded_file):
+    """Column names, row count and decoded size of an upload, read once per content hash"""
+    _uploaded_file.seek(0)
+    return read_batch_schema(_uploaded_file)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_batch_upload(file_hash, file_name, columns, _uploaded_file, _plan=None):
+    """Parse an upload once per content hash and column selection.
+
+    Cached as a resource so reruns get the parsed frame back without a
+    copy; callers must not modify it in place. With an admission ``_plan``
+    its estimate is reserved while parsing, which raises TimeoutError when
+    memory does not free up. The frame is held against the memory budget
+    under ``file_hash`` until the cache drops it.
+    """
+    admission = load_memory_admission()
+    reservation = (admission.reserve(_plan['estimate'], f"parsing {file_name}", timeout=MEMORY_WAIT_TIMEOUT,
+                                     held_key=file_hash)
+                   if _plan is not None else nullcontext())
+    with reservation:
+        _uploaded_file.seek(0)
+        df = read_batch_file(_uploaded_file, set(columns) if columns is not None else None)
+    admission.hold(file_hash, int(df.memory_usage(deep=True).sum()), owner=df)
+    return df
+
+# Result tables are sent to the browser one page at a time
+RESULTS_PAGE_SIZES = [25, 100, 500]
+PREDICTION_COLUMNS = ['source_file', 'records', 'prediction', 'target_probability', 'non_target_probability',
+                      'confidence', 'model_version', 'trees_used']
+
+def display_order(df, sort_column, descending, sort_orders):
+    """Row positions of ``df`` sorted by ``sort_column`` (file order if None).
+
+    Each order is computed once and kept in ``sort_orders``, so paging and
+    filtering only index into it.
+    """
+    if sort_column is None:
+        return np.arange(len(df))
+    key = (sort_column, descending)
+    if key not in sort_orders:
+        values = df[sort_column].reset_index(drop=True)
+        sort_orders[key] = values.sort_values(ascending=not descending, kind='stable',
+                                              na_position='last').index.to_numpy()
+    return sort_orders[key]
+
+def display_paginated_table(df, key, sort_orders, mask=None, columns=None):
+    """Show one page of ``df``; only that slice is serialized to the browser.
+
+    Sorting and filtering (``mask`` over the rows) run on the server, so the
+    payload depends on the page size rather than on the size of the batch.
+    """
+    columns = list(df.columns) if columns is None else columns
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_column = st.selectbox("Sort by", [None] + columns, key=f"{key}_sort",
+                                   format_func=lambda col: "File order" if col is None else col)
+    with col2:
+        descending = st.checkbox("Descending", key=f"{key}_descending")
+    with col3:
+        page_size = st.selectbox("Rows per page", RESULTS_PAGE_SIZES, key=f"{key}_page_size")
+
+    positions = display_order(df, sort_column, descending, sort_orders)
+    if mask is not None:
+        positions = positions[mask[positions]]
+
+    page_count = max(1, -(-len(positions) // page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key=page_key)
+
+    start = (page - 1) * page_size
+    shown = positions[start:start + page_size]
+    st.dataframe(df.iloc[shown][columns], use_container_width=True)
+
+    caption = f"Page {page} of {page_count}: rows {start + 1 if len(shown) else 0}-{start + len(shown)} of {len(positions)}"
+    if len(positions) != len(df):
+        caption += f" matching the filters ({len(df)} in total)"
+    st.caption(caption)
+
+def display_batch_results(batch):
+    """Render batch results kept in session state"""
+    results_df = batch['results']
+    rejects_df = batch['rejects']
+    timestamp = batch['created'].strftime('%Y%m%d_%H%M%S')
+    # Widget keys are per batch, so a new batch starts with fresh filters
+    view = batch['created'].strftime('%Y%m%d%H%M%S%f')
+
+    files_df = batch.get('files')
+    if files_df is not None:
+        # One row per uploaded file or archive member
+        st.markdown("### 🗂️ Per-File Results")
+        failed = int((files_df['error'] != '').sum())
+        if failed:
+            st.warning(f"⚠️ {failed} of {len(files_df)} files could not be scored.")
+        display_paginated_table(files_df, f"files_{view}", batch.setdefault('file_sort_orders', {}))
+
+    if len(results_df) > 0:
+        # Display summary
+        st.markdown("### 📊 Results Summary")
+
+        sequence_column = batch.get('sequence_column')
+        if sequence_column:
+            st.info(f"🧩 {len(results_df)} sequences by `{sequence_column}` "
+                    f"({SEQUENCE_AGGREGATIONS[batch['sequence_method']].lower()}), "
+                    f"from {int(results_df['records'].sum())} valid records.")
+
+        # Spilled batches keep only their first rows in memory; totals come from the summary
+        summary = batch.get('summary')
+        spill = batch.get('spill')
+        if spill is not None:
+            st.info(f"💽 {summary['rows']} records were scored in chunks and written to disk; the table below "
+                    f"shows the first {len(results_df)}. Download the Parquet file for all results.")
+
+        store_hits = results_df.attrs.get('store_hits', 0)
+        if results_df.attrs.get('seen_file'):
+            st.info(f"♻️ This file was scored before; {store_hits} of {len(results_df)} records were answered from the prediction store.")
+        elif store_hits:
+            st.info(f"♻️ {store_hits} of {len(results_df)} records were answered from the prediction store.")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total Sequences" if sequence_column else "Total Records",
+                      summary['rows'] if summary else len(results_df))
+        with col2:
+            target_count = summary['target'] if summary else int((results_df['prediction'] == 1).sum())
+            st.metric("Target Predictions", target_count)
+        with col3:
+            non_target_count = summary['non_target'] if summary else int((results_df['prediction'] == 0).sum())
+            st.metric("Non-Target Predictions", non_target_count)
+        with col4:
+            avg_confidence = (summary['confidence_sum'] / summary['rows'] if summary
+                              else results_df['confidence'].mean())
+            st.metric("Avg Confidence", f"{avg_confidence:.1%}")
+
+        if 'trees_used' in results_df.columns and results_df['trees_used'].notna().any():
+            st.caption(f"⚡ Early exit: {results_df['trees_used'].mean():.1f} trees per scored record on average")
+        
+        # Display detailed results, filtered and paged on the server
+        st.markdown("### 📋 Detailed Results")
+        source_file = None
+        if files_df is not None:
+            source_file = st.selectbox("File", [None] + files_df.loc[files_df['scored'] > 0, 'file'].tolist(),
+                                       format_func=lambda name: "All files" if name is None else name,
+                                       key=f"results_file_{view}")
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            classes = sorted(results_df['prediction'].unique().tolist())
+            shown_classes = st.multiselect("Prediction", classes, default=classes, key=f"results_classes_{view}")
+        with col2:
+            low, high = st.slider("Confidence", 0.5, 1.0, (0.5, 1.0), 0.01, key=f"results_confidence_{view}")
+        with col3:
+            show_inputs = st.checkbox("Show input columns", key=f"results_inputs_{view}")
+
+        confidence = results_df['confidence'].to_numpy()
+        mask = (results_df['prediction'].isin(shown_classes).to_numpy()
+                & (confidence >= low) & (confidence <= high))
+        if source_file is not None:
+            mask &= (results_df['source_file'] == source_file).to_numpy()
+        columns = list(results_df.columns)
+        if not show_inputs:
+            columns = [col for col in columns if col == sequence_column or col in PREDICTION_COLUMNS
+                       or col.startswith(('target_probability_', 'top_feature_', 'top_contribution_'))]
+        display_paginated_table(results_df, f"results_{view}", batch.setdefault('sort_orders', {}),
+                                mask=mask, columns=columns)
+        
+        if source_file is not None:
+            file_csvs = batch.setdefault('file_csvs', {})
+            if source_file not in file_csvs:
+                file_csvs[source_file] = results_df[results_df['source_file'] == source_file].to_csv(index=False)
+            st.download_button(
+                label=f"💾 Download Results for {os.path.basename(source_file)}",
+                data=file_csvs[source_file],
+                file_name=f"prediction_results_{os.path.splitext(os.path.basename(source_file))[0]}_{timestamp}.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+        if spill is not None:
+            # The full results never fit in memory; serve the file written while scoring
+            with open(spill.path, 'rb') as f:
+                st.download_button(
+                    label="💾 Download Results (Parquet)",
+                    data=f,
+                    file_name=f"prediction_results_{timestamp}.parquet",
+                    mime="application/octet-stream",
+                    use_container_width=True
+                )
+        else:
+            # Download button (CSV rendered once, then reused on reruns)
+            if 'results_csv' not in batch:
+                batch['results_csv'] = results_df.to_csv(index=False)
+            st.download_button(
+                label="💾 Download Results",
+                data=batch['results_csv'],
+                file_name=f"prediction_results_{timestamp}.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+    else:
+        st.error("❌ No valid predictions generated. Please check your data format.")
+
+    if rejects_df is not None and len(rejects_df) > 0:
+        # Rows that failed validation, with reasons
+        st.markdown("### 🚫 Rejected Records")
+        st.warning(f"⚠️ {len(rejects_df)} of {batch['total_records']} records failed validation and were not scored.")
+        display_paginated_table(rejects_df, f"rejects_{view}", batch.setdefault('reject_sort_orders', {}))
+
+        if 'rejects_csv' not in batch:
+            batch['rejects_csv'] = rejects_df.to_csv(index=False)
+        st.download_button(
+            label="💾 Download Rejected Records",
+            data=batch['rejects_csv'],
+            file_name=f"rejected_records_{timestamp}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+
+def feature_usage_report(model, used_features):
+    """Per feature group counts of features the forest splits on"""
+    groups = {'thm_': 'Time-domain (thm_)', 'tof_': 'Time-of-flight (tof_)'}
+    rows = {}
+    for feature in model.feature_names_in_:
+        group = next((label for prefix, label in groups.items() if feature.startswith(prefix)),
+                     'Sensor & user inputs')
+        row = rows.setdefault(group, {'Feature Group': group, 'Total': 0, 'Used': 0})
+        row['Total'] += 1
+        row['Used'] += int(feature in used_features)
+    report = pd.DataFrame(list(rows.values()))
+    report['Never Split On'] = report['Total'] - report['Used']
+    return report
+
+def display_feature_usage(registry):
+    """Show how many input features each model version actually uses"""
+    st.markdown("### 🔬 Feature Usage")
+    for name in registry.names:
+        model = registry.get(name)
+        used = registry.used_features[name]
+        unused = [feature for feature in model.feature_names_in_ if feature not in used]
+        title = f"**{name}:** " if len(registry.names) > 1 else ""
+        st.markdown(f"{title}{len(used)} of {model.n_features_in_} features appear in at least one "
+                    f"split; {len(unused)} are never used and are skipped during preprocessing and upload.")
+        st.dataframe(feature_usage_report(model, used), hide_index=True, use_container_width=True)
+        if unused:
+            with st.expander(f"Unused features ({len(unused)})"):
+                st.write(", ".join(unused))
+
+def display_compute_diagnostics(governor):
+    """Show the governor's current core allocation across sessions"""
+    st.markdown("### 🖥️ Compute Diagnostics")
+    snapshot = governor.snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Core Budget", snapshot['cores'])
+    with col2:
+        st.metric("Cores In Use", snapshot['cores'] - snapshot['free'])
+    with col3:
+        st.metric("Queued Jobs", snapshot['queued'])
+    with col4:
+        st.metric("Avg Queue Wait", f"{snapshot['avg_wait_s']:.2f}s")
+    if snapshot['active']:
+        st.dataframe(pd.DataFrame(snapshot['active']), hide_index=True, use_container_width=True)
+    else:
+        st.caption("No prediction jobs running.")
+    st.caption(f"{snapshot['completed']} jobs completed; longest queue wait {snapshot['max_wait_s']:.2f}s. "
+               f"Set CMI_COMPUTE_CORES to change the budget.")
+    if st.button("🔄 Refresh Diagnostics"):
+        st.rerun()
+
+def display_memory_diagnostics(admission):
+    """Show the memory budget for batches and how past estimates compared to measured peaks"""
+    st.markdown("### 🧮 Memory Diagnostics")
+    snapshot = admission.snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Batch Budget", f"{snapshot['budget_mb'] - snapshot['baseline_mb']:,.0f} MB")
+    with col2:
+        st.metric("Reserved", f"{snapshot['reserved_mb']:,.0f} MB")
+    with col3:
+        st.metric("Process RSS", f"{snapshot['rss_mb']:,.0f} MB")
+    with col4:
+        st.metric("Estimate Scale", f"{snapshot['scale']:.2f}x")
+    if snapshot['history']:
+        st.dataframe(pd.DataFrame(snapshot['history']), hide_index=True, use_container_width=True)
+    else:
+        st.caption("No batch jobs measured yet.")
+    st.caption(f"{snapshot['running']} batch jobs running; {snapshot['held_mb']:,.0f} MB held by cached uploads. The scale is learned from the peak memory of "
+               f"batches that ran alone. Set CMI_MEMORY_BUDGET_MB to change the budget.")
+
+def display_audit_diagnostics(audit):
+    """Show how far the audit log writer is behind the predictions"""
+    st.markdown("### 🧾 Audit Log")
+    snapshot = audit.snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Predictions Logged", f"{snapshot['logged_rows']:,}")
+    with col2:
+        st.metric("Written", f"{snapshot['written_rows']:,}")
+    with col3:
+        st.metric("Pending", f"{snapshot['pending_rows']:,}")
+    with col4:
+        st.metric("Files", snapshot['files'])
+    current = f"writing `{snapshot['current_file']}`" if snapshot['current_file'] else "no file open"
+    st.caption(f"{snapshot['format'].title()} files in `{AUDIT_DIR}`, {current}; {snapshot['flushes']} flushes, "
+               f"{snapshot['blocked_s']:.2f}s of predictions blocked waiting for the writer.")
+    if snapshot['errors']:
+        st.error(f"❌ {snapshot['errors']} audit log writes failed; last error: {snapshot['last_error']}")
+
+def display_drift_monitoring(monitor):
+    """Compare the live input and prediction profile with the training reference"""
+    st.markdown("### 📉 Input Drift")
+    snapshot = monitor.snapshot()
+    if snapshot['rows'] == 0 and not snapshot['probability'].any():
+        st.caption("No predictions monitored yet.")
+        return
+
+    report = monitor.report()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Records Monitored", f"{snapshot['rows']:,}")
+    with col2:
+        st.metric("Drifted Inputs", int((report['status'] == 'drift').sum()))
+    with col3:
+        st.metric("Inputs To Watch", int((report['status'] == 'watch').sum()))
+    with col4:
+        st.metric("Monitoring Since", datetime.fromtimestamp(snapshot['started']).strftime('%Y-%m-%d'))
+
+    if snapshot['reference_probability'] is None:
+        st.info(f"ℹ️ No reference profile at `{DRIFT_REFERENCE_PATH}`; only live statistics are shown. "
+                f"Build one from the training data with `python build_drift_reference.py --data <file>`.")
+    status_icons = {'drift': '🔴 drift', 'watch': '🟡 watch', 'stable': '🟢 stable',
+                    'too few values': '⚪ too few values', 'no reference': '⚪ no reference'}
+    st.dataframe(report.assign(status=report['status'].map(status_icons)), hide_index=True,
+                 use_container_width=True)
+
+    # Distribution of predicted target probabilities, live against reference
+    counts = snapshot['probability'][1:-1]
+    bins = len(counts)
+    labels = [f"{i / bins:.2f}" for i in range(bins)]
+    chart = pd.DataFrame({'Live': counts / max(counts.sum(), 1)}, index=labels)
+    if snapshot['reference_probability'] is not None:
+        reference = snapshot['reference_probability'][1:-1]
+        chart['Reference'] = reference / max(reference.sum(), 1)
+    st.markdown("**Predicted target probability**")
+    st.bar_chart(chart)
+    st.caption(f"PSI (population stability index) per input: below {PSI_WATCH} stable, {PSI_DRIFT} and above "
+               f"drifted. Out-of-range shares count values outside the documented input ranges, including "
+               f"rejected batch rows. The profile is saved to `{DRIFT_PROFILE_PATH}` every "
+               f"{DRIFT_PERSIST_SECONDS}s.")
+    if st.button("♻️ Reset Drift Monitoring"):
+        monitor.reset()
+        st.rerun()
+
+def display_feature_contributions(info, model, input_data, top_k):
+    """Show the features that moved a single prediction the most"""
+    contributions = info['contributions']
+    top = np.argsort(-np.abs(contributions))[:top_k]
+    features = np.asarray(model.feature_names_in_)[top]
+    st.markdown("### 🔍 Why This Prediction")
+    st.dataframe(pd.DataFrame({
+        'Feature': features,
+        'Input Value': [str(input_data.get(feature, 'imputed')) for feature in features],
+        'Contribution': [f"{value:+.1%}" for value in contributions[top]],
+    }), hide_index=True, use_container_width=True)
+    st.caption(f"Base rate {info['base_rate']:.1%}; positive contributions push towards TARGET. "
+               f"Base rate plus all contributions gives the full forest's target probability "
+               f"({info['base_rate'] + contributions.sum():.1%}).")
+
+def display_what_if_sweep(points, used_features=None):
+    """Plot target probability across a what-if sweep"""
+    columns = [col for col in points.columns if col != 'target_probability']
+    st.markdown("### 📈 What-If Sweep")
+    unused = [col for col in columns if used_features is not None and col not in used_features]
+    if unused:
+        st.info(f"ℹ️ The model never splits on {', '.join(unused)}, so varying it cannot change the prediction.")
+
+    if len(columns) == 1:
+        st.line_chart(points.set_index(columns[0])['target_probability'])
+    else:
+        x, y = columns
+        st.altair_chart(alt.Chart(points).mark_rect().encode(
+            x=alt.X(f'{x}:O', axis=alt.Axis(format='.3~f', labelOverlap=True)),
+            y=alt.Y(f'{y}:O', axis=alt.Axis(format='.3~f', labelOverlap=True), sort='descending'),
+            color=alt.Color('target_probability:Q', scale=alt.Scale(domain=[0, 1], scheme='redblue', reverse=True),
+                            title='Target probability'),
+            tooltip=columns + [alt.Tooltip('target_probability:Q', format='.1%')],
+        ), use_container_width=True)
+
+    probability = points['target_probability']
+    lowest, highest = points.loc[probability.idxmin()], points.loc[probability.idxmax()]
+    describe = lambda row: ", ".join(f"{col}={row[col]:.3g}" for col in columns)
+    st.caption(f"{len(points)} variants scored in one forest call. Target probability ranges from "
+               f"{lowest['target_probability']:.1%} ({describe(lowest)}) to "
+               f"{highest['target_probability']:.1%} ({describe(highest)}); "
+               f"{int((probability > 0.5).sum())} variants are predicted TARGET.")
+    with st.expander("Sweep values"):
+        st.dataframe(points, hide_index=True, use_container_width=True)
+        st.download_button("💾 Download Sweep", points.to_csv(index=False),
+                           file_name=f"what_if_sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                           mime="text/csv")
+
 def display_prediction_result(prediction, probability):
     """Display prediction result with custom styling"""
     if prediction is None or probability is None:
@@ -417,7 +2183,7 @@ def display_prediction_result(prediction, probability):
 
 def main():
     # Load models
-    model, encoders = load_models()
+    registry = load_registry()
     
     # Sidebar navigation
     st.sidebar.markdown("""
@@ -432,6 +2198,19 @@ def main():
         ["📊 Single Prediction", "📁 Batch Prediction", "ℹ️ About"],
         label_visibility="collapsed"
     )
+
+    # Inference settings shared by both prediction pages
+    early_exit_confidence = None
+    if st.sidebar.checkbox("⚡ Early-exit inference",
+                           help="Stop evaluating trees once the target/non-target decision is settled"):
+        early_exit_confidence = st.sidebar.select_slider(
+            "Decision confidence", options=EARLY_EXIT_CONFIDENCES, value=0.99)
+    explain_top_k = None
+    if st.sidebar.checkbox("🔍 Explain predictions",
+                           help="Show the features that pushed each prediction towards or away from TARGET"):
+        explain_top_k = st.sidebar.select_slider("Top features", options=EXPLANATION_TOP_K, value=3)
+        if early_exit_confidence:
+            st.sidebar.caption("Explained predictions use the full forest; early exit is off for them.")
     
     # Main content
     if page == "📊 Single Prediction":
@@ -473,126 +2252,300 @@ def main():
             shoulder_to_wrist_cm = st.number_input("Shoulder to Wrist (cm)", min_value=20.0, max_value=100.0, value=65.0, format="%.1f")
             elbow_to_wrist_cm = st.number_input("Elbow to Wrist (cm)", min_value=10.0, max_value=50.0, value=28.0, format="%.1f")
         
+        input_data = {
+            'acc_x': acc_x, 'acc_y': acc_y, 'acc_z': acc_z,
+            'rot_w': rot_w, 'rot_x': rot_x, 'rot_y': rot_y, 'rot_z': rot_z,
+            'sex': sex, 'handedness': handedness, 'adult_child': adult_child,
+            'age': age, 'height_cm': height_cm,
+            'shoulder_to_wrist_cm': shoulder_to_wrist_cm,
+            'elbow_to_wrist_cm': elbow_to_wrist_cm
+        }
+
+        # What-if sweep: vary one or two inputs around the values above
+        grid = {}
+        if st.checkbox("📈 What-if sweep", help="Score a grid of variants of this record in one forest call"):
+            sweep_columns = st.multiselect("Inputs to vary", SWEEP_COLUMNS, default=['acc_z'], max_selections=2)
+            for col in sweep_columns:
+                low, high = INPUT_RANGES[col]
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    start, stop = st.slider(f"{col} range", low, high, (low, high), key=f"sweep_range_{col}")
+                with col2:
+                    n_points = st.selectbox("Points", SWEEP_POINTS, index=2 if len(sweep_columns) == 1 else 1,
+                                            key=f"sweep_points_{col}")
+                values = np.linspace(start, stop, n_points)
+                grid[col] = np.unique(np.round(values)) if col == 'age' else values
+
         # Prediction button
         st.markdown("<br>", unsafe_allow_html=True)
         col1, col2, col3 = st.columns([1, 2, 1])
         
-        with col2:
-            if st.button("🚀 Predict Behavior", use_container_width=True):
-                loader = show_loading_animation()
-                try:
-                    time.sleep(1)  # (optional) simulate
-                    input_data = {
-                        'acc_x': acc_x, 'acc_y': acc_y, 'acc_z': acc_z,
-                        'rot_w': rot_w, 'rot_x': rot_x, 'rot_y': rot_y, 'rot_z': rot_z,
-                        'sex': sex, 'handedness': handedness, 'adult_child': adult_child,
-                        'age': age, 'height_cm': height_cm,
-                        'shoulder_to_wrist_cm': shoulder_to_wrist_cm,
-                        'elbow_to_wrist_cm': elbow_to_wrist_cm
-                    }
-                    prediction, probability = make_prediction(input_data, model, encoders)
-                finally:
-                    # ALWAYS clear the loader, success or error
-                    loader.empty()
-
-                if prediction is not None:
-                    display_prediction_result(prediction, probability)
+        if grid:
+            with col2:
+                run_sweep = st.button("📈 Run Sweep", use_container_width=True)
+            if run_sweep and registry is not None:
+                version = registry.route()
+                points = what_if_sweep(input_data, grid, registry.get(version), registry.encoders,
+                                       used_features=registry.used_features[version],
+                                       governor=load_compute_governor())
+                if points is not None:
+                    display_what_if_sweep(points, registry.used_features[version])
+                    if len(registry.names) > 1:
+                        st.caption(f"Served by model version: {version}")
                 else:
-                    st.error("❌ Failed to make prediction. Please check your input data.")
+                    st.error("❌ Failed to run the sweep. Please check your input data.")
+        else:
+            with col2:
+                if st.button("🚀 Predict Behavior", use_container_width=True):
+                    loader = show_loading_animation()
+                    try:
+                        time.sleep(1 * UI_DELAY_SCALE)  # (optional) simulate
+                        prediction, probability = None, None
+                        info = {}
+                        if registry is not None:
+                            version = registry.route()
+                            prediction, probability = make_prediction(
+                                input_data, registry.get(version), registry.encoders,
+                                early_exit_confidence=early_exit_confidence, info=info,
+                                used_features=registry.used_features[version],
+                                governor=load_compute_governor(),
+                                monitor=load_drift_monitor(),
+                                audit=load_audit_log(), model_version=version,
+                                model_fingerprint=registry.fingerprints.get(version),
+                                contribution_table=registry.contribution_table(version) if explain_top_k else None)
+                    finally:
+                        # ALWAYS clear the loader, success or error
+                        loader.empty()
+
+                    if prediction is not None:
+                        display_prediction_result(prediction, probability)
+                        if len(registry.names) > 1:
+                            st.caption(f"Served by model version: {version}")
+                        if early_exit_confidence:
+                            st.caption(f"⚡ Evaluated {info['trees_used']} of {len(registry.get(version).estimators_)} trees")
+                        if explain_top_k:
+                            display_feature_contributions(info, registry.get(version), input_data, explain_top_k)
+                    else:
+                        st.error("❌ Failed to make prediction. Please check your input data.")
     
     elif page == "📁 Batch Prediction":
         st.markdown("""
         <div style="text-align: center; margin-bottom: 40px;">
             <h1>📁 Batch Prediction</h1>
             <p style="color: var(--text-secondary); font-size: 1.1rem;">
-                Process multiple records at once with CSV upload
+                Process multiple records at once with CSV, Parquet or Arrow uploads, or archives of them
             </p>
         </div>
         """, unsafe_allow_html=True)
         
         # File upload
-        uploaded_file = st.file_uploader(
-            "Upload CSV file",
-            type=['csv'],
-            help="Upload a CSV file with the required columns"
+        uploaded_files = st.file_uploader(
+            "Upload data files",
+            type=BATCH_FILE_TYPES + ARCHIVE_FILE_TYPES,
+            accept_multiple_files=True,
+            help="Upload CSV, Parquet or Arrow IPC/Feather files with the required columns, "
+                 "or zip/tar.gz archives of them"
         )
         
-        if uploaded_file is not None:
+        if not uploaded_files:
+            # Removing the upload discards its results
+            discard_batch_results()
+        else:
             try:
-                # Read CSV file
-                df = pd.read_csv(uploaded_file)
-                
-                # Display preview
-                st.markdown("### 📋 Data Preview")
-                st.dataframe(df.head(), use_container_width=True)
-                
-                # Show file info
-                st.info(f"📊 **File Info:** {len(df)} records, {len(df.columns)} columns")
+                columns = batch_input_columns(registry)
+                sequence_column, sequence_method = None, 'mean'
+                single_file = len(uploaded_files) == 1 and not is_batch_archive(uploaded_files[0].name)
+
+                if single_file:
+                    # Parse once per distinct file; reruns reuse the cached frame
+                    uploaded_file = uploaded_files[0]
+                    file_hash = upload_content_hash(uploaded_file)
+                    file_columns, estimated_rows, decoded_bytes = load_batch_schema(file_hash, uploaded_file.name,
+                                                                                    uploaded_file)
+
+                    # Decide from the schema alone whether the file can be parsed in one piece
+                    admission, plan = load_memory_admission(), None
+                    if registry is not None:
+                        plan = batch_memory_plan(admission, registry, file_columns, estimated_rows, columns,
+                                                 held_key=file_hash, upload_bytes=uploaded_file.size,
+                                                 decoded_bytes=decoded_bytes)
+                        st.caption(f"🧮 Estimated working set {plan['estimate'] / 2**20:,.0f} MB of "
+                                   f"{admission.available(file_hash) / 2**20:,.0f} MB available to batches: {plan['reason']}.")
+                        if plan['mode'] == 'reject':
+                            st.error(f"❌ This file is too large for the memory budget: {plan['reason']}. "
+                                     f"Split it into smaller files or raise CMI_MEMORY_BUDGET_MB.")
+                            st.stop()
+                    chunked = plan is not None and plan['mode'] in ('chunked', 'spill')
+
+                    # Per-sequence aggregation needs the id column read as well
+                    candidates = [col for col in file_columns
+                                  if col not in REQUIRED_COLUMNS and (columns is None or col not in columns)]
+                    if chunked:
+                        # Sequences may straddle chunks, so they cannot be aggregated here
+                        candidates = []
+                    if candidates and st.checkbox("🧩 Aggregate predictions per sequence"):
+                        preferred = next((col for col in SEQUENCE_ID_COLUMNS if col in candidates), candidates[0])
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            sequence_column = st.selectbox("Sequence id column", candidates,
+                                                           index=candidates.index(preferred))
+                        with col2:
+                            sequence_method = st.selectbox("Aggregation", list(SEQUENCE_AGGREGATIONS),
+                                                           format_func=SEQUENCE_AGGREGATIONS.get)
+                        if columns is not None:
+                            columns = columns | {sequence_column}
+
+                    if chunked:
+                        # Too large to parse at once: preview the first rows only
+                        df = next(iter_batch_chunks(uploaded_file, columns, 5), pd.DataFrame())
+                    else:
+                        try:
+                            df = load_batch_upload(file_hash, uploaded_file.name,
+                                                   tuple(sorted(columns)) if columns is not None else None,
+                                                   uploaded_file, plan)
+                        except TimeoutError as e:
+                            st.error(f"❌ {str(e)}; the server is busy, please try again later.")
+                            st.stop()
+                    upload_key = file_hash
+                    
+                    # Display preview
+                    st.markdown("### 📋 Data Preview")
+                    st.dataframe(df.head(), use_container_width=True)
+                    
+                    # Show file info
+                    if chunked:
+                        st.info(f"📊 **File Info:** about {estimated_rows} records, {len(df.columns)} columns; "
+                                f"scored in chunks of {plan['chunk_rows']} records")
+                    else:
+                        st.info(f"📊 **File Info:** {len(df)} records, {len(df.columns)} columns")
+                else:
+                    # Files are read when the batch is processed, one per worker
+                    st.markdown("### 🗂️ Uploaded Files")
+                    st.dataframe(pd.DataFrame({
+                        'File': [f.name for f in uploaded_files],
+                        'Size (KB)': [round(f.size / 1024, 1) for f in uploaded_files],
+                    }), hide_index=True, use_container_width=True)
+                    st.info(f"📊 **File Info:** {len(uploaded_files)} uploads; archives are expanded and "
+                            f"every file is scored separately, {BATCH_WORKERS} at a time")
+                    upload_key = tuple(upload_content_hash(f) for f in uploaded_files)
                 
+                # A/B comparison between two registered model versions
+                version = registry.default_version if registry is not None else None
+                compare_version = None
+                if registry is not None and len(registry.names) > 1:
+                    if st.checkbox("🆚 Compare two model versions"):
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            version = st.selectbox("Primary model", registry.names,
+                                                   index=registry.names.index(registry.default_version))
+                        with col2:
+                            compare_version = st.selectbox(
+                                "Comparison model", [name for name in registry.names if name != version])
+
+                # Results stay valid until the files or the model selection change
+                results_key = (upload_key, version, compare_version, early_exit_confidence,
+                               sequence_column, sequence_method, explain_top_k)
+                batch = st.session_state.get('batch_results')
+                if batch is not None and batch['key'] != results_key:
+                    discard_batch_results()
+                    batch = None
+
                 # Process button
                 if st.button("🚀 Process Batch", use_container_width=True):
-                    if len(df) > 0:
-                        loader = show_loading_animation()
-                        try:
-                            time.sleep(0.5)  # optional
-                            results = []
-                            progress_holder = st.empty()
-                            progress_bar = progress_holder.progress(0)
-
-                            for idx, row in df.iterrows():
-                                input_data = row.to_dict()
-                                prediction, probability = make_prediction(input_data, model, encoders)
-                                if prediction is not None:
-                                    results.append({
-                                        **input_data,
-                                        'prediction': prediction,
-                                        'target_probability': probability[1],
-                                        'non_target_probability': probability[0],
-                                        'confidence': float(np.max(probability))
-                                    })
-                                progress_bar.progress((idx + 1) / len(df))
-                        finally:
-                            loader.empty()
-                            # optionally hide the progress bar once done:
-                            # progress_holder.empty()
-                        
-                        if results:
-                            # Create results DataFrame
-                            results_df = pd.DataFrame(results)
-                            
-                            # Display summary
-                            st.markdown("### 📊 Results Summary")
-                            
-                            col1, col2, col3, col4 = st.columns(4)
-                            with col1:
-                                st.metric("Total Records", len(results_df))
-                            with col2:
-                                target_count = len(results_df[results_df['prediction'] == 1])
-                                st.metric("Target Predictions", target_count)
-                            with col3:
-                                non_target_count = len(results_df[results_df['prediction'] == 0])
-                                st.metric("Non-Target Predictions", non_target_count)
-                            with col4:
-                                avg_confidence = results_df['confidence'].mean()
-                                st.metric("Avg Confidence", f"{avg_confidence:.1%}")
-                            
-                            # Display detailed results
-                            st.markdown("### 📋 Detailed Results")
-                            st.dataframe(results_df, use_container_width=True)
-                            
-                            # Download button
-                            csv = results_df.to_csv(index=False)
-                            st.download_button(
-                                label="💾 Download Results",
-                                data=csv,
-                                file_name=f"prediction_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                                mime="text/csv",
-                                use_container_width=True
-                            )
-                        else:
-                            st.error("❌ No valid predictions generated. Please check your data format.")
+                    if not single_file or len(df) > 0:
+                        results_df, rejects_df, files_df, spill = None, None, None, None
+                        if single_file and chunked:
+                            if plan['mode'] == 'spill':
+                                # One file per run; it lives as long as the results in this session
+                                sweep_spill_dir()
+                                spill = SpillFile()
+                            waiting = st.empty()
+                            if plan['mode'] == 'queue':
+                                waiting.info("⏳ Waiting for other batches to free memory...")
+                            try:
+                                with admission.reserve(plan['estimate'], f"{uploaded_file.name} in chunks",
+                                                       plan['units'], MEMORY_WAIT_TIMEOUT):
+                                    waiting.empty()
+                                    results_df, rejects_df, total_records = process_batch_chunks(
+                                        uploaded_file, registry, columns, plan['chunk_rows'],
+                                        spill.path if spill is not None else None,
+                                        estimated_rows, version=version, compare_version=compare_version,
+                                        store=load_prediction_store(),
+                                        early_exit_confidence=early_exit_confidence,
+                                        governor=load_compute_governor(),
+                                        monitor=load_drift_monitor(),
+                                        audit=load_audit_log(),
+                                        explain_top_k=explain_top_k)
+                            except TimeoutError as e:
+                                waiting.empty()
+                                st.error(f"❌ {str(e)}; the server is busy, please try again later.")
+                            finally:
+                                if spill is not None and results_df is None:
+                                    spill.remove()
+                        elif single_file:
+                            total_records = len(df)
+                            loader = show_loading_animation()
+                            waiting = st.empty()
+                            if plan is not None and plan['mode'] == 'queue':
+                                waiting.info("⏳ Waiting for other batches to free memory...")
+                            try:
+                                time.sleep(0.5 * UI_DELAY_SCALE)  # optional
+                                if registry is not None:
+                                    with admission.reserve(plan['estimate'], uploaded_file.name,
+                                                           plan['units'], MEMORY_WAIT_TIMEOUT, file_hash):
+                                        waiting.empty()
+                                        results_df, rejects_df = predict_batch(
+                                            df, registry, version, compare_version,
+                                            store=load_prediction_store(),
+                                            file_hash=file_hash,
+                                            early_exit_confidence=early_exit_confidence,
+                                            sequence_column=sequence_column,
+                                            sequence_method=sequence_method,
+                                            governor=load_compute_governor(),
+                                            monitor=load_drift_monitor(),
+                                            audit=load_audit_log(),
+                                            explain_top_k=explain_top_k)
+                            except TimeoutError as e:
+                                st.error(f"❌ {str(e)}; the server is busy, please try again later.")
+                            finally:
+                                waiting.empty()
+                                loader.empty()
+                        elif registry is not None:
+                            file_results = process_batch_files(
+                                uploaded_files, registry, columns,
+                                admission=load_memory_admission(),
+                                version=version, compare_version=compare_version,
+                                store=load_prediction_store(),
+                                early_exit_confidence=early_exit_confidence,
+                                governor=load_compute_governor(),
+                                monitor=load_drift_monitor(),
+                                audit=load_audit_log(),
+                                explain_top_k=explain_top_k)
+                            results_df, rejects_df, files_df = combine_batch_files(file_results)
+                            total_records = int(files_df['records'].sum())
+
+                        if results_df is not None:
+                            batch = {
+                                'key': results_key,
+                                'results': results_df,
+                                'rejects': rejects_df,
+                                'files': files_df,
+                                'spill': spill,
+                                'summary': results_df.attrs.get('summary'),
+                                'total_records': total_records,
+                                'sequence_column': sequence_column,
+                                'sequence_method': sequence_method,
+                                'created': datetime.now(),
+                            }
+                            st.session_state['batch_results'] = batch
                     else:
                         st.error("❌ The uploaded file is empty.")
+
+                if batch is not None:
+                    if st.button("🗑️ Clear Results", use_container_width=True):
+                        discard_batch_results()
+                        st.rerun()
+                    display_batch_results(batch)
                         
             except Exception as e:
                 st.error(f"❌ Error reading file: {str(e)}")
@@ -644,6 +2597,13 @@ def main():
             **Performance:** Optimized for speed and accuracy  
             **Compatibility:** Cross-platform support
             """)
+
+        if registry is not None:
+            display_feature_usage(registry)
+        display_compute_diagnostics(load_compute_governor())
+        display_memory_diagnostics(load_memory_admission())
+        display_drift_monitoring(load_drift_monitor())
+        display_audit_diagnostics(load_audit_log())
         
         st.markdown("---")
         st.markdown("""
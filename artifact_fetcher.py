@@ -0,0 +1,526 @@
+"""
+CMI Behavior Classifier - Model Artifact Fetcher
+Downloads model artifacts listed in a manifest with HTTP range resume,
+parallel ranged segments, SHA-256 verification and a local artifact cache
+shared by every checkout on the machine. Zip archives are extracted while
+they download; extracted files only replace the installed ones once the
+archive has been verified. Downloads are checked to be what they claim
+(a readable zip archive) before they enter the cache, and a lock file
+keeps concurrent setups on the same machine from sharing a download.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import threading
+import zipfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ARTIFACT_MANIFEST_PATH = os.path.join('models', 'artifacts.json')
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'cmi-behavior-classifier')
+DEFAULT_SEGMENT_SIZE = 8 * 1024 * 1024
+DEFAULT_WORKERS = 4
+SEGMENT_RETRIES = 3
+CHUNK_SIZE = 256 * 1024
+
+def load_manifest(path=ARTIFACT_MANIFEST_PATH):
+    """Return the list of artifacts described by a manifest file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['artifacts']
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def check_payload(path, name):
+    """Raise ValueError unless ``path`` holds what ``name`` says it is.
+
+    Catches servers that answer with an HTML page (sign-in, quota or
+    virus-scan interstitials) instead of the file, which would otherwise
+    only fail when installing.
+    """
+    if not name.lower().endswith('.zip'):
+        return
+    try:
+        with zipfile.ZipFile(path) as archive:
+            broken = archive.testzip()
+    except (zipfile.BadZipFile, OSError) as e:
+        with open(path, 'rb') as f:
+            start = f.read(256).lstrip().lower()
+        hint = " (the server sent an HTML page)" if start.startswith((b'<!doctype', b'<html')) else ""
+        raise ValueError(f"{name} is not a valid zip archive{hint}: {e}") from e
+    if broken is not None:
+        raise ValueError(f"{name} is corrupt: bad CRC for {broken}")
+
+@contextmanager
+def cache_lock(path):
+    """Hold an exclusive lock on ``path`` (released if the process dies)"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.5)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class StreamingUnzip:
+    """Extract a zip archive from a byte stream using its local file headers.
+
+    Stored and deflated members are written as their bytes arrive. Archive
+    features that cannot be streamed (encryption, other compression methods,
+    stored members with data descriptors) switch the extractor to
+    ``fallback``, and the archive is then extracted once it is complete.
+    """
+
+    LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+    LOCAL_SIGNATURE = 0x04034b50
+    DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+    END_SIGNATURES = (b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06')
+
+    def __init__(self, dest_dir):
+        self.dest_dir = dest_dir
+        self.buffer = bytearray()
+        self.state = 'header'
+        self.done = False
+        self.fallback = False
+        self.entry = None
+
+    def feed(self, data):
+        if self.done or self.fallback:
+            return
+        self.buffer += data
+        try:
+            while not (self.done or self.fallback) and self._step():
+                pass
+        except (zlib.error, ValueError, OSError):
+            self._abandon()
+
+    def _abandon(self):
+        if self.entry and self.entry['file']:
+            self.entry['file'].close()
+        self.entry = None
+        self.fallback = True
+
+    def _step(self):
+        """Process buffered bytes; return False when more input is needed"""
+        if self.state == 'header':
+            return self._read_header()
+        if self.state == 'data':
+            return self._read_data()
+        return self._read_descriptor()
+
+    def _read_header(self):
+        if len(self.buffer) < 4:
+            return False
+        if bytes(self.buffer[:4]) in self.END_SIGNATURES:
+            self.done = True
+            return False
+        if len(self.buffer) < self.LOCAL_HEADER.size:
+            return False
+        (signature, _, flags, method, _, _, crc, compressed_size, _,
+         name_length, extra_length) = self.LOCAL_HEADER.unpack_from(self.buffer)
+        if signature != self.LOCAL_SIGNATURE:
+            self._abandon()
+            return False
+        header_length = self.LOCAL_HEADER.size + name_length + extra_length
+        if len(self.buffer) < header_length:
+            return False
+
+        raw_name = bytes(self.buffer[self.LOCAL_HEADER.size:self.LOCAL_HEADER.size + name_length])
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = bytes(self.buffer[self.LOCAL_HEADER.size + name_length:header_length])
+        del self.buffer[:header_length]
+
+        has_descriptor = bool(flags & 0x08)
+        zip64, zip64_compressed_size = self._zip64_extra(extra)
+        if compressed_size == 0xFFFFFFFF:
+            compressed_size = zip64_compressed_size
+        if flags & 0x01 or method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) or (
+                has_descriptor and method == zipfile.ZIP_STORED) or (
+                compressed_size is None and not has_descriptor):
+            self._abandon()
+            return False
+
+        target = self._target_path(name)
+        if name.endswith('/'):
+            os.makedirs(target, exist_ok=True)
+            output = None
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            output = open(target, 'wb')
+
+        self.entry = {
+            'file': output,
+            'crc': crc,
+            'computed_crc': 0,
+            'remaining': None if has_descriptor else compressed_size,
+            'descriptor': has_descriptor,
+            'zip64': zip64,
+            'inflater': zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None,
+        }
+        self.state = 'data'
+        return True
+
+    @staticmethod
+    def _zip64_extra(extra):
+        """Return ``(has_zip64_extra, compressed_size)`` from a local extra field"""
+        offset = 0
+        while offset + 4 <= len(extra):
+            header_id, size = struct.unpack_from('<HH', extra, offset)
+            if header_id == 0x0001:
+                if size >= 16:
+                    return True, struct.unpack_from('<Q', extra, offset + 12)[0]
+                return True, None
+            offset += 4 + size
+        return False, None
+
+    def _target_path(self, name):
+        dest_dir = os.path.abspath(self.dest_dir)
+        target = os.path.normpath(os.path.join(dest_dir, name))
+        # A prefix test would accept models_evil/ for models
+        if os.path.isabs(name) or os.path.commonpath([dest_dir, target]) != dest_dir:
+            raise ValueError(f"Unsafe path in archive: {name}")
+        return target
+
+    def _write(self, data):
+        entry = self.entry
+        if entry['inflater'] is not None:
+            data = entry['inflater'].decompress(data)
+        entry['computed_crc'] = zlib.crc32(data, entry['computed_crc'])
+        if entry['file'] is not None:
+            entry['file'].write(data)
+
+    def _read_data(self):
+        entry = self.entry
+        if entry['remaining'] is not None:
+            take = min(len(self.buffer), entry['remaining'])
+            if take:
+                self._write(bytes(self.buffer[:take]))
+                del self.buffer[:take]
+                entry['remaining'] -= take
+            if entry['remaining'] > 0:
+                return False
+        else:
+            # Deflate streams mark their own end; the rest belongs to the next record
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            self._write(data)
+            if not entry['inflater'].eof:
+                return False
+            self.buffer += entry['inflater'].unused_data
+
+        if entry['inflater'] is not None and not entry['inflater'].eof:
+            raise ValueError("Truncated deflate stream in archive member")
+        if entry['descriptor']:
+            self.state = 'descriptor'
+            return True
+        return self._finish_entry(entry['crc'])
+
+    def _read_descriptor(self):
+        size_length = 8 if self.entry['zip64'] else 4
+        has_signature = bytes(self.buffer[:4]) == self.DESCRIPTOR_SIGNATURE
+        length = (4 if has_signature else 0) + 4 + 2 * size_length
+        if len(self.buffer) < length:
+            return False
+        crc = struct.unpack_from('<I', self.buffer, 4 if has_signature else 0)[0]
+        del self.buffer[:length]
+        return self._finish_entry(crc)
+
+    def _finish_entry(self, crc):
+        entry = self.entry
+        if entry['file'] is not None:
+            entry['file'].close()
+        self.entry = None
+        self.state = 'header'
+        if entry['computed_crc'] != crc:
+            raise ValueError("CRC mismatch in streamed archive member")
+        return True
+
+class RangedDownload:
+    """A ``.part`` file filled by parallel ranged requests.
+
+    Completed segments are recorded in a ``.part.json`` sidecar so an
+    interrupted download resumes where it stopped. ``wait_for_prefix``
+    lets a consumer follow the contiguous downloaded prefix.
+    """
+
+    def __init__(self, url, part_path, size, segment_size, session, timeout):
+        self.url = url
+        self.part_path = part_path
+        self.state_path = part_path + '.json'
+        self.size = size
+        self.segment_size = segment_size
+        self.session = session
+        self.timeout = timeout
+        self.segment_count = max(1, -(-size // segment_size))
+        self.done = set()
+        self.failed = None
+        self.condition = threading.Condition()
+
+        state = self._read_state()
+        if state.get('url') == url and state.get('size') == size and state.get('segment_size') == segment_size \
+                and os.path.exists(part_path):
+            self.done = set(state.get('done', []))
+        else:
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+            self._write_state()
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self):
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump({'url': self.url, 'size': self.size, 'segment_size': self.segment_size,
+                       'done': sorted(self.done)}, f)
+
+    def prefix(self):
+        """Number of leading bytes that are fully downloaded"""
+        index = 0
+        while index in self.done:
+            index += 1
+        return min(index * self.segment_size, self.size)
+
+    def wait_for_prefix(self, offset):
+        """Block until more than ``offset`` bytes are available; return the prefix"""
+        with self.condition:
+            while True:
+                prefix = self.prefix()
+                if prefix > offset or prefix >= self.size or self.failed:
+                    return prefix
+                self.condition.wait()
+
+    def fetch_segment(self, index):
+        start = index * self.segment_size
+        end = min(start + self.segment_size, self.size) - 1
+        try:
+            for attempt in range(SEGMENT_RETRIES):
+                try:
+                    self._download_range(start, end)
+                    break
+                except (requests.RequestException, IOError):
+                    if attempt + 1 == SEGMENT_RETRIES:
+                        raise
+        except BaseException as e:
+            # Whatever went wrong, wake the follower waiting for this segment
+            with self.condition:
+                self.failed = self.failed or e
+                self.condition.notify_all()
+            raise
+        with self.condition:
+            self.done.add(index)
+            self._write_state()
+            self.condition.notify_all()
+
+    def _download_range(self, start, end):
+        response = self.session.get(self.url, headers={'Range': f'bytes={start}-{end}'},
+                                    stream=True, timeout=self.timeout)
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise IOError("Server ignored the Range header")
+        written = 0
+        with open(self.part_path, 'r+b') as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                written += len(chunk)
+        if written != end - start + 1:
+            raise IOError(f"Range {start}-{end} truncated ({written} of {end - start + 1} bytes)")
+
+    def run(self, workers):
+        pending = [i for i in range(self.segment_count) if i not in self.done]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(self.fetch_segment, pending))
+
+def probe(url, session, timeout):
+    """Return ``(size, supports_ranges)`` using a one-byte ranged request"""
+    response = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=timeout)
+    response.raise_for_status()
+    response.close()
+    if response.status_code == 206 and '/' in response.headers.get('Content-Range', ''):
+        total = response.headers['Content-Range'].rsplit('/', 1)[1]
+        if total.isdigit():
+            return int(total), True
+    length = response.headers.get('Content-Length')
+    return (int(length) if length and length.isdigit() else None), False
+
+def stream_download(url, part_path, session, timeout, consume):
+    """Plain streamed download for servers without range support"""
+    response = session.get(url, stream=True, timeout=timeout)
+    response.raise_for_status()
+    with open(part_path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            f.write(chunk)
+            consume(chunk)
+
+def promote(staging_dir, dest_dir):
+    """Move every extracted file from ``staging_dir`` into ``dest_dir``"""
+    for root, _, files in os.walk(staging_dir):
+        relative = os.path.relpath(root, staging_dir)
+        target_dir = os.path.normpath(os.path.join(dest_dir, relative))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in files:
+            os.replace(os.path.join(root, name), os.path.join(target_dir, name))
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+def install_from_cache(cache_path, name, dest_dir):
+    """Extract (zip) or copy a verified cached artifact into ``dest_dir``"""
+    os.makedirs(dest_dir, exist_ok=True)
+    if name.lower().endswith('.zip'):
+        staging_dir = os.path.join(dest_dir, f'.staging-{name}')
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        with zipfile.ZipFile(cache_path, 'r') as zip_ref:
+            zip_ref.extractall(staging_dir)
+        promote(staging_dir, dest_dir)
+    else:
+        shutil.copyfile(cache_path, os.path.join(dest_dir, name))
+
+def fetch_artifact(artifact, cache_dir=DEFAULT_CACHE_DIR, workers=DEFAULT_WORKERS,
+                   segment_size=DEFAULT_SEGMENT_SIZE, timeout=60, session=None, log=print):
+    """Download, verify and install one manifest artifact.
+
+    ``artifact`` is a manifest entry with ``name``, ``url``, ``sha256``
+    (hex digest, may be null) and ``extract_to``. Verified downloads are
+    kept in ``cache_dir`` under their checksum, so later installs on the
+    same machine skip the network entirely. A cached file that fails its
+    checks is deleted and downloaded again. Processes fetching the same
+    artifact take turns, the later ones installing from the cache.
+    """
+    name = artifact['name']
+    expected = (artifact.get('sha256') or '').lower() or None
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{expected}-{name}" if expected else name)
+    with cache_lock(cache_path + '.lock'):
+        return _fetch_locked(artifact, cache_path, expected, workers, segment_size, timeout,
+                             session or requests.Session(), log)
+
+def _fetch_locked(artifact, cache_path, expected, workers, segment_size, timeout, session, log):
+    name = artifact['name']
+    url = artifact['url']
+    dest_dir = artifact.get('extract_to', 'models')
+
+    if os.path.exists(cache_path):
+        try:
+            if expected is not None and file_sha256(cache_path) != expected:
+                raise ValueError("checksum mismatch")
+            check_payload(cache_path, name)
+            log(f"   Using cached {name}")
+            install_from_cache(cache_path, name, dest_dir)
+            return cache_path
+        except (ValueError, zipfile.BadZipFile, OSError) as e:
+            log(f"   ⚠️  Cached {name} is unusable ({e}); downloading it again")
+            os.remove(cache_path)
+
+    if expected is None:
+        log(f"   ⚠️  No checksum for {name} in the manifest; it will not be verified")
+
+    part_path = cache_path + '.part'
+    is_zip = name.lower().endswith('.zip')
+    staging_dir = os.path.join(dest_dir, f'.staging-{name}')
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir, exist_ok=True)
+    extractor = StreamingUnzip(staging_dir) if is_zip else None
+    digest = hashlib.sha256()
+
+    def consume(chunk):
+        digest.update(chunk)
+        if extractor is not None:
+            extractor.feed(chunk)
+
+    size, supports_ranges = probe(url, session, timeout)
+    if supports_ranges and size:
+        download = RangedDownload(url, part_path, size, segment_size, session, timeout)
+        resumed = len(download.done)
+        if resumed:
+            log(f"   Resuming {name}: {resumed} of {download.segment_count} segments already downloaded")
+        log(f"   Downloading {name} ({size / 1e6:.1f} MB, {workers} parallel segments)...")
+
+        # Hash and extract the contiguous prefix while segments arrive
+        def follow():
+            offset = 0
+            reported = 0
+            with open(part_path, 'rb') as f:
+                while offset < size and not download.failed:
+                    prefix = download.wait_for_prefix(offset)
+                    f.seek(offset)
+                    while offset < prefix:
+                        chunk = f.read(min(CHUNK_SIZE, prefix - offset))
+                        consume(chunk)
+                        offset += len(chunk)
+                    if offset * 10 // size > reported:
+                        reported = offset * 10 // size
+                        log(f"   {reported * 10}% ({offset / 1e6:.1f} MB / {size / 1e6:.1f} MB)")
+
+        follower = threading.Thread(target=follow, daemon=True)
+        follower.start()
+        try:
+            download.run(workers)
+        finally:
+            with download.condition:
+                download.condition.notify_all()
+            follower.join()
+        os.remove(download.state_path)
+    else:
+        log(f"   Downloading {name} (server does not support resume)...")
+        stream_download(url, part_path, session, timeout, consume)
+
+    actual = digest.hexdigest()
+    if expected is not None and actual != expected:
+        os.remove(part_path)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise ValueError(f"Checksum mismatch for {name}: expected {expected}, got {actual}")
+    try:
+        check_payload(part_path, name)
+    except ValueError:
+        os.remove(part_path)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    if expected is None:
+        log(f"   SHA-256 of {name}: {actual} (add it to the manifest to pin this artifact)")
+    os.replace(part_path, cache_path)
+
+    try:
+        if extractor is not None and extractor.done:
+            promote(staging_dir, dest_dir)
+        else:
+            # Not a zip, or the archive could not be streamed: install from the verified file
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            install_from_cache(cache_path, name, dest_dir)
+    except Exception:
+        # Never leave a file in the cache that cannot be installed
+        os.remove(cache_path)
+        raise
+    return cache_path
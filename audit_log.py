@@ -0,0 +1,190 @@
+"""
+CMI Behavior Classifier - Prediction Audit Log
+Append-only record of every prediction, written by a background thread so
+the request path only enqueues. Records are buffered and flushed on row or
+time thresholds to rotating Parquet or SQLite files; callers block when the
+writer falls too far behind, and whatever is queued is written on a clean
+shutdown.
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_AUDIT_DIR = 'audit'
+AUDIT_FORMATS = ['parquet', 'sqlite']
+# Default file rotation by format. An open Parquet file has no footer and
+# is lost if the process dies, so Parquet files are closed every few minutes
+ROTATE_SECONDS = {'parquet': 300, 'sqlite': 24 * 3600}
+
+class AuditLog:
+    """Background-written, rotating audit log.
+
+    ``log`` takes a DataFrame, or a zero-argument function returning one
+    so that even building the records happens on the writer thread. The
+    writer flushes its buffer every ``flush_rows`` rows or
+    ``flush_seconds`` seconds and starts a new file after
+    ``max_file_rows`` rows or ``max_file_seconds`` seconds (by default
+    ROTATE_SECONDS for the format); an idle file is closed on time too.
+
+    With more than ``max_pending_rows`` rows waiting, ``log`` blocks until
+    the writer catches up, so memory stays bounded and nothing is dropped.
+    Parquet files are only readable once closed; the open one carries an
+    ``.inprogress`` suffix until it is rotated or the log is closed, so a
+    crash loses at most ``max_file_seconds`` of records. SQLite files are
+    committed on every flush.
+    """
+
+    def __init__(self, directory=DEFAULT_AUDIT_DIR, fmt='parquet', flush_rows=5000, flush_seconds=5.0,
+                 max_file_rows=1_000_000, max_file_seconds=None, max_pending_rows=200_000):
+        if fmt not in AUDIT_FORMATS:
+            raise ValueError(f"Unsupported audit log format: {fmt}")
+        self.directory = directory
+        self.fmt = fmt
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_file_rows = max_file_rows
+        self.max_file_seconds = max_file_seconds or ROTATE_SECONDS[fmt]
+        self.max_pending_rows = max_pending_rows
+        os.makedirs(directory, exist_ok=True)
+
+        self.queue = queue.Queue()
+        self.space = threading.Condition()
+        self.pending_rows = 0
+        self.closed = False
+        self.stats = {'logged_rows': 0, 'written_rows': 0, 'flushes': 0, 'files': 0,
+                      'blocked_s': 0.0, 'errors': 0, 'last_error': None}
+
+        # Current output file
+        self.path = None
+        self.writer = None
+        self.schema = None
+        self.file_rows = 0
+        self.file_opened = 0.0
+
+        self.thread = threading.Thread(target=self.run, name='audit-log-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def log(self, records, rows):
+        """Queue ``rows`` records (a DataFrame or a function returning one)"""
+        if self.closed:
+            raise RuntimeError("audit log is closed")
+        with self.space:
+            if self.pending_rows + rows > self.max_pending_rows and self.pending_rows > 0:
+                started = time.time()
+                while self.pending_rows + rows > self.max_pending_rows and self.pending_rows > 0:
+                    self.space.wait()
+                self.stats['blocked_s'] += time.time() - started
+            self.pending_rows += rows
+            self.stats['logged_rows'] += rows
+        self.queue.put((records, rows))
+
+    def run(self):
+        buffer, buffered_rows = [], 0
+        last_flush = time.time()
+        while True:
+            timeout = max(self.flush_seconds - (time.time() - last_flush), 0.01)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            stop = item is None
+            if item:
+                records, rows = item
+                try:
+                    buffer.append(records() if callable(records) else records)
+                except Exception as e:
+                    self.record_error(e)
+                    self.release(rows)
+                else:
+                    buffered_rows += rows
+            due = buffered_rows >= self.flush_rows or time.time() - last_flush >= self.flush_seconds
+            if buffer and (due or stop):
+                self.flush(buffer, buffered_rows)
+                buffer, buffered_rows = [], 0
+            if due or stop:
+                last_flush = time.time()
+            if self.writer is not None and self.rotation_due():
+                self.close_file()
+            if stop:
+                self.close_file()
+                return
+
+    def flush(self, frames, rows):
+        try:
+            df = pd.concat(frames, ignore_index=True)
+            if self.writer is None:
+                self.open_file(df)
+            if self.fmt == 'parquet':
+                self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+            else:
+                df.to_sql('predictions', self.writer, if_exists='append', index=False)
+                self.writer.commit()
+            self.file_rows += len(df)
+            self.stats['written_rows'] += len(df)
+            self.stats['flushes'] += 1
+        except Exception as e:
+            self.record_error(e)
+        finally:
+            self.release(rows)
+
+    def rotation_due(self):
+        return (self.file_rows >= self.max_file_rows
+                or time.time() - self.file_opened >= self.max_file_seconds)
+
+    def open_file(self, df):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        # The process id keeps files of several app processes apart
+        name = f"predictions-{stamp}-{os.getpid()}.{self.fmt}"
+        self.path = os.path.join(self.directory, name)
+        if self.fmt == 'parquet':
+            self.schema = pa.Schema.from_pandas(df, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.path + '.inprogress', self.schema)
+        else:
+            self.writer = sqlite3.connect(self.path)
+        self.file_rows = 0
+        self.file_opened = time.time()
+        self.stats['files'] += 1
+
+    def close_file(self):
+        if self.writer is None:
+            return
+        try:
+            self.writer.close()
+            if self.fmt == 'parquet':
+                os.replace(self.path + '.inprogress', self.path)
+        except Exception as e:
+            self.record_error(e)
+        self.writer = None
+
+    def release(self, rows):
+        with self.space:
+            self.pending_rows -= rows
+            self.space.notify_all()
+
+    def record_error(self, error):
+        self.stats['errors'] += 1
+        self.stats['last_error'] = str(error)
+
+    def close(self):
+        """Write everything queued, close the current file and stop the writer"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+
+    def snapshot(self):
+        """Counters and the current file for the diagnostics view"""
+        with self.space:
+            return dict(self.stats, pending_rows=self.pending_rows, format=self.fmt,
+                        current_file=self.path if self.writer is not None else None)
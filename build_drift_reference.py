@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+CMI Behavior Classifier - Drift Reference Builder
+Profiles the training data (input histograms, category counts and the
+model's predicted target probabilities) and saves it next to the model as
+the reference the app's drift monitor compares live traffic against.
+
+Usage:
+    python build_drift_reference.py --data train.csv [--label target]
+"""
+
+import argparse
+import os
+import sys
+
+import joblib
+import numpy as np
+
+# The app module doubles as the inference library; keep Streamlit quiet
+# when it is imported outside `streamlit run`
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+
+from app import (CATEGORICAL_COLUMNS, DEFAULT_ENCODERS_PATH, DEFAULT_MODEL_PATH, DRIFT_REFERENCE_PATH,
+                 INPUT_RANGES, compile_encoding_tables, forest_predict_proba, load_model_file,
+                 preprocess_input_data, read_batch_file, validate_batch)
+from drift_monitor import DriftProfile
+
+def main():
+    """Main reference profile function"""
+    parser = argparse.ArgumentParser(description="Build the drift monitor's training reference profile")
+    parser.add_argument("--data", required=True, help="Training data (CSV, Parquet or Arrow/Feather)")
+    parser.add_argument("--label", default="target", help="Label column, ignored when present")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Model whose predictions are profiled")
+    parser.add_argument("--encoders", default=DEFAULT_ENCODERS_PATH)
+    parser.add_argument("--output", default=DRIFT_REFERENCE_PATH, help="Where to save the reference profile")
+    args = parser.parse_args()
+
+    print("🧠 CMI Behavior Classifier - Drift Reference")
+    print("=" * 50)
+
+    model = load_model_file(args.model)
+    encoders = compile_encoding_tables(joblib.load(args.encoders))
+    print(f"✅ Loaded {args.model}: {len(model.estimators_)} trees")
+
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found")
+        sys.exit(1)
+    with open(args.data, 'rb') as f:
+        df = read_batch_file(f, name=args.data)
+    df = df.drop(columns=[args.label], errors='ignore')
+    print(f"✅ Training data: {len(df)} records")
+
+    profile = DriftProfile(INPUT_RANGES, CATEGORICAL_COLUMNS)
+    profile.update(df, encoders=encoders)
+
+    valid_df, rejects_df, missing_columns = validate_batch(df, encoders)
+    if missing_columns:
+        print(f"⚠️  Missing input columns {', '.join(missing_columns)}; predictions are not profiled")
+    elif len(valid_df) > 0:
+        # Imputed engineered features are drawn at random, as in the app
+        np.random.seed(0)
+        matrix = preprocess_input_data(valid_df, model, encoders)
+        if matrix is None:
+            print("❌ Could not preprocess the training data")
+            sys.exit(1)
+        profile.update(target_probability=forest_predict_proba(model, matrix)[:, 1])
+        print(f"✅ Profiled predictions for {len(valid_df)} valid records ({len(rejects_df)} rejected)")
+
+    print("\n📊 Reference profile")
+    for col in INPUT_RANGES:
+        if profile.histograms[col].sum():
+            print(f"   {col:<22} median {profile.quantile(col, 0.5):8.3f}   "
+                  f"p05 {profile.quantile(col, 0.05):8.3f}   p95 {profile.quantile(col, 0.95):8.3f}   "
+                  f"out of range {profile.out_of_range(col):6.1%}")
+    for col, counts in profile.categories.items():
+        if counts:
+            print(f"   {col:<22} " + ", ".join(f"{value}: {count}" for value, count in counts.items()))
+
+    profile.save(args.output)
+    print(f"\n💾 Saved to {args.output}; restart the app to compare live traffic against it")
+
+if __name__ == "__main__":
+    main()
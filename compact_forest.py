@@ -0,0 +1,148 @@
+"""
+CMI Behavior Classifier - Compact Forest Artifacts
+Versioned on-disk format for the RandomForest that keeps only what
+inference needs. The node arrays of all trees are concatenated and stored
+in the narrowest types that reproduce the predictions exactly; loading
+rebuilds an ordinary RandomForestClassifier, so everything that inspects
+the trees (explanations, early exit, feature usage) keeps working.
+"""
+
+import copy
+
+import numpy as np
+import sklearn
+from sklearn.tree._tree import NODE_DTYPE, Tree
+
+COMPACT_FORMAT = 'cmi-compact-forest'
+COMPACT_FORMAT_VERSION = 1
+
+# Fitted forest attributes that only describe the training run
+TRAINING_ONLY_ATTRIBUTES = ['oob_decision_function_', 'oob_prediction_', '_sample_weight']
+# Node fields kept; impurity and n_node_samples are only used for feature importances
+STORED_NODE_FIELDS = ['left_child', 'right_child', 'feature', 'threshold',
+                      'weighted_n_node_samples', 'missing_go_to_left']
+
+def is_compact_forest(data):
+    """Whether a loaded artifact is in the compact forest format"""
+    return isinstance(data, dict) and data.get('format') == COMPACT_FORMAT
+
+def narrowest_int(values, dtypes=(np.int8, np.int16, np.int32, np.int64)):
+    """``values`` in the smallest integer type holding all of them"""
+    low, high = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+    for dtype in dtypes:
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return values.astype(dtype)
+    return values
+
+def float32_floor(thresholds):
+    """Largest float32 not above each threshold.
+
+    Trees compare float32 inputs against their thresholds, so for every
+    input ``x <= t`` holds exactly when ``x <= float32_floor(t)`` does.
+    """
+    rounded = thresholds.astype(np.float32)
+    above = rounded.astype(np.float64) > thresholds
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+def encode_values(values, weighted):
+    """Node values as integer class counts where that is exact.
+
+    Classification trees store each node's class fractions, i.e. its
+    weighted class counts divided by its weighted sample count. With the
+    integer weights of bootstrapping, the counts are whole numbers and
+    dividing them again reproduces the stored fractions bit for bit.
+    Returns ``(encoding, array)``.
+    """
+    counts = np.round(values * weighted[:, None, None])
+    if np.array_equal(counts / weighted[:, None, None], values):
+        return 'fractions', narrowest_int(counts, (np.uint8, np.uint16, np.uint32))
+    counts = np.round(values)
+    if np.array_equal(counts, values):
+        return 'counts', narrowest_int(counts, (np.uint8, np.uint16, np.uint32))
+    return 'raw', values
+
+def decode_values(encoding, values, weighted):
+    values = values.astype(np.float64)
+    if encoding == 'fractions':
+        values = values / weighted[:, None, None]
+    return values
+
+def pack_forest(model):
+    """Compact artifact of a fitted forest (a plain dict, saved with joblib)"""
+    states = [estimator.tree_.__getstate__() for estimator in model.estimators_]
+    nodes = np.concatenate([state['nodes'] for state in states])
+    values = np.concatenate([state['values'] for state in states])
+
+    weighted = nodes['weighted_n_node_samples']
+    if np.array_equal(weighted, np.round(weighted)):
+        stored_weights = narrowest_int(weighted, (np.uint8, np.uint16, np.uint32))
+    else:
+        stored_weights = weighted
+    encoding, stored_values = encode_values(values, weighted)
+
+    # The fitted forest and one tree without their arrays carry every other attribute
+    forest = copy.copy(model)
+    forest.estimators_ = []
+    for attribute in TRAINING_ONLY_ATTRIBUTES:
+        forest.__dict__.pop(attribute, None)
+    estimator = copy.copy(model.estimators_[0])
+    del estimator.tree_
+
+    return {
+        'format': COMPACT_FORMAT,
+        'format_version': COMPACT_FORMAT_VERSION,
+        'sklearn_version': sklearn.__version__,
+        'forest': forest,
+        'estimator': estimator,
+        'value_encoding': encoding,
+        'arrays': {
+            'node_counts': np.array([len(state['nodes']) for state in states], dtype=np.int64),
+            'max_depths': np.array([state['max_depth'] for state in states], dtype=np.int32),
+            'random_states': np.array([e.random_state for e in model.estimators_], dtype=np.int64),
+            'left_child': narrowest_int(nodes['left_child']),
+            'right_child': narrowest_int(nodes['right_child']),
+            'feature': narrowest_int(nodes['feature']),
+            'threshold': float32_floor(nodes['threshold']),
+            'weighted_n_node_samples': stored_weights,
+            'missing_go_to_left': nodes['missing_go_to_left'].astype(np.uint8),
+            'values': stored_values,
+        },
+    }
+
+def unpack_forest(data):
+    """Rebuild the RandomForestClassifier stored by pack_forest"""
+    if data['format_version'] > COMPACT_FORMAT_VERSION:
+        raise ValueError(f"Compact forest format version {data['format_version']} is newer than "
+                         f"this app supports ({COMPACT_FORMAT_VERSION})")
+    arrays = data['arrays']
+    model = data['forest']
+    template = data['estimator']
+    n_classes = np.atleast_1d(np.asarray(template.n_classes_, dtype=np.intp))
+
+    estimators = []
+    ends = np.cumsum(arrays['node_counts'])
+    for i, end in enumerate(ends):
+        start = end - arrays['node_counts'][i]
+        # Built in this scikit-learn's node layout; fields it lacks are skipped
+        nodes = np.zeros(end - start, dtype=NODE_DTYPE)
+        for field in STORED_NODE_FIELDS:
+            if field in NODE_DTYPE.names:
+                nodes[field] = arrays[field][start:end]
+        values = decode_values(data['value_encoding'], arrays['values'][start:end],
+                               nodes['weighted_n_node_samples'])
+
+        tree = Tree(model.n_features_in_, n_classes, template.n_outputs_)
+        tree.__setstate__({
+            'max_depth': int(arrays['max_depths'][i]),
+            'node_count': int(end - start),
+            'nodes': nodes,
+            'values': np.ascontiguousarray(values),
+        })
+        estimator = copy.copy(template)
+        estimator.random_state = int(arrays['random_states'][i])
+        estimator.tree_ = tree
+        estimators.append(estimator)
+
+    model.estimators_ = estimators
+    return model
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+CMI Behavior Classifier - Forest Compression Tool
+Builds slimmer variants of the RandomForest (fewer trees chosen greedily,
+depth-capped trees, class-preserving leaf pruning), reports agreement, AUC
+and latency for each candidate on a labeled holdout CSV, and saves the
+fastest variant that stays within the accuracy budget. Part of the
+holdout is set aside for choosing tree subsets; candidates are only
+scored on the rest.
+
+Usage:
+    python compress_model.py --holdout holdout.csv [--label target]
+"""
+
+import argparse
+import copy
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.tree._tree import Tree
+
+# The app module doubles as the inference library; keep Streamlit quiet
+# when it is imported outside `streamlit run`
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+
+from app import (DEFAULT_ENCODERS_PATH, DEFAULT_MODEL_PATH, compile_encoding_tables,
+                 forest_predict_proba, load_model_file, preprocess_input_data)
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+def node_depths(nodes):
+    """Depth of every node reachable from the root"""
+    depths = np.full(len(nodes), -1, dtype=np.int64)
+    depths[0] = 0
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        for child in (nodes['left_child'][node], nodes['right_child'][node]):
+            if child != TREE_LEAF:
+                depths[child] = depths[node] + 1
+                stack.append(child)
+    return depths
+
+def rebuild_tree(tree, make_leaf):
+    """Copy of ``tree`` where nodes flagged in ``make_leaf`` become leaves.
+
+    Unreachable nodes are dropped and the remaining ones renumbered, so the
+    rebuilt tree is smaller in memory as well as shallower.
+    """
+    state = tree.__getstate__()
+    nodes, values = state['nodes'], state['values']
+
+    order = []
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if not make_leaf[node] and nodes['left_child'][node] != TREE_LEAF:
+            stack.append(nodes['right_child'][node])
+            stack.append(nodes['left_child'][node])
+
+    order = np.array(order, dtype=np.int64)
+    new_index = np.full(len(nodes), TREE_LEAF, dtype=np.int64)
+    new_index[order] = np.arange(len(order))
+
+    new_nodes = nodes[order].copy()
+    is_leaf = make_leaf[order] | (nodes['left_child'][order] == TREE_LEAF)
+    new_nodes['left_child'] = np.where(is_leaf, TREE_LEAF, new_index[nodes['left_child'][order]])
+    new_nodes['right_child'] = np.where(is_leaf, TREE_LEAF, new_index[nodes['right_child'][order]])
+    new_nodes['feature'] = np.where(is_leaf, TREE_UNDEFINED, new_nodes['feature'])
+    new_nodes['threshold'] = np.where(is_leaf, TREE_UNDEFINED, new_nodes['threshold'])
+
+    rebuilt = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    rebuilt.__setstate__({
+        'max_depth': int(node_depths(new_nodes).max()),
+        'node_count': len(order),
+        'nodes': new_nodes,
+        'values': np.ascontiguousarray(values[order]),
+    })
+    return rebuilt
+
+def cap_depth(tree, max_depth):
+    """Turn every node at ``max_depth`` into a leaf"""
+    nodes = tree.__getstate__()['nodes']
+    return rebuild_tree(tree, node_depths(nodes) >= max_depth)
+
+def prune_same_class_leaves(tree):
+    """Collapse splits whose whole subtree predicts the same class"""
+    state = tree.__getstate__()
+    nodes, values = state['nodes'], state['values']
+    winner = values[:, 0, :].argmax(axis=1)
+
+    # Children always come after their parent, so a reverse scan is bottom-up
+    make_leaf = np.zeros(len(nodes), dtype=bool)
+    uniform = nodes['left_child'] == TREE_LEAF
+    for node in range(len(nodes) - 1, -1, -1):
+        left, right = nodes['left_child'][node], nodes['right_child'][node]
+        if left == TREE_LEAF:
+            continue
+        if uniform[left] and uniform[right] and winner[left] == winner[right] == winner[node]:
+            uniform[node] = True
+            make_leaf[node] = True
+    return rebuild_tree(tree, make_leaf)
+
+def forest_with_trees(model, estimators):
+    """Shallow copy of the forest restricted to ``estimators``"""
+    variant = copy.copy(model)
+    variant.estimators_ = list(estimators)
+    variant.n_estimators = len(estimators)
+    return variant
+
+def forest_with_rebuilt_trees(model, rebuild):
+    variant = copy.deepcopy(model)
+    for estimator in variant.estimators_:
+        estimator.tree_ = rebuild(estimator.tree_)
+    return variant
+
+def greedy_tree_order(tree_proba, full_proba):
+    """Order trees so every prefix best approximates the full forest.
+
+    Forward selection: each step adds the tree that brings the running mean
+    of target probabilities closest (squared error) to the full forest.
+    """
+    n_trees = tree_proba.shape[0]
+    remaining = list(range(n_trees))
+    order = []
+    running_sum = np.zeros_like(full_proba)
+    while remaining:
+        candidates = tree_proba[remaining]
+        errors = (((running_sum + candidates) / (len(order) + 1) - full_proba) ** 2).mean(axis=1)
+        best = remaining.pop(int(np.argmin(errors)))
+        order.append(best)
+        running_sum += tree_proba[best]
+    return order
+
+def measure_latency(model, matrix, repeats=5):
+    """Median single-row and full-holdout predict_proba latency in ms"""
+    single, batch = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        forest_predict_proba(model, matrix[:1])
+        single.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        forest_predict_proba(model, matrix)
+        batch.append(time.perf_counter() - start)
+    return float(np.median(single)) * 1000, float(np.median(batch)) * 1000
+
+def evaluate(name, model, matrix, labels, full_prediction, repeats):
+    proba = forest_predict_proba(model, matrix)[:, 1]
+    single_ms, batch_ms = measure_latency(model, matrix, repeats)
+    return {
+        'candidate': name,
+        'trees': len(model.estimators_),
+        'max_depth': max(estimator.tree_.max_depth for estimator in model.estimators_),
+        'nodes': forest_size(model),
+        'agreement': float(((proba >= 0.5) == full_prediction).mean()),
+        'auc': float(roc_auc_score(labels, proba)) if len(np.unique(labels)) > 1 else float('nan'),
+        'single_ms': single_ms,
+        'batch_ms': batch_ms,
+    }
+
+def forest_size(model):
+    return sum(estimator.tree_.node_count for estimator in model.estimators_)
+
+def build_candidates(model, selection_matrix, tree_fractions, depths):
+    """Yield ``(name, model)`` for every compressed variant.
+
+    Tree subsets are chosen on ``selection_matrix``, which must not be used
+    to score them. Variants with as many nodes as the original (e.g. depth
+    caps at or above its depth) are not compressions and are skipped.
+    """
+    n_trees = len(model.estimators_)
+    max_depth = max(estimator.tree_.max_depth for estimator in model.estimators_)
+
+    full_proba = forest_predict_proba(model, selection_matrix)[:, 1]
+    tree_proba = np.stack([
+        estimator.predict_proba(selection_matrix)[:, 1] for estimator in model.estimators_
+    ])
+    order = greedy_tree_order(tree_proba, full_proba)
+    for fraction in tree_fractions:
+        count = max(1, int(round(n_trees * fraction)))
+        if count < n_trees:
+            yield f"greedy_{count}_trees", forest_with_trees(
+                model, [model.estimators_[i] for i in order[:count]])
+
+    nodes = forest_size(model)
+    for depth in depths:
+        if depth >= max_depth:
+            continue
+        variant = forest_with_rebuilt_trees(model, lambda tree: cap_depth(tree, depth))
+        if forest_size(variant) < nodes:
+            yield f"depth_{depth}", variant
+
+    variant = forest_with_rebuilt_trees(model, prune_same_class_leaves)
+    if forest_size(variant) < nodes:
+        yield "pruned_leaves", variant
+
+def main():
+    """Main compression function"""
+    parser = argparse.ArgumentParser(description="Compress the RandomForest within an accuracy budget")
+    parser.add_argument("--holdout", required=True, help="Labeled holdout CSV")
+    parser.add_argument("--label", default="target", help="Label column in the holdout CSV")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Model to compress")
+    parser.add_argument("--encoders", default=DEFAULT_ENCODERS_PATH)
+    parser.add_argument("--output", default="models/model_compact.pkl", help="Where to save the chosen variant")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="Minimum share of holdout predictions matching the full forest")
+    parser.add_argument("--max-auc-drop", type=float, default=0.005,
+                        help="Maximum AUC loss relative to the full forest")
+    parser.add_argument("--tree-fractions", type=float, nargs="+", default=[0.1, 0.25, 0.5, 0.75])
+    parser.add_argument("--depths", type=int, nargs="+", default=[6, 8, 10, 12])
+    parser.add_argument("--repeats", type=int, default=5, help="Latency measurement repeats")
+    parser.add_argument("--selection-fraction", type=float, default=0.5,
+                        help="Share of the holdout used to choose tree subsets; the rest scores candidates")
+    parser.add_argument("--min-reduction", type=float, default=0.05,
+                        help="Minimum share of nodes or batch latency a saved variant must cut")
+    args = parser.parse_args()
+
+    print("🧠 CMI Behavior Classifier - Forest Compression")
+    print("=" * 50)
+
+    model = load_model_file(args.model)
+    encoders = compile_encoding_tables(joblib.load(args.encoders))
+    print(f"✅ Loaded {args.model}: {len(model.estimators_)} trees")
+
+    holdout = pd.read_csv(args.holdout)
+    if args.label not in holdout.columns:
+        print(f"❌ Label column '{args.label}' not found in {args.holdout}")
+        sys.exit(1)
+    labels = holdout.pop(args.label).to_numpy()
+    missing = [f for f in model.feature_names_in_ if f not in holdout.columns]
+    if missing:
+        print(f"⚠️  {len(missing)} model features missing from the holdout; they are filled with random values")
+
+    np.random.seed(0)
+    matrix = preprocess_input_data(holdout, model, encoders)
+    if matrix is None:
+        print("❌ Could not preprocess the holdout data")
+        sys.exit(1)
+    # Choosing subsets and scoring them on the same rows would flatter agreement
+    selected = np.random.default_rng(0).random(len(matrix)) < args.selection_fraction
+    if selected.all() or not selected.any():
+        print("❌ The holdout is too small to split into selection and evaluation rows")
+        sys.exit(1)
+    selection_matrix, matrix, labels = matrix[selected], matrix[~selected], labels[~selected]
+    print(f"✅ Holdout: {len(selection_matrix)} records to choose tree subsets, {len(matrix)} to evaluate")
+
+    full_prediction = forest_predict_proba(model, matrix)[:, 1] >= 0.5
+
+    print("\n📏 Evaluating candidates...")
+    report = [evaluate("full", model, matrix, labels, full_prediction, args.repeats)]
+    variants = {"full": model}
+    for name, variant in build_candidates(model, selection_matrix, args.tree_fractions, args.depths):
+        variants[name] = variant
+        report.append(evaluate(name, variant, matrix, labels, full_prediction, args.repeats))
+        print(f"   {name}")
+
+    report_df = pd.DataFrame(report)
+    baseline = report_df.loc[0]
+    report_df['within_budget'] = (report_df['agreement'] >= args.min_agreement) & (
+        np.isnan(baseline['auc']) | (baseline['auc'] - report_df['auc'] <= args.max_auc_drop))
+    report_df['smaller'] = ((report_df['nodes'] <= baseline['nodes'] * (1 - args.min_reduction))
+                            | (report_df['batch_ms'] <= baseline['batch_ms'] * (1 - args.min_reduction)))
+
+    print("\n📊 Candidate report")
+    print(report_df.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    eligible = report_df[report_df['within_budget'] & report_df['smaller'] & (report_df['candidate'] != 'full')]
+    if eligible.empty:
+        print(f"\n⚠️  No variant within the budget cuts nodes or latency by {args.min_reduction:.0%}; "
+              f"keeping the full model")
+        return
+
+    chosen = eligible.sort_values('batch_ms').iloc[0]
+    joblib.dump({'model': variants[chosen['candidate']], 'compression': chosen.to_dict()}, args.output)
+
+    speedup = report_df.loc[0, 'batch_ms'] / chosen['batch_ms']
+    print(f"\n✅ Chosen: {chosen['candidate']} ({speedup:.1f}x faster, "
+          f"agreement {chosen['agreement']:.2%}, AUC {chosen['auc']:.4f})")
+    print(f"💾 Saved to {args.output}")
+    print("   Point a version in models/registry.json at it, or replace models/model.pkl")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+CMI Behavior Classifier - Compute Governor
+Process-wide CPU budget shared by every prediction job of every session.
+Jobs are granted a number of cores (the ``n_jobs`` they may use) out of a
+fixed budget, in arrival order; when the budget is used up new jobs wait
+instead of oversubscribing the machine.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from threadpoolctl import threadpool_limits
+
+class ComputeGovernor:
+    """First-come, first-served core allocator.
+
+    A job asks for up to ``want`` cores and gets what is free, split evenly
+    with the jobs queued behind it, but always at least one core. With no
+    core free, jobs queue in arrival order.
+
+    Native thread pools (BLAS, OpenMP) are limited to one thread per caller
+    for the whole process, so the only parallelism left is the ``n_jobs``
+    the governor hands out.
+    """
+
+    def __init__(self, cores=None):
+        self.cores = max(1, cores or os.cpu_count() or 1)
+        self.free = self.cores
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.active = {}
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.native_limits = threadpool_limits(limits=1)
+
+    @contextmanager
+    def job(self, label, want=None):
+        """Hold cores for the duration of the block and yield their count"""
+        want = max(1, min(want or self.cores, self.cores))
+        ticket = object()
+        queued_at = time.time()
+        with self.condition:
+            self.queue.append(ticket)
+            while self.queue[0] is not ticket or self.free == 0:
+                self.condition.wait()
+            self.queue.popleft()
+            grant = min(want, max(1, self.free // (len(self.queue) + 1)))
+            self.free -= grant
+            started = time.time()
+            self.active[ticket] = {'job': label, 'cores': grant, 'started': started,
+                                   'waited_s': started - queued_at}
+            # The next job in line may fit in what is left
+            self.condition.notify_all()
+        try:
+            yield grant
+        finally:
+            with self.condition:
+                info = self.active.pop(ticket)
+                self.free += grant
+                self.completed += 1
+                self.total_wait += info['waited_s']
+                self.max_wait = max(self.max_wait, info['waited_s'])
+                self.condition.notify_all()
+
+    def snapshot(self):
+        """Current allocation and counters for the diagnostics view"""
+        with self.condition:
+            now = time.time()
+            return {
+                'cores': self.cores,
+                'free': self.free,
+                'queued': len(self.queue),
+                'completed': self.completed,
+                'avg_wait_s': self.total_wait / self.completed if self.completed else 0.0,
+                'max_wait_s': self.max_wait,
+                'active': [
+                    {'job': info['job'], 'cores': info['cores'],
+                     'running_s': now - info['started'], 'waited_s': info['waited_s']}
+                    for info in self.active.values()
+                ],
+            }
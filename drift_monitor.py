@@ -0,0 +1,291 @@
+"""
+CMI Behavior Classifier - Input Drift Monitor
+Constant-memory streaming summaries of the inputs the models see and of
+their predicted target probabilities, compared against a reference profile
+built from training data. Numeric inputs are kept as fixed-bin histograms
+over their documented ranges (with under/overflow bins, which also yield
+approximate quantiles), categorical inputs as bounded value counts of
+their encoder class labels, so training codes and form labels agree.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PROFILE_PATH = os.path.join('cache', 'drift_profile.json')
+DEFAULT_REFERENCE_PATH = os.path.join('models', 'reference_profile.json')
+
+HISTOGRAM_BINS = 20
+# Distinct category values counted before the rest go to OTHER_CATEGORY
+MAX_CATEGORIES = 32
+OTHER_CATEGORY = '(other)'
+PROBABILITY_COLUMN = 'target_probability'
+
+# Population stability index thresholds: below WATCH is stable, above DRIFT has drifted
+PSI_WATCH = 0.1
+PSI_DRIFT = 0.25
+# Fewer live values than this are too noisy to call drift on
+MIN_COMPARED_VALUES = 200
+
+class DriftProfile:
+    """Streaming histograms of numeric inputs, category counts and
+    predicted target probabilities.
+
+    Every numeric column has ``HISTOGRAM_BINS`` equal bins over its range
+    plus an underflow and an overflow bin, so memory does not grow with
+    the number of rows seen and profiles with the same ranges can be
+    compared bin by bin.
+    """
+
+    def __init__(self, ranges, categorical_columns):
+        self.ranges = {col: (float(low), float(high)) for col, (low, high) in ranges.items()}
+        self.ranges[PROBABILITY_COLUMN] = (0.0, 1.0)
+        self.histograms = {col: np.zeros(HISTOGRAM_BINS + 2, dtype=np.int64) for col in self.ranges}
+        self.missing = {col: 0 for col in list(self.ranges) + list(categorical_columns)}
+        self.categories = {col: {} for col in categorical_columns}
+        self.rows = 0
+        self.started = time.time()
+
+    def add_values(self, col, values):
+        """Add an array of numeric values (NaN counts as missing) to a histogram"""
+        low, high = self.ranges[col]
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        self.missing[col] += int((~present).sum())
+        values = values[present]
+        inside = np.clip(((values - low) / (high - low) * HISTOGRAM_BINS).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+        bins = np.where(values < low, 0, np.where(values > high, HISTOGRAM_BINS + 1, inside + 1))
+        self.histograms[col] += np.bincount(bins, minlength=HISTOGRAM_BINS + 2)
+
+    def update(self, df=None, target_probability=None, encoders=None):
+        """Add a batch of raw input rows and/or their predicted target probabilities.
+
+        With ``encoders`` (the app's compiled encoding tables) categories
+        are counted by class label, e.g. 'Male', 'm' and 1 all as '1'.
+        """
+        if target_probability is not None:
+            self.add_values(PROBABILITY_COLUMN, target_probability)
+        if df is None:
+            return
+        self.rows += len(df)
+        for col in self.ranges:
+            if col in df.columns and col != PROBABILITY_COLUMN:
+                self.add_values(col, pd.to_numeric(df[col], errors='coerce'))
+        for col, counts in self.categories.items():
+            if col not in df.columns:
+                continue
+            values = df[col]
+            self.missing[col] += int(values.isna().sum())
+            values = values.dropna()
+            if encoders is not None and col in encoders:
+                values = encoders[col].normalize(values)
+            for value, count in values.astype(str).value_counts().items():
+                if value not in counts and len(counts) >= MAX_CATEGORIES:
+                    value = OTHER_CATEGORY
+                counts[value] = counts.get(value, 0) + int(count)
+
+    def merge(self, other):
+        """Add the counts of another profile with the same ranges"""
+        self.rows += other.rows
+        for col, counts in other.histograms.items():
+            if col in self.histograms:
+                self.histograms[col] += counts
+        for col, count in other.missing.items():
+            self.missing[col] = self.missing.get(col, 0) + count
+        for col, counts in other.categories.items():
+            mine = self.categories.setdefault(col, {})
+            for value, count in counts.items():
+                mine[value] = mine.get(value, 0) + count
+
+    def quantile(self, col, q):
+        """Approximate quantile, interpolated within the histogram bins.
+
+        Values below or above the range are only known to lie outside it,
+        so quantiles falling there are reported as the range's bounds.
+        """
+        counts = self.histograms[col]
+        total = counts.sum()
+        if total == 0:
+            return float('nan')
+        low, high = self.ranges[col]
+        edges = np.concatenate([[low], np.linspace(low, high, HISTOGRAM_BINS + 1), [high]])
+        cumulative = np.cumsum(counts)
+        target = q * total
+        i = int(np.searchsorted(cumulative, target))
+        before = cumulative[i - 1] if i > 0 else 0
+        share = (target - before) / counts[i] if counts[i] else 0.0
+        return float(edges[i] + share * (edges[i + 1] - edges[i]))
+
+    def out_of_range(self, col):
+        """Share of present values below or above the range"""
+        counts = self.histograms[col]
+        total = counts.sum()
+        return float((counts[0] + counts[-1]) / total) if total else float('nan')
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'started': self.started,
+            'ranges': self.ranges,
+            'histograms': {col: counts.tolist() for col, counts in self.histograms.items()},
+            'missing': self.missing,
+            'categories': self.categories,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        ranges = {col: bounds for col, bounds in data['ranges'].items() if col != PROBABILITY_COLUMN}
+        profile = cls(ranges, list(data['categories']))
+        profile.rows = data['rows']
+        profile.started = data.get('started', profile.started)
+        for col, counts in data['histograms'].items():
+            profile.histograms[col] = np.asarray(counts, dtype=np.int64)
+        profile.missing.update(data['missing'])
+        profile.categories = {col: dict(counts) for col, counts in data['categories'].items()}
+        return profile
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write beside the target and rename, so readers never see half a file
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+def population_stability(reference, current):
+    """PSI between two count vectors over the same bins"""
+    reference = np.asarray(reference, dtype=np.float64)
+    current = np.asarray(current, dtype=np.float64)
+    if reference.sum() == 0 or current.sum() == 0:
+        return float('nan')
+    # A floor on the shares of empty bins keeps the log finite
+    expected = np.maximum(reference / reference.sum(), 1e-4)
+    actual = np.maximum(current / current.sum(), 1e-4)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def compare_profiles(reference, current):
+    """One row per monitored column comparing ``current`` with ``reference``"""
+    rows = []
+    for col, counts in current.histograms.items():
+        if counts.sum() == 0:
+            continue
+        ref = reference.histograms.get(col) if reference is not None else None
+        rows.append({
+            'column': col,
+            'values': int(counts.sum()),
+            'median': current.quantile(col, 0.5),
+            'reference_median': reference.quantile(col, 0.5) if ref is not None else float('nan'),
+            'p05': current.quantile(col, 0.05),
+            'p95': current.quantile(col, 0.95),
+            'out_of_range': current.out_of_range(col),
+            'reference_out_of_range': reference.out_of_range(col) if ref is not None else float('nan'),
+            'top_value': None,
+            'psi': population_stability(ref, counts) if ref is not None else float('nan'),
+        })
+    for col, counts in current.categories.items():
+        if not counts:
+            continue
+        ref_counts = reference.categories.get(col) if reference is not None else None
+        values = sorted(set(counts) | set(ref_counts or {}))
+        rows.append({
+            'column': col,
+            'values': int(sum(counts.values())),
+            'median': float('nan'),
+            'reference_median': float('nan'),
+            'p05': float('nan'),
+            'p95': float('nan'),
+            'out_of_range': float('nan'),
+            'reference_out_of_range': float('nan'),
+            'top_value': max(counts, key=counts.get),
+            'psi': (population_stability([ref_counts.get(v, 0) for v in values],
+                                         [counts.get(v, 0) for v in values])
+                    if ref_counts else float('nan')),
+        })
+    report = pd.DataFrame(rows)
+    if len(report) > 0:
+        report['status'] = np.select([report['psi'].isna(), report['values'] < MIN_COMPARED_VALUES,
+                                      report['psi'] >= PSI_DRIFT, report['psi'] >= PSI_WATCH],
+                                     ['no reference', 'too few values', 'drift', 'watch'], 'stable')
+    return report
+
+class DriftMonitor:
+    """Process-wide live profile shared by every prediction path.
+
+    ``update`` is cheap enough for the inference path: a few vectorized
+    histogram updates under a lock. The live profile is written to
+    ``profile_path`` at most every ``persist_interval`` seconds and
+    reloaded on start, so it survives restarts.
+    """
+
+    def __init__(self, ranges, categorical_columns, profile_path=DEFAULT_PROFILE_PATH,
+                 reference_path=DEFAULT_REFERENCE_PATH, persist_interval=60):
+        self.ranges = ranges
+        self.categorical_columns = list(categorical_columns)
+        self.profile_path = profile_path
+        self.reference_path = reference_path
+        self.persist_interval = persist_interval
+        self.lock = threading.Lock()
+        self.profile = DriftProfile(ranges, categorical_columns)
+        try:
+            saved = DriftProfile.load(profile_path)
+            self.profile.merge(saved)
+            self.profile.started = saved.started
+        except (OSError, ValueError, KeyError):
+            pass
+        self.last_saved = time.time()
+        self.reference = self.load_reference()
+
+    def load_reference(self):
+        """The training reference profile, or None when there is none"""
+        try:
+            return DriftProfile.load(self.reference_path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def update(self, df=None, target_probability=None, encoders=None):
+        with self.lock:
+            self.profile.update(df, target_probability, encoders)
+            due = time.time() - self.last_saved >= self.persist_interval
+        if due:
+            self.save()
+
+    def save(self):
+        with self.lock:
+            data = DriftProfile.from_dict(self.profile.to_dict())
+            self.last_saved = time.time()
+        try:
+            data.save(self.profile_path)
+        except OSError:
+            pass
+
+    def reset(self):
+        """Start a new monitoring window"""
+        with self.lock:
+            self.profile = DriftProfile(self.ranges, self.categorical_columns)
+        self.save()
+
+    def report(self):
+        with self.lock:
+            current = DriftProfile.from_dict(self.profile.to_dict())
+        return compare_profiles(self.reference, current)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'rows': self.profile.rows,
+                'started': self.profile.started,
+                'last_saved': self.last_saved,
+                'probability': self.profile.histograms[PROBABILITY_COLUMN].copy(),
+                'reference_probability': (self.reference.histograms[PROBABILITY_COLUMN].copy()
+                                          if self.reference is not None else None),
+            }
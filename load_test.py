@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+CMI Behavior Classifier - Load Test
+Drives the prediction code paths with concurrent virtual users sending a
+mix of single and batch predictions built from synthetic records, and
+reports throughput, latency percentiles and memory per concurrency level.
+
+Usage:
+    python load_test.py --users 1 4 16 --duration 30 [--batch-share 0.1]
+    python load_test.py --mode app --users 1 4   # full Streamlit script runs
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The app module doubles as the inference library; keep Streamlit quiet
+# when it is imported outside `streamlit run`
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+
+from app import (CATEGORY_ALIASES, INPUT_RANGES, REQUIRED_COLUMNS, load_audit_log, load_compute_governor,
+                 load_drift_monitor, load_registry, make_prediction, predict_batch)
+from memory_admission import MemorySampler
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+def synthetic_records(rng, n):
+    """``n`` random records matching the input schema and documented ranges"""
+    data = {}
+    for col in REQUIRED_COLUMNS:
+        if col in CATEGORY_ALIASES:
+            labels = [aliases[0] for aliases in CATEGORY_ALIASES[col].values()]
+            data[col] = rng.choice(labels, size=n)
+        else:
+            low, high = INPUT_RANGES[col]
+            data[col] = rng.uniform(low, high, size=n)
+    data['age'] = np.round(data['age']).astype(int)
+    return pd.DataFrame(data, columns=REQUIRED_COLUMNS)
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+class EngineUser:
+    """Virtual user calling the prediction functions the pages use, with
+    the same shared services, so their overhead is part of every request"""
+
+    def __init__(self, registry, args, seed):
+        self.registry = registry
+        self.governor = load_compute_governor()
+        self.monitor = load_drift_monitor()
+        self.audit = load_audit_log()
+        self.args = args
+        self.rng = np.random.default_rng(seed)
+
+    def single(self):
+        record = synthetic_records(self.rng, 1).iloc[0].to_dict()
+        version = self.registry.route()
+        prediction, _ = make_prediction(record, self.registry.get(version), self.registry.encoders,
+                                        early_exit_confidence=self.args.early_exit,
+                                        used_features=self.registry.used_features[version],
+                                        governor=self.governor, monitor=self.monitor, audit=self.audit,
+                                        model_version=version,
+                                        model_fingerprint=self.registry.fingerprints.get(version))
+        if prediction is None:
+            raise RuntimeError("single prediction failed")
+        return 1
+
+    def batch(self):
+        errors = []
+        df = synthetic_records(self.rng, self.args.batch_rows)
+        results_df, _ = predict_batch(df, self.registry, early_exit_confidence=self.args.early_exit,
+                                      on_error=errors.append, governor=self.governor, monitor=self.monitor,
+                                      audit=self.audit)
+        if results_df is None:
+            raise RuntimeError('; '.join(errors) or "batch prediction failed")
+        return len(df)
+
+class AppUser:
+    """Virtual user running the whole Streamlit script in its own session.
+
+    Each request is a form submission on the Single Prediction page,
+    rerunning ``app.py`` through Streamlit's script runner exactly like a
+    browser interaction. Batch pages need a file upload, which the
+    headless test client cannot send, so every request is a single one.
+    The page's simulated loading delay is switched off unless
+    ``--keep-ui-delay`` is given, so latency reflects the app's own work.
+    """
+
+    def __init__(self, registry, args, seed):
+        from streamlit.testing.v1 import AppTest
+        self.session = AppTest.from_file(APP_PATH, default_timeout=args.timeout).run()
+
+    def single(self):
+        self.session.button[0].click().run()
+        if self.session.exception:
+            raise RuntimeError(self.session.exception[0].message)
+        return 1
+
+def run_user(user, args, deadline, rng, samples, lock):
+    """Send requests until ``deadline``, recording ``(kind, seconds, rows, ok, error)``"""
+    while time.perf_counter() < deadline:
+        kind = 'batch' if rng.random() < args.batch_share else 'single'
+        start = time.perf_counter()
+        error = None
+        try:
+            rows = getattr(user, kind)()
+        except Exception as e:
+            rows, error = 0, f"{kind}: {str(e) or type(e).__name__}"
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append((kind, elapsed, rows, error is None, error))
+        if args.think_time > 0:
+            time.sleep(rng.exponential(args.think_time))
+
+def run_level(registry, users, args):
+    """Run one concurrency level and return its report row"""
+    user_class = AppUser if args.mode == 'app' else EngineUser
+    virtual_users = [user_class(registry, args, seed=args.seed + i) for i in range(users)]
+
+    samples, lock = [], threading.Lock()
+    sampler = MemorySampler()
+    sampler.start()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [
+        threading.Thread(target=run_user, daemon=True,
+                         args=(user, args, deadline, np.random.default_rng(args.seed + 1000 + i), samples, lock))
+        for i, user in enumerate(virtual_users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    peak_rss = sampler.stop()
+
+    results = pd.DataFrame(samples, columns=['kind', 'seconds', 'rows', 'ok', 'error'])
+    row = {
+        'users': users,
+        'requests': len(results),
+        'errors': int((~results['ok']).sum()),
+        'req_per_s': len(results) / wall,
+        'rows_per_s': results['rows'].sum() / wall,
+    }
+    for kind in ('single', 'batch'):
+        latency = results.loc[(results['kind'] == kind) & results['ok'], 'seconds'] * 1000
+        for q in (50, 95, 99):
+            row[f'{kind}_p{q}_ms'] = float(np.percentile(latency, q)) if len(latency) else float('nan')
+    row['peak_rss_mb'] = peak_rss / 2**20 if peak_rss is not None else peak_rss_mb()
+    # The most frequent failure messages, with their counts
+    messages = results['error'].dropna().value_counts().head(3)
+    row['error_messages'] = '; '.join(f"{count}x {message}" for message, count in messages.items())
+    return row
+
+def main():
+    """Main load test function"""
+    parser = argparse.ArgumentParser(description="Load test the prediction paths with concurrent users")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Concurrent virtual users, one load level per value")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per load level")
+    parser.add_argument("--mode", choices=["engine", "app"], default="engine",
+                        help="engine: call the prediction functions; app: run the Streamlit script per request")
+    parser.add_argument("--batch-share", type=float, default=0.1,
+                        help="Share of requests that are batch predictions (engine mode)")
+    parser.add_argument("--batch-rows", type=int, default=1000, help="Records per batch request")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Mean pause between a user's requests in seconds (exponential)")
+    parser.add_argument("--early-exit", type=float, default=None,
+                        help="Decision confidence for early-exit inference (off by default)")
+    parser.add_argument("--timeout", type=float, default=60, help="Script run timeout in app mode")
+    parser.add_argument("--keep-ui-delay", action="store_true",
+                        help="Keep the pages' simulated loading delay in app mode (1 s per single prediction)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report to this CSV file")
+    args = parser.parse_args()
+
+    print("🧠 CMI Behavior Classifier - Load Test")
+    print("=" * 50)
+
+    registry = load_registry()
+    if registry is None:
+        print("❌ Could not load the models")
+        sys.exit(1)
+    print(f"✅ Loaded model versions: {', '.join(registry.names)}")
+    if args.mode == 'app':
+        args.batch_share = 0.0
+        if not args.keep_ui_delay:
+            # Read by every script run, which happen in this process
+            os.environ['CMI_UI_DELAY_SCALE'] = '0'
+    print(f"   Mode: {args.mode}, {args.duration:g}s per level, "
+          f"batch share {args.batch_share:.0%} of {args.batch_rows} records")
+    if args.mode == 'app':
+        print("   App latency " + ("includes the page's simulated 1 s loading delay" if args.keep_ui_delay
+                                    else "excludes the page's simulated loading delay"))
+
+    report = []
+    for users in args.users:
+        print(f"\n🚦 {users} concurrent users...")
+        row = run_level(registry, users, args)
+        report.append(row)
+        print(f"   {row['requests']} requests, {row['req_per_s']:.1f} req/s, "
+              f"single p95 {row['single_p95_ms']:.0f} ms, {row['errors']} errors")
+        if row['errors']:
+            print(f"   ❌ {row['error_messages']}")
+
+    report_df = pd.DataFrame(report)
+    report_df['ui_delay'] = args.mode == 'app' and args.keep_ui_delay
+    print("\n📊 Load test report")
+    print(report_df.drop(columns=['error_messages']).to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    if args.output:
+        report_df.to_csv(args.output, index=False)
+        print(f"💾 Saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
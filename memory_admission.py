@@ -0,0 +1,241 @@
+"""
+CMI Behavior Classifier - Memory Admission Control
+Estimates the memory a batch needs before it is parsed and decides how it
+may run within a per-process budget: in one piece, in chunks, in chunks
+with results spilled to disk, after waiting for running jobs to finish,
+or not at all. The peak RSS of jobs that ran alone refines the estimate,
+and data kept in memory between jobs (cached uploads) is held against the
+budget for as long as it stays resident.
+"""
+
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+MEMORY_MODEL_PATH = os.path.join('cache', 'memory_model.json')
+
+# Working set per row: parsed cells (8 bytes) plus the float32 feature
+# matrix, times a scale for the copies made while validating and scoring
+CELL_BYTES = 8
+FEATURE_BYTES = 4
+DEFAULT_SCALE = 4.0
+# Compact result columns kept per row when a batch runs in chunks
+RESULT_ROW_BYTES = 96
+MIN_CHUNK_ROWS = 1000
+MAX_CHUNK_ROWS = 200_000
+# Smaller jobs are lost in allocator noise and teach the scale nothing
+MIN_LEARN_BYTES = 16 * 2**20
+
+def current_rss_bytes():
+    """Resident set size of this process (None where unsupported)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def default_budget_bytes():
+    """Three quarters of physical memory, or 4 GB when it cannot be read"""
+    try:
+        return int(os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') * 0.75)
+    except (ValueError, AttributeError, OSError):
+        return 4 * 2**30
+
+class MemorySampler(threading.Thread):
+    """Samples RSS in the background to find the peak of a job"""
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_bytes()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            rss = current_rss_bytes()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+class MemoryAdmission:
+    """Per-process memory budget for batch jobs.
+
+    ``plan`` picks a processing mode from the estimated working set;
+    ``reserve`` holds the estimate while a job runs, queueing jobs that do
+    not fit next to the ones already running.
+    """
+
+    def __init__(self, budget_bytes=None, model_path=MEMORY_MODEL_PATH):
+        self.budget = budget_bytes or default_budget_bytes()
+        # Models and the app itself are resident before any batch runs
+        self.baseline = current_rss_bytes() or 0
+        self.model_path = model_path
+        self.scale = DEFAULT_SCALE
+        self.reserved = 0
+        self.running = 0
+        # Bytes of long-lived data by key, e.g. parsed uploads kept in a cache
+        self.held = {}
+        self.condition = threading.Condition()
+        self.history = deque(maxlen=20)
+        try:
+            with open(model_path, 'r', encoding='utf-8') as f:
+                self.scale = float(json.load(f)['scale'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    @property
+    def capacity(self):
+        """Bytes available to batch jobs when none is running"""
+        return self.available()
+
+    def available(self, held_key=None):
+        """Bytes available to batch jobs when none is running.
+
+        Held data counts against the budget, except the entry under
+        ``held_key``: a job's own parsed upload is part of its estimate.
+        """
+        with self.condition:
+            held = sum(nbytes for key, nbytes in self.held.items() if key != held_key)
+        return max(self.budget - self.baseline - held, 0)
+
+    def hold(self, key, nbytes, owner=None):
+        """Count ``nbytes`` of resident data under ``key`` against the budget.
+
+        Several items may be held under one key. With ``owner`` the bytes
+        are released once that object is garbage collected, e.g. when a
+        cache evicts it.
+        """
+        with self.condition:
+            self.held[key] = self.held.get(key, 0) + nbytes
+        if owner is not None:
+            weakref.finalize(owner, self.release, key, nbytes)
+
+    def release(self, key, nbytes):
+        """Stop counting ``nbytes`` held under ``key``"""
+        with self.condition:
+            remaining = self.held.get(key, 0) - nbytes
+            if remaining > 0:
+                self.held[key] = remaining
+            else:
+                self.held.pop(key, None)
+            self.condition.notify_all()
+
+    def row_bytes(self, columns, n_features):
+        """Unscaled bytes per row of parsed data and feature matrix"""
+        return columns * CELL_BYTES + n_features * FEATURE_BYTES
+
+    def plan(self, rows, columns, n_features, held_key=None, input_bytes=0):
+        """Choose how a batch of ``rows`` x ``columns`` should run.
+
+        ``input_bytes`` (the raw upload and its decoded buffers) are
+        resident whatever the mode and are added to the estimate unscaled.
+        ``held_key`` names the job's own held data, if any (see
+        ``available``). Returns a dict with ``mode`` (``full``, ``queue``, ``chunked``,
+        ``spill`` or ``reject``), the ``estimate`` in bytes to reserve,
+        ``chunk_rows`` for chunked modes, the ``units`` the estimate was
+        derived from and a human-readable ``reason``.
+        """
+        row_bytes = self.row_bytes(columns, n_features)
+        full = self.scale * rows * row_bytes + input_bytes
+        capacity = self.available(held_key)
+        if full <= capacity:
+            with self.condition:
+                fits_now = self.reserved + full <= capacity
+            return {
+                'mode': 'full' if fits_now else 'queue',
+                'estimate': full,
+                'chunk_rows': None,
+                'units': rows * row_bytes,
+                'reason': "fits in the budget" if fits_now else "waits for running batches to free memory",
+            }
+
+        # Half of the capacity for one chunk, half for the kept results
+        room = capacity - input_bytes
+        chunk_rows = min(int(max(room, 0) / 2 // (self.scale * row_bytes)), MAX_CHUNK_ROWS)
+        if chunk_rows < MIN_CHUNK_ROWS:
+            return {'mode': 'reject', 'estimate': full, 'chunk_rows': None, 'units': rows * row_bytes,
+                    'reason': f"even {MIN_CHUNK_ROWS} rows at a time exceed the budget"}
+        results = rows * RESULT_ROW_BYTES
+        spill = results > room / 2
+        return {
+            'mode': 'spill' if spill else 'chunked',
+            'estimate': self.scale * chunk_rows * row_bytes + input_bytes + (0 if spill else results),
+            'chunk_rows': chunk_rows,
+            'units': chunk_rows * row_bytes,
+            'reason': "results are written to disk" if spill else "processed in chunks",
+        }
+
+    @contextmanager
+    def reserve(self, nbytes, label, units=None, timeout=None, held_key=None):
+        """Hold ``nbytes`` of the budget for the duration of the block.
+
+        Waits while other jobs hold too much of it; a job is always
+        admitted when nothing else is running. Raises TimeoutError after
+        ``timeout`` seconds. With ``units`` (the unscaled estimate) the
+        measured peak of a job that ran alone updates the scale.
+        ``held_key`` is as for ``plan``.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while self.running and self.reserved + nbytes > self.available(held_key):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{label} waited {timeout:.0f}s for memory")
+                self.condition.wait(remaining)
+            self.reserved += nbytes
+            self.running += 1
+            alone = self.running == 1
+
+        before = current_rss_bytes()
+        sampler = MemorySampler()
+        sampler.start()
+        started = time.time()
+        try:
+            yield
+        finally:
+            peak = sampler.stop()
+            with self.condition:
+                self.reserved -= nbytes
+                self.running -= 1
+                alone = alone and self.running == 0
+                self.condition.notify_all()
+            used = peak - before if peak is not None and before is not None else None
+            self.history.append({'job': label, 'estimate_mb': nbytes / 2**20,
+                                 'peak_mb': None if used is None else used / 2**20,
+                                 'seconds': time.time() - started})
+            if alone and units and units >= MIN_LEARN_BYTES and used and used > 0:
+                self.learn(used / units)
+
+    def learn(self, observed_scale):
+        """Move the scale towards what a job actually used"""
+        self.scale = min(max(0.7 * self.scale + 0.3 * observed_scale, 1.0), 20.0)
+        try:
+            directory = os.path.dirname(self.model_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.model_path, 'w', encoding='utf-8') as f:
+                json.dump({'scale': self.scale}, f)
+        except OSError:
+            pass
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                'budget_mb': self.budget / 2**20,
+                'baseline_mb': self.baseline / 2**20,
+                'reserved_mb': self.reserved / 2**20,
+                'held_mb': sum(self.held.values()) / 2**20,
+                'running': self.running,
+                'scale': self.scale,
+                'rss_mb': (current_rss_bytes() or 0) / 2**20,
+                'history': list(self.history),
+            }
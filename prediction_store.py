@@ -0,0 +1,157 @@
+"""
+CMI Behavior Classifier - Persistent Prediction Store
+Content-addressed SQLite cache of batch predictions shared across sessions
+and restarts. Rows are keyed by a hash of their input values plus the
+fingerprint of the model that scored them; whole uploads are recorded by
+content hash so re-submitted files can be recognised.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_PATH = os.path.join('cache', 'predictions.sqlite')
+DEFAULT_MAX_ROWS = 2_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    model_fingerprint TEXT NOT NULL,
+    row_hash INTEGER NOT NULL,
+    non_target_probability REAL NOT NULL,
+    target_probability REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model_fingerprint, row_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used);
+CREATE TABLE IF NOT EXISTS files (
+    file_hash TEXT NOT NULL,
+    model_fingerprint TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (file_hash, model_fingerprint)
+);
+"""
+
+def content_hash(data):
+    """SHA-256 hex digest of bytes or of a file on disk"""
+    digest = hashlib.sha256()
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        digest.update(data)
+    else:
+        with open(data, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def row_hashes(df):
+    """Vectorized 64-bit hash of every row's values (index ignored)"""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    # SQLite integers are signed 64-bit
+    return hashes.view(np.int64)
+
+class PredictionStore:
+    """SQLite-backed prediction cache with a row cap and LRU eviction"""
+
+    def __init__(self, path=DEFAULT_STORE_PATH, max_rows=DEFAULT_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        # One short-lived connection per call keeps the store usable from
+        # every Streamlit session thread
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def seen_file(self, file_hash, model_fingerprint):
+        """Return the row count recorded for a previously scored file, or None"""
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT row_count FROM files WHERE file_hash = ? AND model_fingerprint = ?",
+                (file_hash, model_fingerprint)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE files SET last_used = ? WHERE file_hash = ? AND model_fingerprint = ?",
+                    (time.time(), file_hash, model_fingerprint))
+        return None if row is None else row[0]
+
+    def record_file(self, file_hash, model_fingerprint, row_count):
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (file_hash, model_fingerprint, int(row_count), time.time()))
+
+    def lookup(self, model_fingerprint, hashes):
+        """Look up rows by hash.
+
+        Returns ``(found, proba)``: a boolean mask over ``hashes`` and an
+        ``(n, 2)`` probability array (NaN where not found).
+        """
+        hashes = np.asarray(hashes, dtype=np.int64)
+        found = np.zeros(len(hashes), dtype=bool)
+        proba = np.full((len(hashes), 2), np.nan)
+        if len(hashes) == 0:
+            return found, proba
+
+        with self.connect() as conn:
+            conn.execute("CREATE TEMP TABLE wanted (row_hash INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO wanted VALUES (?)",
+                             ((int(h),) for h in np.unique(hashes)))
+            rows = conn.execute(
+                "SELECT p.row_hash, p.non_target_probability, p.target_probability "
+                "FROM predictions p JOIN wanted w ON p.row_hash = w.row_hash "
+                "WHERE p.model_fingerprint = ?", (model_fingerprint,)).fetchall()
+            if rows:
+                conn.execute(
+                    "UPDATE predictions SET last_used = ? WHERE model_fingerprint = ? "
+                    "AND row_hash IN (SELECT row_hash FROM wanted)",
+                    (time.time(), model_fingerprint))
+
+        if rows:
+            stored = np.array(rows, dtype=np.float64)
+            stored_hashes = np.array([r[0] for r in rows], dtype=np.int64)
+            order = np.argsort(stored_hashes)
+            positions = np.searchsorted(stored_hashes[order], hashes)
+            positions = np.minimum(positions, len(order) - 1)
+            found = stored_hashes[order][positions] == hashes
+            proba[found] = stored[order][positions[found], 1:]
+        return found, proba
+
+    def save(self, model_fingerprint, hashes, proba):
+        """Store probabilities for new rows, then enforce the row cap"""
+        if len(hashes) == 0:
+            return
+        now = time.time()
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                ((model_fingerprint, int(h), float(p[0]), float(p[1]), now)
+                 for h, p in zip(hashes, proba)))
+        self.evict()
+
+    def evict(self):
+        """Drop the least recently used rows beyond ``max_rows``"""
+        with self.connect() as conn:
+            (count,) = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()
+            excess = count - self.max_rows
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM predictions WHERE (model_fingerprint, row_hash) IN "
+                    "(SELECT model_fingerprint, row_hash FROM predictions "
+                    "ORDER BY last_used LIMIT ?)", (excess,))
+        return max(excess, 0)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+CMI Behavior Classifier - Model Repacking Tool
+Repacks the RandomForest as a compact, versioned artifact: training-only
+attributes are dropped and the tree arrays are stored in the narrowest
+types that keep every prediction identical. A parity check compares the
+repacked model's probabilities and leaves with the original on threshold
+probes (and optional data), and load time and resident memory are measured
+for both in fresh processes.
+
+Usage:
+    python repack_model.py [--model models/model.pkl] [--data holdout.csv]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# The app module doubles as the inference library; keep Streamlit quiet
+# when it is imported outside `streamlit run`
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+
+from app import (DEFAULT_ENCODERS_PATH, DEFAULT_MODEL_PATH, compile_encoding_tables, forest_predict_proba,
+                 load_model_file, preprocess_input_data, read_batch_file)
+from compact_forest import pack_forest
+from memory_admission import MemorySampler, current_rss_bytes
+
+def boundary_probes(model, rows, seed=0):
+    """Rows whose values sit on, just below and just above split thresholds.
+
+    Thresholds are stored rounded down to float32, so these are the inputs
+    where a lossy repack would send a row down the other branch. A few
+    values are missing to exercise the missing-value branches, as are the
+    probes of infinite thresholds: forests fit on data with missing values
+    use them to split off only the missing values.
+    """
+    rng = np.random.default_rng(seed)
+    features = np.concatenate([e.tree_.feature for e in model.estimators_])
+    thresholds = np.concatenate([e.tree_.threshold for e in model.estimators_])
+    split = features >= 0
+    features, thresholds = features[split], thresholds[split]
+
+    matrix = np.zeros((rows, model.n_features_in_), dtype=np.float32)
+    for feature in np.unique(features):
+        picked = rng.choice(thresholds[features == feature], rows).astype(np.float32)
+        direction = rng.choice(np.array([-np.inf, 0, np.inf], dtype=np.float32), rows)
+        probes = np.where(direction == 0, picked, np.nextafter(picked, direction))
+        matrix[:, feature] = np.where(np.isinf(probes), np.nan, probes)
+    matrix[rng.random(matrix.shape) < 0.02] = np.nan
+    return matrix
+
+def parity_check(original, repacked, matrix):
+    """Whether probabilities and leaves are bit-for-bit identical.
+
+    Single-threaded, so the trees' probabilities are summed in the same
+    order for both models.
+    """
+    expected = forest_predict_proba(original, matrix, n_jobs=1)
+    actual = forest_predict_proba(repacked, matrix, n_jobs=1)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        same_leaves = np.array_equal(original.apply(matrix), repacked.apply(matrix))
+    return np.array_equal(expected, actual) and same_leaves, float(np.abs(expected - actual).max())
+
+def measure_load(path):
+    """Load ``path`` in this process and print timing and memory as JSON"""
+    before = current_rss_bytes()
+    sampler = MemorySampler(interval=0.005)
+    sampler.start()
+    start = time.perf_counter()
+    model = load_model_file(path)
+    seconds = time.perf_counter() - start
+    after = current_rss_bytes()
+    peak = max(sampler.stop() or 0, after or 0) or None
+    print(json.dumps({
+        'trees': len(model.estimators_),
+        'load_s': seconds,
+        'rss_mb': (after - before) / 2**20 if before is not None else None,
+        'peak_mb': (peak - before) / 2**20 if peak is not None and before is not None else None,
+    }))
+
+def measure_in_fresh_process(path, repeats):
+    """Median load measurements over ``repeats`` new interpreters"""
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, __file__, "--measure-load", path],
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    report = pd.DataFrame(runs).median(numeric_only=True).to_dict()
+    report['file_mb'] = os.path.getsize(path) / 2**20
+    return report
+
+def main():
+    """Main repacking function"""
+    parser = argparse.ArgumentParser(description="Repack the RandomForest as a compact artifact")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Model to repack")
+    parser.add_argument("--output", default="models/model_repacked.pkl", help="Where to save the compact artifact")
+    parser.add_argument("--data", help="Optional CSV, Parquet or Arrow/Feather records to include in the parity check")
+    parser.add_argument("--label", default="target", help="Label column in --data, ignored when present")
+    parser.add_argument("--encoders", default=DEFAULT_ENCODERS_PATH)
+    parser.add_argument("--probe-rows", type=int, default=5000, help="Threshold probe rows for the parity check")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh-process load measurements per model")
+    parser.add_argument("--measure-load", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_load:
+        measure_load(args.measure_load)
+        return
+
+    print("🧠 CMI Behavior Classifier - Model Repacking")
+    print("=" * 50)
+
+    model = load_model_file(args.model)
+    print(f"✅ Loaded {args.model}: {len(model.estimators_)} trees, "
+          f"{sum(e.tree_.node_count for e in model.estimators_):,} nodes")
+
+    artifact = pack_forest(model)
+    arrays = artifact['arrays']
+    print("\n📦 Stored arrays")
+    for name, array in arrays.items():
+        print(f"   {name:<24} {str(array.dtype):<8} {array.nbytes / 2**20:8.2f} MB")
+    print(f"   Node values stored as: {artifact['value_encoding']}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    joblib.dump(artifact, args.output)
+    repacked = load_model_file(args.output)
+
+    print("\n🔍 Parity check...")
+    matrix = boundary_probes(model, args.probe_rows)
+    if args.data:
+        with open(args.data, 'rb') as f:
+            df = read_batch_file(f, name=args.data).drop(columns=[args.label], errors='ignore')
+        # Imputed engineered features are drawn at random, as in the app
+        np.random.seed(0)
+        data_matrix = preprocess_input_data(df, model, compile_encoding_tables(joblib.load(args.encoders)))
+        if data_matrix is None:
+            print(f"❌ Could not preprocess {args.data}")
+            sys.exit(1)
+        matrix = np.vstack([matrix, data_matrix])
+    identical, max_difference = parity_check(model, repacked, matrix)
+    if not identical:
+        os.remove(args.output)
+        print(f"❌ Repacked model differs on {len(matrix)} rows (max probability difference "
+              f"{max_difference:.3g}); nothing saved")
+        sys.exit(1)
+    print(f"✅ Identical probabilities and leaves on {len(matrix)} rows")
+
+    print("\n⏱️  Measuring load time and memory in fresh processes...")
+    report = pd.DataFrame([
+        dict(model=args.model, **measure_in_fresh_process(args.model, args.repeats)),
+        dict(model=args.output, **measure_in_fresh_process(args.output, args.repeats)),
+    ])[['model', 'file_mb', 'load_s', 'rss_mb', 'peak_mb']]
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    before, after = report.iloc[0], report.iloc[1]
+    print(f"\n✅ File {before['file_mb'] / after['file_mb']:.1f}x smaller, "
+          f"loads {before['load_s'] / after['load_s']:.1f}x faster")
+    if not pd.isna(after['rss_mb']):
+        print(f"   Resident memory after load: {before['rss_mb']:.1f} MB -> {after['rss_mb']:.1f} MB, "
+              f"peak while loading: {before['peak_mb']:.1f} MB -> {after['peak_mb']:.1f} MB")
+    print(f"💾 Saved to {args.output}")
+    print("   Point a version in models/registry.json at it, or replace models/model.pkl")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,39 @@
 #!/usr/bin/env python3
 """
 CMI Behavior Classifier - Startup Script
-This script checks dependencies and launches the Streamlit application.
+This script checks dependencies and launches the Streamlit application,
+either as one process or as several workers on consecutive ports that are
+health-checked, restarted when they fail and optionally fronted by a
+round-robin proxy.
+
+Usage:
+    python run_app.py                          # one app on port 8501
+    python run_app.py --workers 4 --proxy      # 4 workers behind http://localhost:8501
 """
 
+import argparse
+import asyncio
+import itertools
 import sys
 import subprocess
 import os
+import signal
+import threading
+import time
+import urllib.request
 from pathlib import Path
 
+HEALTH_PATH = '/_stcore/health'
+# A worker not ready this long after starting is restarted
+STARTUP_TIMEOUT = 120
+# Consecutive failed liveness checks before a worker is restarted
+MAX_HEALTH_FAILURES = 3
+MAX_RESTART_DELAY = 30
+# A worker healthy for this long after a start has recovered; its backoff starts over
+STABLE_SECONDS = 2 * MAX_RESTART_DELAY
+# Cookie pinning a browser to one worker: sessions, uploads and downloads live in that process
+WORKER_COOKIE = 'cmi_worker'
+
 def check_python_version():
     """Check if Python version is compatible"""
     if sys.version_info < (3, 8):
@@ -61,8 +86,225 @@ def check_model_files():
     print("✅ Model files found")
     return True
 
+def streamlit_command(port, address):
+    """Command line running the app with this interpreter on ``port``"""
+    return [sys.executable, "-m", "streamlit", "run", "app.py",
+            "--server.port", str(port), "--server.address", address, "--server.headless", "true"]
+
+def worker_environment(index, workers):
+    """Environment of one worker: a share of the host's cores and memory.
+
+    Every worker is a separate process with its own compute governor and
+    memory budget, so the host's budgets are split between them unless
+    they are set explicitly.
+    """
+    env = dict(os.environ)
+    if workers > 1:
+        env.setdefault('CMI_COMPUTE_CORES', str(max(1, (os.cpu_count() or 1) // workers)))
+        try:
+            total_mb = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 2**20
+            env.setdefault('CMI_MEMORY_BUDGET_MB', str(int(total_mb * 0.75 / workers)))
+        except (ValueError, AttributeError, OSError):
+            pass
+        # Each worker keeps its own live drift profile
+        env.setdefault('CMI_DRIFT_PROFILE', os.path.join('cache', f'drift_profile-{index}.json'))
+    return env
+
+class Worker:
+    """One Streamlit process with its health state"""
+
+    def __init__(self, index, port, address, workers):
+        self.index = index
+        self.port = port
+        self.address = address
+        self.workers = workers
+        self.process = None
+        self.ready = False
+        self.failures = 0
+        self.restarts = 0
+        self.started = 0.0
+        self.next_start = 0.0
+
+    def start(self):
+        self.process = subprocess.Popen(streamlit_command(self.port, self.address),
+                                        env=worker_environment(self.index, self.workers))
+        self.ready = False
+        self.failures = 0
+        self.started = time.time()
+        print(f"🚀 Worker {self.index} starting on port {self.port} (pid {self.process.pid})")
+
+    def stop(self, timeout=10):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def healthy(self):
+        """Whether the worker answers its health endpoint"""
+        host = '127.0.0.1' if self.address in ('0.0.0.0', '') else self.address
+        try:
+            with urllib.request.urlopen(f"http://{host}:{self.port}{HEALTH_PATH}", timeout=2) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    def restart(self, reason):
+        """Stop the worker and schedule a start, backing off after repeated failures"""
+        print(f"⚠️  Worker {self.index} {reason}; restarting")
+        self.stop()
+        self.ready = False
+        self.restarts += 1
+        self.next_start = time.time() + min(2 ** (self.restarts - 1), MAX_RESTART_DELAY)
+        self.process = None
+
+def supervise(workers, interval, stopped):
+    """Readiness and liveness checks; restart workers that exit or stop answering"""
+    while not stopped.is_set():
+        now = time.time()
+        for worker in workers:
+            if worker.process is None:
+                if now >= worker.next_start:
+                    worker.start()
+            elif worker.process.poll() is not None:
+                worker.restart(f"exited with code {worker.process.returncode}")
+            elif not worker.ready:
+                if worker.healthy():
+                    worker.ready = True
+                    print(f"✅ Worker {worker.index} ready on port {worker.port} "
+                          f"({time.time() - worker.started:.1f}s)")
+                elif now - worker.started > STARTUP_TIMEOUT:
+                    worker.restart(f"not ready after {STARTUP_TIMEOUT}s")
+            elif worker.healthy():
+                worker.failures = 0
+                if worker.restarts and now - worker.started > STABLE_SECONDS:
+                    worker.restarts = 0
+            else:
+                worker.failures += 1
+                if worker.failures >= MAX_HEALTH_FAILURES:
+                    worker.restart(f"failed {worker.failures} health checks")
+        stopped.wait(interval)
+
+class RoundRobinProxy:
+    """Minimal HTTP/WebSocket proxy spreading browsers over ready workers.
+
+    Only the first request head of each connection is parsed: a browser
+    without the worker cookie is sent to the next ready worker and the
+    cookie is added to the response, so its later connections (the
+    WebSocket session, file uploads, downloads) reach the same process.
+    Everything after that is piped through unchanged.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.order = itertools.cycle(range(len(workers)))
+
+    def choose(self, head):
+        for line in head.split(b'\r\n'):
+            if line.lower().startswith(b'cookie:'):
+                for cookie in line[7:].decode('latin-1').split(';'):
+                    name, _, value = cookie.strip().partition('=')
+                    if name == WORKER_COOKIE and value.isdigit() and int(value) < len(self.workers) \
+                            and self.workers[int(value)].ready:
+                        return self.workers[int(value)], False
+        for _ in range(len(self.workers)):
+            worker = self.workers[next(self.order)]
+            if worker.ready:
+                return worker, True
+        return None, False
+
+    async def pipe(self, reader, writer):
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, client_reader, client_writer):
+        try:
+            head = await client_reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+        worker, pin = self.choose(head)
+        if worker is None:
+            client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n"
+                                b"Retry-After: 5\r\nConnection: close\r\n\r\n")
+            await client_writer.drain()
+            client_writer.close()
+            return
+        try:
+            backend_reader, backend_writer = await asyncio.open_connection('127.0.0.1', worker.port)
+        except OSError:
+            client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await client_writer.drain()
+            client_writer.close()
+            return
+        backend_writer.write(head)
+        if pin:
+            try:
+                response = await backend_reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                backend_writer.close()
+                client_writer.close()
+                return
+            status, _, rest = response.partition(b'\r\n')
+            cookie = f"Set-Cookie: {WORKER_COOKIE}={worker.index}; Path=/; HttpOnly; SameSite=Lax\r\n"
+            client_writer.write(status + b'\r\n' + cookie.encode() + rest)
+        await asyncio.gather(self.pipe(client_reader, backend_writer), self.pipe(backend_reader, client_writer))
+
+    def serve(self, address, port):
+        """Run the proxy on its own thread"""
+        async def run():
+            server = await asyncio.start_server(self.handle, address, port)
+            async with server:
+                await server.serve_forever()
+        thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+        thread.start()
+        return thread
+
+def run_workers(args):
+    """Start the workers, supervise them and block until Ctrl+C"""
+    first_port = args.port + 1 if args.proxy else args.port
+    # Workers only listen locally when the proxy is their front door
+    address = '127.0.0.1' if args.proxy else args.address
+    workers = [Worker(i, first_port + i, address, args.workers) for i in range(args.workers)]
+    stopped = threading.Event()
+    supervisor = threading.Thread(target=supervise, args=(workers, args.health_interval, stopped), daemon=True)
+    supervisor.start()
+    if args.proxy:
+        RoundRobinProxy(workers).serve(args.address, args.port)
+        print(f"🔀 Round-robin proxy on http://localhost:{args.port}")
+    # A service manager's SIGTERM shuts the workers down like Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n👋 Stopping workers...")
+    finally:
+        stopped.set()
+        supervisor.join()
+        for worker in workers:
+            worker.stop()
+
 def main():
     """Main startup function"""
+    parser = argparse.ArgumentParser(description="Check the setup and start the app")
+    parser.add_argument("--workers", type=int, default=1, help="App processes to run on consecutive ports")
+    parser.add_argument("--port", type=int, default=8501, help="First worker port, or the proxy port")
+    parser.add_argument("--address", default="localhost", help="Address to listen on")
+    parser.add_argument("--proxy", action="store_true",
+                        help="Serve all workers on --port through a round-robin proxy")
+    parser.add_argument("--health-interval", type=float, default=5, help="Seconds between health checks")
+    args = parser.parse_args()
+
     print("🧠 CMI Behavior Classifier - Startup Check")
     print("=" * 50)
     
@@ -80,14 +322,21 @@ def main():
     
     print("\n🚀 Starting CMI Behavior Classifier...")
     print("=" * 50)
-    print("The web app will open in your browser automatically.")
-    print("If it doesn't open, go to: http://localhost:8501")
+    if args.workers > 1 or args.proxy:
+        ports = (f"{args.port}" if args.proxy else f"{args.port}-{args.port + args.workers - 1}")
+        print(f"Starting {args.workers} workers; go to http://localhost:{ports}")
+    else:
+        print("The web app will open in your browser automatically.")
+        print(f"If it doesn't open, go to: http://localhost:{args.port}")
     print("Press Ctrl+C to stop the application.")
     print("=" * 50)
     
     try:
-        # Launch Streamlit app using py command
-        subprocess.run(["py", "-m", "streamlit", "run", "app.py"])
+        if args.workers > 1 or args.proxy:
+            run_workers(args)
+        else:
+            # Launch Streamlit with the interpreter running this script
+            subprocess.run([sys.executable, "-m", "streamlit", "run", "app.py", "--server.port", str(args.port)])
     except KeyboardInterrupt:
         print("\n👋 Application stopped by user")
     except Exception as e:
@@ -8,7 +8,6 @@ import os
 import sys
 import subprocess
 import platform
-import zipfile
 from pathlib import Path
 
 # Import requests after dependencies are installed
@@ -102,7 +101,7 @@ def install_dependencies():
         return False
 
 def download_models():
-    """Download model files from Google Drive"""
+    """Download model files listed in models/artifacts.json"""
     global requests
     
     # Import requests here after dependencies are installed
@@ -112,42 +111,26 @@ def download_models():
         print("❌ requests module not found. Please install dependencies first.")
         return False
     
-    print("📥 Downloading model files from Google Drive...")
+    from artifact_fetcher import ARTIFACT_MANIFEST_PATH, DEFAULT_CACHE_DIR, fetch_artifact, load_manifest
     
-    # Create models directory if it doesn't exist
-    models_dir = Path("models")
-    models_dir.mkdir(exist_ok=True)
+    print("📥 Downloading model files...")
     
-    # Google Drive file ID from the URL
-    file_id = "16ldFJFaC9gUyY7Ezmh-jUrNA8j_xvcOQ"
-    
-    # Google Drive direct download URL
-    download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
+    # Overrides make it possible to point setup at a mirror or a shared cache
+    manifest_path = os.environ.get("CMI_ARTIFACT_MANIFEST", ARTIFACT_MANIFEST_PATH)
+    cache_dir = os.environ.get("CMI_ARTIFACT_CACHE", DEFAULT_CACHE_DIR)
     
     try:
-        print("   Downloading models.zip...")
-        response = requests.get(download_url, stream=True)
-        response.raise_for_status()
-        
-        # Save the zip file
-        zip_path = "models.zip"
-        with open(zip_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        print("   Extracting model files...")
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall("models/")
-        
-        # Clean up the zip file
-        os.remove(zip_path)
+        for artifact in load_manifest(manifest_path):
+            print(f"   Fetching {artifact['name']}...")
+            fetch_artifact(artifact, cache_dir=cache_dir)
         
         print("✅ Model files downloaded and extracted successfully")
         return True
         
     except Exception as e:
         print(f"❌ Error downloading model files: {e}")
-        print("   Please download the models manually from:")
+        print("   Re-running setup resumes an interrupted download")
+        print("   Or download the models manually from:")
         print("   https://drive.google.com/file/d/16ldFJFaC9gUyY7Ezmh-jUrNA8j_xvcOQ/view?usp=sharing")
         print("   Extract the files to the models/ directory")
         return False
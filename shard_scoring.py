@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+CMI Behavior Classifier - Sharded Batch Scoring
+Scores datasets too large for one host. ``split`` cuts the input into
+Parquet shards in a work directory; any number of ``work`` processes, on
+this machine or others sharing the directory, claim shards through atomic
+lease files and score them with the app's preprocessing and model; ``merge``
+joins the per-shard outputs in input order. Leases are renewed while a
+shard is scored, so shards held by crashed workers are taken over once
+their lease expires. A shard that keeps failing is retried with backoff
+and given up after a few attempts, and the workers and ``merge`` then exit
+non-zero naming it.
+
+Usage:
+    python shard_scoring.py split --input backfill.csv --work-dir /shared/job1 [--shard-rows 100000]
+    python shard_scoring.py work --work-dir /shared/job1 [--processes 4]
+    python shard_scoring.py status --work-dir /shared/job1
+    python shard_scoring.py merge --work-dir /shared/job1 --output results.parquet
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# The app module doubles as the inference library; keep Streamlit quiet
+# when it is imported outside `streamlit run`
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+
+from app import iter_batch_chunks, load_registry, predict_batch
+
+JOB_FILE = 'job.json'
+DEFAULT_SHARD_ROWS = 100_000
+DEFAULT_LEASE_SECONDS = 300
+POLL_SECONDS = 5
+# A failing shard waits 30s, 60s, 120s, ... before its next attempt
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 600
+
+def shard_name(index):
+    return f"shard-{index:05d}"
+
+class WorkDir:
+    """Layout of a sharded scoring job on shared storage"""
+
+    def __init__(self, path):
+        self.path = path
+        self.shards = os.path.join(path, 'shards')
+        self.leases = os.path.join(path, 'leases')
+        self.outputs = os.path.join(path, 'outputs')
+        self.failures = os.path.join(path, 'failures')
+
+    def job(self):
+        try:
+            with open(os.path.join(self.path, JOB_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            print(f"❌ No job in {self.path}; run `split` first")
+            sys.exit(1)
+
+    def shard(self, index):
+        return os.path.join(self.shards, shard_name(index) + '.parquet')
+
+    def lease(self, index):
+        return os.path.join(self.leases, shard_name(index) + '.lease')
+
+    def output(self, index, kind='results'):
+        return os.path.join(self.outputs, f"{shard_name(index)}.{kind}.parquet")
+
+    def done(self, index):
+        # The rejects file is written last, so it marks a finished shard
+        return os.path.exists(self.output(index, 'rejects'))
+
+    def failure_marker(self, index):
+        return os.path.join(self.failures, shard_name(index) + '.failed')
+
+    def failure(self, index):
+        """Attempts, last error and retry time of a failing shard, or None"""
+        try:
+            with open(self.failure_marker(index), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def record_failure(self, index, error, worker):
+        """Count a failed attempt; only called while holding the shard's lease"""
+        attempts = (self.failure(index) or {}).get('attempts', 0) + 1
+        backoff = min(RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+        os.makedirs(self.failures, exist_ok=True)
+        # Retry times use the storage's clock, which every worker shares
+        now = storage_now(self.failures)
+        failure = {'attempts': attempts, 'last_error': error, 'worker': worker,
+                   'failed': now, 'retry_after': now + backoff}
+        path = self.failure_marker(index)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(failure, f)
+        os.replace(tmp, path)
+        return failure
+
+    def clear_failure(self, index):
+        try:
+            os.remove(self.failure_marker(index))
+        except FileNotFoundError:
+            pass
+
+    def failed(self, job):
+        """Shards given up after ``max_attempts``, with their failure records"""
+        max_attempts = job.get('max_attempts', DEFAULT_MAX_ATTEMPTS)
+        failed = {}
+        for shard in job['shards']:
+            failure = self.failure(shard['index'])
+            if failure and failure['attempts'] >= max_attempts and not self.done(shard['index']):
+                failed[shard['index']] = failure
+        return failed
+
+def report_failed(failed):
+    """Print the shards that were given up, with their last errors"""
+    print(f"❌ {len(failed)} shards failed: {', '.join(shard_name(index) for index in failed)}")
+    for index, failure in failed.items():
+        print(f"   {shard_name(index)} after {failure['attempts']} attempts: {failure['last_error']}")
+
+def write_parquet_atomic(df, path):
+    """Write next to ``path`` and rename, so readers never see a partial file"""
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+def iter_input_chunks(path, rows):
+    """Read a CSV, Parquet or Arrow/Feather file ``rows`` records at a time"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('feather', 'arrow', 'ipc'):
+        table = feather.read_table(path, memory_map=True)
+        for start in range(0, table.num_rows, rows):
+            yield table.slice(start, rows).to_pandas()
+        return
+    with open(path, 'rb') as f:
+        yield from iter_batch_chunks(f, None, rows)
+
+def split(args):
+    """Cut the input into shards and describe the job"""
+    work = WorkDir(args.work_dir)
+    if os.path.exists(os.path.join(work.path, JOB_FILE)):
+        print(f"❌ {work.path} already holds a job; use a new work directory")
+        sys.exit(1)
+    registry = load_registry()
+    if registry is None:
+        print("❌ Could not load the models")
+        sys.exit(1)
+    version = args.version or registry.default_version
+    if version not in registry.names:
+        print(f"❌ Unknown model version '{version}' (available: {', '.join(registry.names)})")
+        sys.exit(1)
+
+    for directory in (work.shards, work.leases, work.outputs, work.failures):
+        os.makedirs(directory, exist_ok=True)
+    shards, offset = [], 0
+    for index, chunk in enumerate(iter_input_chunks(args.input, args.shard_rows)):
+        write_parquet_atomic(chunk.reset_index(drop=True), work.shard(index))
+        shards.append({'index': index, 'rows': len(chunk), 'offset': offset})
+        offset += len(chunk)
+        print(f"   {shard_name(index)}: {len(chunk)} records")
+
+    job = {
+        'input': os.path.abspath(args.input),
+        'created': datetime.now().isoformat(),
+        'version': version,
+        # Workers on other hosts must load exactly this model
+        'model_fingerprint': registry.fingerprints[version],
+        'early_exit_confidence': args.early_exit,
+        'explain_top_k': args.explain_top_k,
+        'lease_seconds': args.lease_seconds,
+        'max_attempts': args.max_attempts,
+        'shards': shards,
+    }
+    with open(os.path.join(work.path, JOB_FILE), 'w', encoding='utf-8') as f:
+        json.dump(job, f, indent=2)
+    print(f"✅ {offset} records in {len(shards)} shards in {work.path}")
+
+def storage_now(directory):
+    """Current time by the clock that stamps files in ``directory``.
+
+    Touching a file lets the storage set its modification time; on shared
+    storage that is the file server's clock. Lease ages and retry times
+    measured against it are the same on every host, however far their own
+    clocks drift.
+    """
+    probe = os.path.join(directory, f".clock-{socket.gethostname()}-{os.getpid()}")
+    with open(probe, 'a', encoding='utf-8'):
+        pass
+    os.utime(probe)
+    return os.stat(probe).st_mtime
+
+class Lease:
+    """Exclusive, expiring claim on one shard.
+
+    A lease is a file created with a hard link, which is atomic on local
+    and network filesystems alike: exactly one worker's link succeeds.
+    While held, a background thread renews the file's modification time;
+    a lease not renewed for ``lease_seconds`` is stale and may be taken
+    over by renaming it away, which again only one worker can do. Ages are
+    measured with the storage's clock (see storage_now), not the host's.
+    """
+
+    def __init__(self, path, lease_seconds, worker):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.worker = worker
+        self.token = uuid.uuid4().hex
+        self.stopped = threading.Event()
+        self.renewer = None
+
+    def acquire(self):
+        tmp = f"{self.path}.{self.token}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'worker': self.worker, 'token': self.token, 'claimed': time.time()}, f)
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp, self.path)
+                    break
+                except FileExistsError:
+                    if not self.break_if_stale():
+                        return False
+            else:
+                return False
+        finally:
+            os.remove(tmp)
+        self.renewer = threading.Thread(target=self.renew, daemon=True)
+        self.renewer.start()
+        return True
+
+    def break_if_stale(self):
+        """Remove the current lease if it has expired; True when it is gone"""
+        try:
+            age = storage_now(os.path.dirname(self.path)) - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.lease_seconds:
+            return False
+        # Two workers may both see the lease as stale and the slower one
+        # rename away the faster one's new lease; the shard is then scored
+        # twice, which is harmless since a shard's output is deterministic
+        # and written atomically
+        stale = f"{self.path}.{self.token}.stale"
+        try:
+            os.rename(self.path, stale)
+        except FileNotFoundError:
+            # Another worker took it over first; retry the link
+            return True
+        os.remove(stale)
+        print(f"   ♻️  Took over {os.path.basename(self.path)} (lease expired {age:.0f}s ago)")
+        return True
+
+    def held(self):
+        """Whether the lease file is still ours"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)['token'] == self.token
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def renew(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+
+    def release(self):
+        self.stopped.set()
+        if self.renewer is not None:
+            self.renewer.join()
+        if self.held():
+            os.remove(self.path)
+
+def score_shard(work, job, registry, index):
+    """Score one shard and write its results and rejects"""
+    shard = job['shards'][index]
+    df = pd.read_parquet(work.shard(index))
+    # Imputed engineered features are random; seeding per shard makes a
+    # shard's output the same whichever worker scores it
+    np.random.seed(index)
+    errors = []
+    results_df, rejects_df = predict_batch(df, registry, job['version'],
+                                           early_exit_confidence=job['early_exit_confidence'],
+                                           explain_top_k=job['explain_top_k'], on_error=errors.append)
+    if results_df is None:
+        raise RuntimeError('; '.join(errors) or "could not score the shard")
+    # Valid rows keep their position in the shard as index
+    results_df.insert(0, 'row_number', results_df.index + shard['offset'] + 1)
+    results_df = results_df.reset_index(drop=True)
+    rejects_df = rejects_df.assign(row_number=rejects_df['row_number'] + shard['offset'])
+    write_parquet_atomic(results_df, work.output(index, 'results'))
+    write_parquet_atomic(rejects_df, work.output(index, 'rejects'))
+    return len(results_df), len(rejects_df)
+
+def work(args):
+    """Claim and score shards until every shard is done or given up"""
+    if args.processes > 1:
+        # Local workers in separate processes, e.g. to try the queue on one host
+        command = [sys.executable, os.path.abspath(__file__), 'work', '--work-dir', args.work_dir]
+        workers = [subprocess.Popen(command) for _ in range(args.processes)]
+        codes = [worker.wait() for worker in workers]
+        work_dir = WorkDir(args.work_dir)
+        failed = work_dir.failed(work_dir.job())
+        if failed:
+            report_failed(failed)
+        sys.exit(max(codes + [1 if failed else 0]))
+
+    work_dir = WorkDir(args.work_dir)
+    job = work_dir.job()
+    registry = load_registry()
+    if registry is None:
+        print("❌ Could not load the models")
+        sys.exit(1)
+    if registry.fingerprints.get(job['version']) != job['model_fingerprint']:
+        print(f"❌ Model version '{job['version']}' differs from the one the job was split with")
+        sys.exit(1)
+
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    lease_seconds = args.lease_seconds or job['lease_seconds']
+    max_attempts = job.get('max_attempts', DEFAULT_MAX_ATTEMPTS)
+    os.makedirs(work_dir.failures, exist_ok=True)
+    scored = 0
+    while True:
+        now = storage_now(work_dir.failures)
+        pending, next_retry = [], None
+        for shard in job['shards']:
+            index = shard['index']
+            if work_dir.done(index):
+                continue
+            failure = work_dir.failure(index)
+            if failure is None:
+                pending.append(index)
+            elif failure['attempts'] < max_attempts:
+                if failure['retry_after'] <= now:
+                    pending.append(index)
+                else:
+                    next_retry = min(next_retry or failure['retry_after'], failure['retry_after'])
+        if not pending and next_retry is None:
+            break
+        claimed = False
+        for index in pending:
+            lease = Lease(work_dir.lease(index), lease_seconds, worker)
+            if not lease.acquire():
+                continue
+            claimed = True
+            try:
+                # Another worker may have finished it between the check and the claim
+                # and another may have recorded a failure since
+                failure = work_dir.failure(index)
+                if not work_dir.done(index) and (failure is None or (failure['attempts'] < max_attempts
+                                                                      and failure['retry_after'] <= now)):
+                    start = time.time()
+                    rows, rejected = score_shard(work_dir, job, registry, index)
+                    work_dir.clear_failure(index)
+                    scored += 1
+                    print(f"   ✅ {worker} scored {shard_name(index)}: {rows} records, "
+                          f"{rejected} rejected in {time.time() - start:.1f}s")
+            except Exception as e:
+                failure = work_dir.record_failure(index, str(e) or type(e).__name__, worker)
+                retry = (f"retrying in {failure['retry_after'] - failure['failed']:.0f}s"
+                         if failure['attempts'] < max_attempts else "giving up")
+                print(f"   ❌ {worker} failed on {shard_name(index)} (attempt {failure['attempts']} of "
+                      f"{max_attempts}, {retry}): {failure['last_error']}")
+            finally:
+                lease.release()
+        if not claimed:
+            # Everything left is leased by others or backing off; wait for them
+            wait = POLL_SECONDS if next_retry is None else min(max(next_retry - now, 0), POLL_SECONDS)
+            time.sleep(wait)
+    failed = work_dir.failed(job)
+    print(f"🏁 {worker} finished; scored {scored} shards")
+    if failed:
+        report_failed(failed)
+        sys.exit(1)
+
+def status(args):
+    """Show how far the job has got"""
+    work_dir = WorkDir(args.work_dir)
+    job = work_dir.job()
+    counts = {'done': 0, 'leased': 0, 'expired': 0, 'pending': 0, 'retrying': 0, 'failed': 0}
+    failed = work_dir.failed(job)
+    now = storage_now(work_dir.leases)
+    for shard in job['shards']:
+        index = shard['index']
+        if work_dir.done(index):
+            counts['done'] += 1
+            continue
+        if index in failed:
+            counts['failed'] += 1
+            continue
+        try:
+            age = now - os.stat(work_dir.lease(index)).st_mtime
+            counts['leased' if age < job['lease_seconds'] else 'expired'] += 1
+        except FileNotFoundError:
+            counts['retrying' if work_dir.failure(index) else 'pending'] += 1
+    print(f"📊 {len(job['shards'])} shards: " + ", ".join(f"{count} {state}" for state, count in counts.items()))
+    if failed:
+        report_failed(failed)
+    return counts
+
+def merge(args):
+    """Concatenate the shard outputs in input order"""
+    work_dir = WorkDir(args.work_dir)
+    job = work_dir.job()
+    failed = work_dir.failed(job)
+    if failed:
+        report_failed(failed)
+        sys.exit(1)
+    missing = [shard_name(shard['index']) for shard in job['shards'] if not work_dir.done(shard['index'])]
+    if missing:
+        print(f"❌ {len(missing)} shards are not scored yet: {', '.join(missing[:5])}")
+        sys.exit(1)
+
+    rejects_path = args.rejects or os.path.splitext(args.output)[0] + '_rejects' + os.path.splitext(args.output)[1]
+    for kind, path in (('results', args.output), ('rejects', rejects_path)):
+        paths = [work_dir.output(shard['index'], kind) for shard in job['shards']]
+        paths = [p for p in paths if pq.read_metadata(p).num_rows > 0]
+        if not paths:
+            print(f"   No {kind} records")
+            continue
+        # Shards may infer different types for the same column (e.g. ints vs floats with gaps)
+        schema = pa.unify_schemas([pq.read_schema(p).remove_metadata() for p in paths],
+                                  promote_options='permissive')
+        total, writer = 0, None
+        try:
+            for i, shard_path in enumerate(paths):
+                table = pq.read_table(shard_path).select(schema.names).cast(schema)
+                total += table.num_rows
+                if path.endswith('.csv'):
+                    table.to_pandas().to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+                else:
+                    if writer is None:
+                        writer = pq.ParquetWriter(path, schema)
+                    writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        print(f"💾 {total} {kind} records saved to {path}")
+
+def main():
+    """Main sharded scoring function"""
+    parser = argparse.ArgumentParser(description="Score large datasets across processes and hosts")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = commands.add_parser('split', help="Cut the input into shards")
+    split_parser.add_argument("--input", required=True, help="CSV, Parquet or Arrow/Feather file")
+    split_parser.add_argument("--work-dir", required=True, help="Work directory on storage all workers share")
+    split_parser.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS)
+    split_parser.add_argument("--version", help="Model version to score with (registry default)")
+    split_parser.add_argument("--early-exit", type=float, default=None,
+                              help="Decision confidence for early-exit inference (off by default)")
+    split_parser.add_argument("--explain-top-k", type=int, default=None,
+                              help="Add the top contributing features per record")
+    split_parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                              help="Seconds without renewal after which a worker's shard is taken over")
+    split_parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                              help="Failed attempts after which a shard is given up")
+
+    work_parser = commands.add_parser('work', help="Claim and score shards until all are done")
+    work_parser.add_argument("--work-dir", required=True)
+    work_parser.add_argument("--processes", type=int, default=1, help="Worker processes to start on this host")
+    work_parser.add_argument("--lease-seconds", type=float, default=None, help="Override the job's lease time")
+
+    status_parser = commands.add_parser('status', help="Show shard progress")
+    status_parser.add_argument("--work-dir", required=True)
+
+    merge_parser = commands.add_parser('merge', help="Join the shard outputs in input order")
+    merge_parser.add_argument("--work-dir", required=True)
+    merge_parser.add_argument("--output", required=True, help="Results file (.parquet or .csv)")
+    merge_parser.add_argument("--rejects", help="Rejected records file (next to the output by default)")
+    args = parser.parse_args()
+
+    print("🧠 CMI Behavior Classifier - Sharded Scoring")
+    print("=" * 50)
+    {'split': split, 'work': work, 'status': status, 'merge': merge}[args.command](args)
+
+if __name__ == "__main__":
+    main()
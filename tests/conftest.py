@@ -0,0 +1,58 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# The app module doubles as the inference library; keep Streamlit quiet
+# when it is imported outside `streamlit run`
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+
+@pytest.fixture(scope='session')
+def noisy_forest():
+    """A 200-tree forest on noisy labels, so many rows sit near 0.5, and held-out rows"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(6000, 20)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(scale=1.5, size=len(X)) > 0).astype(int)
+    model = RandomForestClassifier(200, max_features=0.3, random_state=0, n_jobs=1).fit(X[:3000], y[:3000])
+    return model, X[3000:]
+
+@pytest.fixture(scope='session')
+def encoders():
+    import joblib
+    from app import DEFAULT_ENCODERS_PATH, compile_encoding_tables
+    return compile_encoding_tables(joblib.load(os.path.join(REPO_ROOT, DEFAULT_ENCODERS_PATH)))
+
+def make_records(n, seed=0, sex=('Male', 'Female'), handedness=('Right', 'Left'), adult_child=('Adult', 'Child')):
+    """Valid records as entered in the app's forms"""
+    from app import INPUT_RANGES
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: rng.uniform(low, high, n) for col, (low, high) in INPUT_RANGES.items()})
+    df['age'] = df['age'].round()
+    df['sex'] = rng.choice(list(sex), n)
+    df['handedness'] = rng.choice(list(handedness), n)
+    df['adult_child'] = rng.choice(list(adult_child), n)
+    return df
+
+@pytest.fixture(scope='session')
+def app_registry(encoders):
+    """A registry with one forest over the app's inputs plus imputed engineered features"""
+    from app import REQUIRED_COLUMNS, ModelRegistry, preprocess_input_data
+    features = REQUIRED_COLUMNS + ['thm_1', 'thm_2', 'tof_1', 'tof_2', 'acc_mag']
+    model = RandomForestClassifier(50, max_depth=8, random_state=0, n_jobs=1)
+    model.fit(np.zeros((2, len(features))), [0, 1])
+    model.feature_names_in_ = np.array(features, dtype=object)
+    records = make_records(2000)
+    np.random.seed(0)
+    matrix = preprocess_input_data(records, model, encoders)
+    target = (matrix[:, 0] + matrix[:, features.index('thm_1')] + np.random.normal(0, 0.5, len(matrix)) > 1)
+    model = RandomForestClassifier(50, max_depth=8, random_state=0, n_jobs=1)
+    model.fit(matrix, target.astype(int))
+    model.feature_names_in_ = np.array(features, dtype=object)
+    return ModelRegistry({'v1': model}, {'v1': 1.0}, encoders, 'v1', {'v1': 'fingerprint-v1'})
@@ -0,0 +1,149 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from artifact_fetcher import RangedDownload, StreamingUnzip, fetch_artifact
+
+SEGMENT = 64 * 1024
+
+def make_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('model.pkl', os.urandom(300_000))
+        archive.writestr('encoders.pkl', b'encoders')
+    return buffer.getvalue()
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves ``server.payload`` with Range support and records the ranges asked for"""
+
+    def do_GET(self):
+        payload = self.server.payload
+        ranged = self.headers.get('Range')
+        if ranged:
+            start, end = (int(v) for v in ranged.split('=')[1].split('-'))
+            self.server.ranges.append((start, end))
+            body = payload[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{start + len(body) - 1}/{len(payload)}')
+        else:
+            body = payload
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    httpd.payload = b''
+    httpd.ranges = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+
+def artifact(server, sha256=None):
+    return {'name': 'models.zip', 'url': f'http://127.0.0.1:{server.server_address[1]}/models.zip',
+            'sha256': sha256}
+
+def fetch(server, tmp_path, sha256=None):
+    spec = dict(artifact(server, sha256), extract_to=str(tmp_path / 'models'))
+    return fetch_artifact(spec, cache_dir=str(tmp_path / 'cache'), segment_size=SEGMENT, log=lambda _: None)
+
+def test_download_is_verified_cached_and_installed(server, tmp_path):
+    server.payload = make_zip()
+    cached = fetch(server, tmp_path, hashlib.sha256(server.payload).hexdigest())
+    assert open(cached, 'rb').read() == server.payload
+    assert (tmp_path / 'models' / 'encoders.pkl').read_bytes() == b'encoders'
+
+def test_interrupted_download_resumes_missing_segments(server, tmp_path):
+    server.payload = make_zip()
+    digest = hashlib.sha256(server.payload).hexdigest()
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    part = cache_dir / f'{digest}-models.zip.part'
+    # The first two segments arrived before the interruption
+    part.write_bytes(server.payload[:2 * SEGMENT].ljust(len(server.payload), b'\0'))
+    (cache_dir / f'{digest}-models.zip.part.json').write_text(json.dumps({
+        'url': artifact(server)['url'], 'size': len(server.payload), 'segment_size': SEGMENT, 'done': [0, 1]}))
+
+    cached = fetch(server, tmp_path, digest)
+    assert open(cached, 'rb').read() == server.payload
+    fetched = [start for start, end in server.ranges if end > 0]
+    assert fetched and min(fetched) == 2 * SEGMENT
+
+def test_html_interstitial_never_poisons_the_cache(server, tmp_path):
+    server.payload = b'<!DOCTYPE html><html><body>Google Drive - Virus scan warning</body></html>'
+    with pytest.raises(ValueError, match='HTML'):
+        fetch(server, tmp_path)
+    assert not os.listdir(tmp_path / 'cache') or all(n.endswith('.lock') for n in os.listdir(tmp_path / 'cache'))
+
+    # Once the server sends the real file, setup succeeds without clearing anything by hand
+    server.payload = make_zip()
+    fetch(server, tmp_path)
+    assert (tmp_path / 'models' / 'encoders.pkl').read_bytes() == b'encoders'
+
+def test_bad_cached_file_is_downloaded_again(server, tmp_path):
+    (tmp_path / 'cache').mkdir()
+    (tmp_path / 'cache' / 'models.zip').write_bytes(b'<html>interstitial</html>')
+    server.payload = make_zip()
+    fetch(server, tmp_path)
+    assert (tmp_path / 'models' / 'encoders.pkl').read_bytes() == b'encoders'
+
+def test_checksum_mismatch_is_rejected(server, tmp_path):
+    server.payload = make_zip()
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        fetch(server, tmp_path, '0' * 64)
+    assert not (tmp_path / 'models' / 'encoders.pkl').exists()
+    assert not [n for n in os.listdir(tmp_path / 'cache') if not n.endswith('.lock')]
+
+def test_concurrent_setups_share_one_download(server, tmp_path):
+    server.payload = make_zip()
+    digest = hashlib.sha256(server.payload).hexdigest()
+    errors = []
+
+    def setup(i):
+        try:
+            spec = dict(artifact(server, digest), extract_to=str(tmp_path / f'models{i}'))
+            fetch_artifact(spec, cache_dir=str(tmp_path / 'cache'), segment_size=SEGMENT, log=lambda _: None)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=setup, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert all((tmp_path / f'models{i}' / 'encoders.pkl').exists() for i in range(3))
+    # One probe and one pass over the segments; the others installed from the cache
+    assert len([r for r in server.ranges if r == (0, 0)]) == 1
+
+def test_follower_wakes_when_a_segment_fails_unexpectedly(tmp_path):
+    class BrokenSession:
+        def get(self, *args, **kwargs):
+            raise RuntimeError("decoder crashed")
+
+    download = RangedDownload('http://example.invalid/a.zip', str(tmp_path / 'a.part'), 100, 50,
+                              BrokenSession(), 1)
+    with pytest.raises(RuntimeError):
+        download.fetch_segment(0)
+    waiter = threading.Thread(target=download.wait_for_prefix, args=(0,), daemon=True)
+    waiter.start()
+    waiter.join(2)
+    assert not waiter.is_alive()
+    assert isinstance(download.failed, RuntimeError)
+
+def test_members_may_not_escape_into_a_sibling_directory(tmp_path):
+    extractor = StreamingUnzip(str(tmp_path / 'models'))
+    assert extractor._target_path('model.pkl') == str(tmp_path / 'models' / 'model.pkl')
+    with pytest.raises(ValueError):
+        extractor._target_path('../models_evil/model.pkl')
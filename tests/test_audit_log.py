@@ -0,0 +1,49 @@
+import glob
+import os
+import time
+
+import pandas as pd
+
+from audit_log import ROTATE_SECONDS, AuditLog
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_parquet_files_rotate_within_minutes_by_default(tmp_path):
+    audit = AuditLog(str(tmp_path))
+    try:
+        assert audit.max_file_seconds == ROTATE_SECONDS['parquet'] <= 600
+        assert AuditLog(str(tmp_path / 'sqlite'), 'sqlite').max_file_seconds == ROTATE_SECONDS['sqlite']
+    finally:
+        audit.close()
+
+
+def test_idle_parquet_file_is_closed_on_time(tmp_path):
+    audit = AuditLog(str(tmp_path), flush_seconds=0.05, max_file_seconds=0.3)
+    try:
+        audit.log(pd.DataFrame({'prediction': [0, 1, 1]}), 3)
+        # Readable without closing the log, i.e. without a clean shutdown
+        assert wait_for(lambda: glob.glob(os.path.join(tmp_path, '*.parquet')))
+        [path] = glob.glob(os.path.join(tmp_path, '*.parquet'))
+        assert pd.read_parquet(path)['prediction'].tolist() == [0, 1, 1]
+        assert not glob.glob(os.path.join(tmp_path, '*.inprogress'))
+    finally:
+        audit.close()
+
+
+def test_records_name_the_model_file(tmp_path, app_registry):
+    from app import predict_batch
+    from conftest import make_records
+
+    audit = AuditLog(str(tmp_path))
+    predict_batch(make_records(20), app_registry, audit=audit)
+    audit.close()
+    [path] = glob.glob(os.path.join(tmp_path, '*.parquet'))
+    records = pd.read_parquet(path)
+    assert set(records['model_version']) == {'v1'}
+    assert set(records['model_fingerprint']) == {'fingerprint-v1'}
@@ -0,0 +1,67 @@
+import gzip
+import io
+import tarfile
+
+import app
+from app import iter_batch_members, score_batch_member
+from conftest import make_records
+
+class Upload(io.BytesIO):
+    """Stands in for a Streamlit UploadedFile"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+def csv_bytes(n=50, seed=0):
+    return make_records(n, seed).to_csv(index=False).encode()
+
+def test_gzip_compressed_csv_is_one_member():
+    members = list(iter_batch_members(Upload('data.csv.gz', gzip.compress(csv_bytes()))))
+    assert [name for name, _ in members] == ['data.csv']
+    assert members[0][1] == csv_bytes()
+
+def test_gzip_compressed_tar_still_yields_its_members():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for i in range(2):
+            data = csv_bytes(seed=i)
+            info = tarfile.TarInfo(f'part{i}.csv')
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    for name in ('batch.tar.gz', 'batch.gz'):
+        members = list(iter_batch_members(Upload(name, buffer.getvalue())))
+        assert [member for member, _ in members] == [f'{name}/part0.csv', f'{name}/part1.csv']
+
+def test_member_errors_are_returned_not_drawn(app_registry, monkeypatch):
+    drawn = []
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("imputation exploded")
+    monkeypatch.setattr(app.st, 'error', drawn.append)
+    # Imputing the engineered features only happens while preprocessing
+    monkeypatch.setattr(app.np.random, 'uniform', broken)
+    item = score_batch_member('bad.csv', csv_bytes(), app_registry)
+    assert item['results'] is None
+    assert 'imputation exploded' in item['error']
+    assert drawn == []
+
+def test_feather_uploads_are_projected_in_the_reader(monkeypatch):
+    import pyarrow.feather as feather
+    buffer = io.BytesIO()
+    feather.write_feather(make_records(10), buffer)
+    buffer.seek(0)
+    requested = []
+    read_table = feather.read_table
+    monkeypatch.setattr(app.feather, 'read_table',
+                        lambda source, columns=None, **kwargs: requested.append(columns) or
+                        read_table(source, columns=columns, **kwargs))
+    df = app.read_batch_file(buffer, {'age', 'sex'}, name='upload.feather')
+    assert sorted(df.columns) == ['age', 'sex']
+    assert sorted(requested[0]) == ['age', 'sex']
+
+def test_uploads_with_the_same_name_keep_their_own_results(app_registry):
+    uploads = [Upload('data.csv', csv_bytes(20, seed=0)), Upload('data.csv', csv_bytes(30, seed=1))]
+    file_results = app.process_batch_files(uploads, app_registry, workers=2)
+    assert [item['name'] for item in file_results] == ['data.csv', 'data.csv (2)']
+    assert [item['total_records'] for item in file_results] == [20, 30]
@@ -0,0 +1,9 @@
+from compress_model import build_candidates, forest_size
+
+def test_no_op_candidates_are_skipped(noisy_forest):
+    model, rows = noisy_forest
+    max_depth = max(estimator.tree_.max_depth for estimator in model.estimators_)
+    candidates = dict(build_candidates(model, rows[:500], [0.5, 1.0], [4, max_depth, max_depth + 5]))
+    assert 'depth_4' in candidates
+    assert f'depth_{max_depth}' not in candidates and f'depth_{max_depth + 5}' not in candidates
+    assert all(forest_size(variant) < forest_size(model) for variant in candidates.values())
@@ -0,0 +1,33 @@
+import numpy as np
+
+from app import CATEGORICAL_COLUMNS, INPUT_RANGES
+from conftest import make_records
+from drift_monitor import DriftProfile, compare_profiles
+
+
+def training_style(df):
+    """The same records with categories as the training data's 0/1 codes"""
+    df = df.copy()
+    for col, first in [('sex', 'Female'), ('handedness', 'Left'), ('adult_child', 'Child')]:
+        df[col] = np.where(df[col] == first, 0, 1)
+    return df
+
+
+def test_training_codes_and_form_labels_show_no_drift(encoders):
+    reference = DriftProfile(INPUT_RANGES, CATEGORICAL_COLUMNS)
+    reference.update(training_style(make_records(3000, seed=1)), encoders=encoders)
+    live = DriftProfile(INPUT_RANGES, CATEGORICAL_COLUMNS)
+    live.update(make_records(3000, seed=2), encoders=encoders)
+
+    report = compare_profiles(reference, live).set_index('column')
+    for col in CATEGORICAL_COLUMNS:
+        assert set(live.categories[col]) == set(reference.categories[col]) == {'0', '1'}
+        assert report.loc[col, 'status'] == 'stable'
+
+
+def test_aliases_count_as_one_class(encoders):
+    profile = DriftProfile(INPUT_RANGES, CATEGORICAL_COLUMNS)
+    records = make_records(4, sex=('Male',))
+    records['sex'] = ['Male', ' m ', '1', 'Robot']
+    profile.update(records, encoders=encoders)
+    assert profile.categories['sex'] == {'1': 3, 'robot': 1}
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from app import early_exit_predict_proba
+
+@pytest.mark.parametrize('confidence', [0.9, 0.95, 0.99])
+def test_flip_rate_is_bounded_by_confidence(noisy_forest, confidence):
+    model, rows = noisy_forest
+    full = model.predict_proba(rows)[:, 1] > 0.5
+    proba, trees_used = early_exit_predict_proba(model, rows, confidence)
+    flip_rate = ((proba[:, 1] > 0.5) != full).mean()
+    assert flip_rate <= 1 - confidence
+    # Early exit still has to save work
+    assert trees_used.mean() < len(model.estimators_)
+
+def test_undecided_rows_get_the_full_forest(noisy_forest):
+    model, rows = noisy_forest
+    proba, trees_used = early_exit_predict_proba(model, rows, 0.99)
+    full = trees_used == len(model.estimators_)
+    assert np.allclose(proba[full], model.predict_proba(rows[full]))
@@ -0,0 +1,35 @@
+import numpy as np
+
+from app import predict_batch
+from prediction_store import PredictionStore
+from conftest import make_records
+
+def explained_total(results_df):
+    columns = [col for col in results_df.columns if col.startswith('top_contribution_')]
+    return results_df.attrs['base_rate'] + results_df[columns].sum(axis=1).to_numpy()
+
+def test_contributions_add_up_to_the_reported_probability(app_registry):
+    n_features = app_registry.get().n_features_in_
+    results_df, _ = predict_batch(make_records(300, seed=1), app_registry, explain_top_k=n_features)
+    assert np.allclose(explained_total(results_df), results_df['target_probability'], rtol=0, atol=1e-9)
+
+def test_rows_seen_before_are_explained_consistently(app_registry, tmp_path):
+    store = PredictionStore(str(tmp_path / 'predictions.sqlite'))
+    records = make_records(300, seed=2)
+    predict_batch(records, app_registry, store=store)
+    n_features = app_registry.get().n_features_in_
+    results_df, _ = predict_batch(records, app_registry, store=store, explain_top_k=n_features)
+    assert np.allclose(explained_total(results_df), results_df['target_probability'], rtol=0, atol=1e-9)
+
+def test_contribution_tables_are_built_on_first_explanation(app_registry):
+    app_registry.contribution_tables.clear()
+    predict_batch(make_records(50, seed=3), app_registry)
+    assert app_registry.contribution_tables == {}
+    predict_batch(make_records(50, seed=3), app_registry, explain_top_k=3)
+    assert set(app_registry.contribution_tables) == {'v1'}
+
+def test_explanations_match_probabilities_with_early_exit_on(app_registry):
+    n_features = app_registry.get().n_features_in_
+    results_df, _ = predict_batch(make_records(300, seed=4), app_registry, early_exit_confidence=0.9,
+                                  explain_top_k=n_features)
+    assert np.allclose(explained_total(results_df), results_df['target_probability'], rtol=0, atol=1e-9)
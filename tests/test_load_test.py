@@ -0,0 +1,24 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from load_test import run_user
+
+class FlakyUser:
+    def __init__(self):
+        self.calls = 0
+
+    def single(self):
+        self.calls += 1
+        if self.calls % 2:
+            raise RuntimeError("model unavailable")
+        return 1
+
+def test_failed_requests_keep_their_messages():
+    samples = []
+    args = SimpleNamespace(batch_share=0.0, think_time=0.0)
+    run_user(FlakyUser(), args, time.perf_counter() + 0.05, np.random.default_rng(0), samples, threading.Lock())
+    errors = [error for _, _, _, ok, error in samples if not ok]
+    assert errors and set(errors) == {"single: model unavailable"}
@@ -0,0 +1,82 @@
+import gc
+import os
+
+import pandas as pd
+import pytest
+
+import app
+from memory_admission import MemoryAdmission
+
+
+def test_cached_frames_count_against_the_budget_until_collected():
+    admission = MemoryAdmission(budget_bytes=10**12, model_path=os.devnull)
+    capacity = admission.capacity
+    frame = pd.DataFrame({'a': range(1000)})
+    admission.hold('upload', 4000, owner=frame)
+
+    assert admission.capacity == capacity - 4000
+    # A job's own cached upload is part of its estimate
+    assert admission.available('upload') == capacity
+    assert admission.plan(1000, 1, 1, held_key='upload')['mode'] == 'full'
+
+    del frame
+    gc.collect()
+    assert admission.capacity == capacity
+    assert admission.held == {}
+
+
+def test_held_frames_push_a_batch_into_chunks():
+    admission = MemoryAdmission(budget_bytes=1, model_path=os.devnull)
+    admission.baseline = 0
+    admission.budget = 64 * 2**20
+    rows = 50_000
+    assert admission.plan(rows, 20, 20)['mode'] == 'full'
+    admission.hold('other upload', 60 * 2**20)
+    assert admission.plan(rows, 20, 20)['mode'] != 'full'
+
+
+def test_spill_files_are_unique_and_deleted_with_their_batch(tmp_path):
+    first, second = app.SpillFile(str(tmp_path)), app.SpillFile(str(tmp_path))
+    assert first.path != second.path
+    assert os.path.exists(first.path) and os.path.exists(second.path)
+
+    first.remove()
+    assert not os.path.exists(first.path)
+    path = second.path
+    batch = {'spill': second}
+    del second, batch
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_upload_bytes_count_in_the_estimate():
+    admission = MemoryAdmission(budget_bytes=1, model_path=os.devnull)
+    admission.baseline = 0
+    admission.budget = 64 * 2**20
+    assert admission.plan(10_000, 20, 20)['mode'] == 'full'
+    plan = admission.plan(10_000, 20, 20, input_bytes=60 * 2**20)
+    assert plan['mode'] != 'full' and plan['estimate'] >= 60 * 2**20
+
+
+def test_parquet_schema_reports_the_decoded_size():
+    import io
+    records = pd.DataFrame({'a': range(100_000), 'b': 1.5})
+    buffer = io.BytesIO()
+    records.to_parquet(buffer, compression='zstd')
+    buffer.seek(0)
+    columns, rows, decoded = app.read_batch_schema(buffer, name='upload.parquet')
+    assert columns == ['a', 'b'] and rows == 100_000
+    assert decoded > len(buffer.getvalue())
+
+
+def test_parsing_waits_for_a_reservation(monkeypatch):
+    import io
+    admission = MemoryAdmission(budget_bytes=10**9, model_path=os.devnull)
+    admission.running, admission.reserved = 1, admission.capacity
+    monkeypatch.setattr(app, 'load_memory_admission', lambda: admission)
+    monkeypatch.setattr(app, 'MEMORY_WAIT_TIMEOUT', 0.1)
+    upload = io.BytesIO(b"a,b\n1,2\n")
+    upload.name = 'upload.csv'
+    app.load_batch_upload.clear()
+    with pytest.raises(TimeoutError):
+        app.load_batch_upload('hash', 'upload.csv', None, upload, {'estimate': 2**20})
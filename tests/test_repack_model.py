@@ -0,0 +1,19 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from compact_forest import pack_forest, unpack_forest
+from repack_model import boundary_probes, parity_check
+
+
+def test_parity_check_handles_forests_fit_on_missing_values():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 5))
+    X[rng.random(X.shape) < 0.2] = np.nan
+    y = (np.nan_to_num(X[:, 0]) + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    model = RandomForestClassifier(20, random_state=0, n_jobs=1).fit(X, y)
+    assert any(np.isinf(e.tree_.threshold).any() for e in model.estimators_)
+
+    matrix = boundary_probes(model, 2000)
+    assert not np.isinf(matrix).any()
+    identical, max_difference = parity_check(model, unpack_forest(pack_forest(model)), matrix)
+    assert identical and max_difference == 0
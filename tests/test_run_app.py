@@ -0,0 +1,35 @@
+import threading
+import time
+
+import run_app
+
+
+class RunningProcess:
+    returncode = None
+
+    def poll(self):
+        return None
+
+
+def supervise_once(worker, healthy=True):
+    stopped = threading.Event()
+
+    def check():
+        stopped.set()
+        return healthy
+
+    worker.healthy = check
+    run_app.supervise([worker], 0, stopped)
+
+
+def test_restart_backoff_resets_once_a_worker_stays_healthy():
+    worker = run_app.Worker(0, 8600, '127.0.0.1', 1)
+    worker.process, worker.ready, worker.restarts = RunningProcess(), True, 5
+
+    worker.started = time.time() - 1
+    supervise_once(worker)
+    assert worker.restarts == 5
+
+    worker.started = time.time() - run_app.STABLE_SECONDS - 1
+    supervise_once(worker)
+    assert worker.restarts == 0
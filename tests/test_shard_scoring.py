@@ -0,0 +1,82 @@
+import argparse
+import os
+
+import pandas as pd
+import pytest
+
+import shard_scoring
+from conftest import make_records
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch, app_registry):
+    monkeypatch.setattr(shard_scoring, 'load_registry', lambda: app_registry)
+    monkeypatch.setattr(shard_scoring, 'RETRY_BACKOFF_SECONDS', 0)
+    make_records(30).to_csv(tmp_path / 'input.csv', index=False)
+    work_dir = str(tmp_path / 'job')
+    shard_scoring.split(argparse.Namespace(input=str(tmp_path / 'input.csv'), work_dir=work_dir, shard_rows=10,
+                                           version=None, early_exit=None, explain_top_k=None,
+                                           lease_seconds=60, max_attempts=3))
+    return work_dir
+
+
+def test_shard_that_always_fails_is_given_up_and_named(job, monkeypatch, capsys):
+    score_shard = shard_scoring.score_shard
+    attempts = []
+
+    def flaky(work, job_, registry, index):
+        if index == 1:
+            attempts.append(index)
+            raise RuntimeError("corrupt shard")
+        return score_shard(work, job_, registry, index)
+
+    monkeypatch.setattr(shard_scoring, 'score_shard', flaky)
+    with pytest.raises(SystemExit) as exit_info:
+        shard_scoring.work(argparse.Namespace(work_dir=job, processes=1, lease_seconds=None))
+    assert exit_info.value.code == 1
+    assert len(attempts) == 3
+    failure = shard_scoring.WorkDir(job).failure(1)
+    assert failure['attempts'] == 3 and failure['last_error'] == "corrupt shard"
+    assert "shard-00001" in capsys.readouterr().out
+
+    with pytest.raises(SystemExit) as exit_info:
+        shard_scoring.merge(argparse.Namespace(work_dir=job, output=job + '/results.parquet', rejects=None))
+    assert exit_info.value.code == 1
+    assert "shard-00001 after 3 attempts: corrupt shard" in capsys.readouterr().out
+
+
+def test_shard_that_fails_once_is_retried(job, monkeypatch, tmp_path):
+    score_shard = shard_scoring.score_shard
+    failed = set()
+
+    def fails_once(work, job_, registry, index):
+        if index not in failed:
+            failed.add(index)
+            raise RuntimeError("temporary")
+        return score_shard(work, job_, registry, index)
+
+    monkeypatch.setattr(shard_scoring, 'score_shard', fails_once)
+    shard_scoring.work(argparse.Namespace(work_dir=job, processes=1, lease_seconds=None))
+    assert shard_scoring.WorkDir(job).failure(0) is None
+
+    output = str(tmp_path / 'results.parquet')
+    shard_scoring.merge(argparse.Namespace(work_dir=job, output=output, rejects=None))
+    assert pd.read_parquet(output)['row_number'].tolist() == list(range(1, 31))
+
+
+def test_lease_age_ignores_the_hosts_clock(tmp_path, monkeypatch):
+    path = str(tmp_path / 'shard-00000.lease')
+    live = shard_scoring.Lease(path, 60, 'a')
+    assert live.acquire()
+    # A host whose clock runs an hour ahead must not steal a live lease
+    real_time = shard_scoring.time.time
+    monkeypatch.setattr(shard_scoring.time, 'time', lambda: real_time() + 3600)
+    assert not shard_scoring.Lease(path, 60, 'b').acquire()
+    # but one the storage last saw renewed long ago is taken over
+    live.stopped.set()
+    live.renewer.join()
+    stamp = shard_scoring.storage_now(str(tmp_path)) - 120
+    os.utime(path, (stamp, stamp))
+    taker = shard_scoring.Lease(path, 60, 'b')
+    assert taker.acquire()
+    taker.release()